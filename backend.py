@@ -168,6 +168,7 @@ def testSmartHome():
 	print(home)
 
 
-testSmartPlug()
-testSmartDoorbell()
-testSmartHome()
\ No newline at end of file
+if __name__ == "__main__":
+	testSmartPlug()
+	testSmartDoorbell()
+	testSmartHome()
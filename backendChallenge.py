@@ -1,174 +1,682 @@
+from deviceStore import *
+from snapshot import *
+from simulation import *
+from functools import lru_cache
+from itertools import compress, islice
+
+CSVHEADER = "DeviceType, Switched On, Device Option, Schedule\n"
+
+# what each action in a CSV schedule means, used instead of eval
+SCHEDULETOKENS = {"None": ACTIONCODES[None], "True": ACTIONCODES[True], "False": ACTIONCODES[False]}
+
+@lru_cache(maxsize=1024)
+def scheduleText(codes):
+	"""Returns the CSV text for a schedule's action codes, cached as lots of devices share a schedule"""
+	return "".join([f"{CODEACTIONS[code]};" for code in codes])
+
+@lru_cache(maxsize=1024)
+def parseSchedule(text):
+	"""Turns the CSV text for a schedule back into action codes, the opposite of scheduleText"""
+	actions = text.split(";")
+	if len(actions) < HOURS:
+		raise ValueError("Schedule must have an action for each of the 24 hours")
+
+	try:
+		return bytes([SCHEDULETOKENS[action] for action in actions[:HOURS]])
+	except KeyError:
+		raise ValueError("Action must be None (no change), True (on), or False (off)")
+
+def scheduleToCodes(schedule):
+	"""Turns a schedule (24 actions, like getSchedule returns) into action codes, raises if it isn't valid"""
+	if len(schedule) != HOURS:
+		raise ValueError("Schedule must have an action for each of the 24 hours")
+
+	if not all(action == None or action == True or action == False for action in schedule):
+		raise ValueError("Action must be None (no change), True (on), or False (off)")
+
+	return bytes([ACTIONCODES[action] for action in schedule])
+
+def shiftSchedule(schedule, hours):
+	"""Returns a copy of a schedule with every action moved hours later (or earlier if negative)"""
+	return [CODEACTIONS[code] for code in shiftScheduleCodes(scheduleToCodes(schedule), hours)]
+
+def mergeSchedules(base, overlay):
+	"""Returns base with overlay's actions on top, the hours overlay doesn't change keep base's action"""
+	return [CODEACTIONS[code] for code in mergeScheduleCodes(scheduleToCodes(base), scheduleToCodes(overlay))]
+
+def checkConsumptionRate(consumptionRate):
+	"""Raises if a consumption rate isn't a whole number between 0 and 150"""
+	# rates are stored one byte each, so a float would only fail once part of it was written
+	if not isinstance(consumptionRate, int):
+		raise ValueError("Consumption rate must be a whole number")
+	if consumptionRate < 0 or consumptionRate > 150:
+		raise ValueError("Consumption rate must be between 0 and 150")
+
+class DeviceSchedule(list):
+	"""
+		The list device.schedule gives, setting an hour in it sets that hour
+		of the device's schedule too, like when the schedule was an attribute
+	"""
+	def __init__(self, device):
+		super().__init__(device.getSchedule())
+		self.device = device
+
+	def __setitem__(self, hour, action):
+		if isinstance(hour, slice):
+			raise TypeError("Set one hour at a time, or the whole schedule with setSchedule")
+		if hour < 0:
+			hour += HOURS # like a list, negative hours count from the end
+		self.device.setActionAtHour(hour, action)
+		super().__setitem__(hour, action)
+
 class SmartDevice:
 	"""
-		Super class for all smart devices
+		Super class for all smart devices. A device is a view onto one row of
+		a store, a device on its own has a single row store of its own until
+		it's added to a home. In a home the view keeps the device's id rather
+		than its row, so it follows the device as others are removed. When a
+		device that was added to a home is removed, it gets a copy of its row
+		and is a device on its own again
 	"""
-	def __init__(self):
-		self.switchedOn = False
-		self.schedule = []
+	__slots__ = ("store", "deviceId", "idSpace", "__weakref__")
+	kind = DEVICE
 
-		for _ in range(24): # 0 - 23
-			self.schedule.append(None)
+	def __init__(self):
+		self.store = DeviceRecord(self.kind)
+		self.deviceId = None
+		self.idSpace = None
+
+	@classmethod
+	def view(cls, store, row):
+		"""Makes a device for a row that's already in a store, without copying it"""
+		device = cls.__new__(cls)
+		device.viewOf(store, row)
+		return device
+
+	def viewOf(self, store, row):
+		"""Points the device at a row of a store"""
+		self.store = store
+		self.deviceId = store.getId(row)
+		self.idSpace = store.idSpace
+
+	def detach(self, store, deviceId):
+		"""
+		Makes the device one on its own again with a copy of its row, as the
+		row is removed from store. Unless it's been added somewhere else since
+		"""
+		if self.store is store and self.deviceId == deviceId and self.idSpace is store.idSpace:
+			self.store = DeviceRecord.fromRow(store, store.getRow(deviceId))
+			self.deviceId = None
+			self.idSpace = None
+
+	@property
+	def row(self):
+		"""The device's row in its store, looked up by id as rows move when others are removed"""
+		if self.deviceId is None:
+			return 0 # on its own, in a DeviceRecord
+		# ids start again when every device is replaced, e.g. by importCSV
+		if self.idSpace is not self.store.idSpace:
+			raise ValueError("Device has been removed from its home")
+		try:
+			return self.store.getRow(self.deviceId)
+		except ValueError:
+			raise ValueError("Device has been removed from its home") from None
+
+	# these keep the old attributes working, e.g. device.switchedOn = True
+	@property
+	def switchedOn(self):
+		return self.getSwitchedOn()
+
+	@switchedOn.setter
+	def switchedOn(self, switchedOn):
+		row = self.row
+		self.store.setSwitchedOn(row, switchedOn)
+		self.store.emit(DEVICECHANGED, row)
+
+	@property
+	def schedule(self):
+		return DeviceSchedule(self)
+
+	@schedule.setter
+	def schedule(self, schedule):
+		self.setSchedule(schedule)
 
 	def toggleSwitch(self):
-		self.switchedOn = not self.switchedOn
+		row = self.row
+		self.store.toggleSwitch(row)
+		self.store.emit(DEVICECHANGED, row)
 
 	def getSwitchedOn(self):
-		return self.switchedOn
+		return self.store.getSwitchedOn(self.row)
+
+	def getId(self):
+		"""Returns the device's id in its home, or None if it isn't in one"""
+		return self.deviceId
 	
 	def getSchedule(self):
-		return self.schedule
+		return [CODEACTIONS[code] for code in self.store.getScheduleCodes(self.row)]
 	
 	def getScheduleText(self):
-		out = ""
-		for i in range(24):
-			out += f"{self.schedule[i]};"
-		return out
+		return scheduleText(self.store.getScheduleCodes(self.row))
 
 	def setActionAtHour(self, hour, action):
 		if hour < 0 or hour > 23:
 			raise ValueError("Hour must be between 0 and 23")
 		
 		if action == None or action == True or action == False:
-			self.schedule[hour] = action
+			row = self.row
+			self.store.setAction(row, hour, action)
+			self.store.emit(DEVICECHANGED, row)
 		else:
 			raise ValueError("Action must be None (no change), True (on), or False (off)")
 
+	def setSchedule(self, schedule):
+		"""
+		Sets the actions for all 24 hours at once, from a list like getSchedule
+		returns. Nothing is written unless it's different to the schedule now,
+		returns whether it was
+		"""
+		codes = scheduleToCodes(schedule)
+		row = self.row
+		if codes == self.store.getScheduleCodes(row):
+			return False
+
+		self.store.setScheduleCodes(row, codes)
+		self.store.emit(DEVICECHANGED, row)
+		return True
+
+	def __str__(self):
+		return self.text(self.store, self.row)
+
+	# text and csvRow take a row of a store, so a home can write every row
+	# without making a device for each and a device looks its row up once
+	@staticmethod
+	def text(store, row):
+		return f"SmartDevice: switched on: {store.getSwitchedOn(row)}"
+
 class SmartPlug(SmartDevice):
+	__slots__ = ()
+	kind = PLUG
+
 	def __init__(self, consumptionRate=0):
 		super().__init__()
-		if consumptionRate < 0 or consumptionRate > 150:
-			raise ValueError("Consumption rate must be between 0 and 150")
-		
-		self.consumptionRate = consumptionRate
+		checkConsumptionRate(consumptionRate)
+		self.store.setConsumptionRate(self.row, consumptionRate)
+
+	@property
+	def consumptionRate(self):
+		return self.getConsumptionRate()
+
+	@consumptionRate.setter
+	def consumptionRate(self, consumptionRate):
+		self.setConsumptionRate(consumptionRate)
 
 	def getConsumptionRate(self):
-		return self.consumptionRate
+		return self.store.getConsumptionRate(self.row)
 
 	def setConsumptionRate(self, consumptionRate):
-		# must be between 0 and 150
-		if consumptionRate < 0 or consumptionRate > 150:
-			raise ValueError("Consumption rate must be between 0 and 150")
-		else:
-			self.consumptionRate = consumptionRate
+		checkConsumptionRate(consumptionRate)
+		row = self.row
+		self.store.setConsumptionRate(row, consumptionRate)
+		self.store.emit(DEVICECHANGED, row)
 
 	def getCSVRow(self):
-		return f"SmartPlug, {self.getSwitchedOn()}, {self.getConsumptionRate()}, {self.getScheduleText()}"
+		return self.csvRow(self.store, self.row)
 
-	def __str__(self):
+	@staticmethod
+	def csvRow(store, row):
+		return f"SmartPlug, {store.getSwitchedOn(row)}, {store.getConsumptionRate(row)}, {scheduleText(store.getScheduleCodes(row))}"
+
+	@staticmethod
+	def text(store, row):
 		out = "SmartPlug:"
-		out += f" switched on: {self.getSwitchedOn()}"
-		out += f", comp. rate: {self.getConsumptionRate()}"
+		out += f" switched on: {store.getSwitchedOn(row)}"
+		out += f", comp. rate: {store.getConsumptionRate(row)}"
 		return out
 	
 
 class SmartDoorbell(SmartDevice):
-	def __init__(self):
-		super().__init__()
-		self.sleepMode = False
+	__slots__ = ()
+	kind = DOORBELL
+
+	@property
+	def sleepMode(self):
+		return self.getSleep()
+
+	@sleepMode.setter
+	def sleepMode(self, sleepMode):
+		self.setSleep(sleepMode)
 
 	def getSleep(self):
-		return self.sleepMode
+		return self.store.getSleep(self.row)
 	
 	def setSleep(self, sleepMode):
 		if sleepMode == True or sleepMode == False:
-			self.sleepMode = sleepMode
+			row = self.row
+			self.store.setSleep(row, sleepMode)
+			self.store.emit(DEVICECHANGED, row)
 		else:
 			raise ValueError("Sleep mode must be True or False")
 
 	def getCSVRow(self):
-		return f"SmartDoorbell, {self.getSwitchedOn()}, {self.getSleep()}, {self.getScheduleText()}"
+		return self.csvRow(self.store, self.row)
 
-	def __str__(self):
+	@staticmethod
+	def csvRow(store, row):
+		return f"SmartDoorbell, {store.getSwitchedOn(row)}, {store.getSleep(row)}, {scheduleText(store.getScheduleCodes(row))}"
+
+	@staticmethod
+	def text(store, row):
 		out = "SmartDoorbell:"
-		out += f" switched on: {self.getSwitchedOn()}"
-		out += f", sleep mode: {self.getSleep()}"
+		out += f" switched on: {store.getSwitchedOn(row)}"
+		out += f", sleep mode: {store.getSleep(row)}"
 		return out
+
+# which class to use when viewing a row of each kind
+KINDCLASSES = {DEVICE: SmartDevice, PLUG: SmartPlug, DOORBELL: SmartDoorbell}
+
+class DeviceList:
+	"""
+		A read only list of the devices in a home, devices are only
+		made when they're asked for so big homes don't need an object per device
+	"""
+	def __init__(self, home):
+		self.home = home
+
+	def __len__(self):
+		return len(self.home.store)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self.home.getDeviceAt(i) for i in range(*index.indices(len(self)))]
+		return self.home.getDeviceAt(index)
+
+	def __iter__(self):
+		store = self.home.store
+		for row in range(len(store)):
+			yield KINDCLASSES[store.getKind(row)].view(store, row)
 	
 class SmartHome():
 	def __init__(self):
-		self.devices = []
+		# devices are stored as columns rather than a list of objects,
+		# see deviceStore.py
+		self.store = DeviceStore()
+
+	def addListener(self, listener):
+		"""
+		Calls listener(event, index) whenever devices change, event is one of
+		DEVICECHANGED, DEVICEADDED, DEVICEREMOVED or BULKCHANGED (index is None)
+		"""
+		self.store.addListener(listener)
+
+	def removeListener(self, listener):
+		self.store.removeListener(listener)
 
 	def getDevices(self):
-		return self.devices
+		return DeviceList(self)
+
+	def copy(self):
+		"""Returns a new home with a copy of every device, e.g. to save it on another thread"""
+		home = SmartHome()
+		home.store = self.store.copy()
+		return home
+
+	def loadDevicesFrom(self, other):
+		"""Replaces every device with another home's devices, the other home shouldn't be used after"""
+		self.store.takeRows(other.store)
+		self.store.emit(BULKCHANGED)
 	
 	def getDeviceAt(self, index):
-		return self.devices[index]
+		# like a list, negative indexes count from the end
+		if index < 0:
+			index += len(self.store)
+		if index < 0 or index >= len(self.store):
+			raise IndexError("Index out of range")
+
+		# a view, which follows the device if earlier devices are removed
+		return KINDCLASSES[self.store.getKind(index)].view(self.store, index)
 	
 	def addDevice(self, device):
+		"""
+		Adds a copy of a device to the home, and points the device at the copy
+		so changes made through it show up in the home. A device only follows
+		one copy, so adding it to a second home (or twice) leaves the earlier
+		copy as a separate device that no longer changes with it. Removing it
+		from the home gives it a copy of its own, so it can still be used
+		"""
 		if not isinstance(device, SmartDevice):
 			raise ValueError("Device must be a SmartDevice")
 
-		self.devices.append(device)
+		row = self.store.appendFrom(device.store, device.row)
+		device.viewOf(self.store, row)
+		self.store.views[device.getId()] = device
+		self.store.emit(DEVICEADDED, row)
+		return device.getId()
 
 	def removeDeviceAt(self, index):
-		if index < 0 or index >= len(self.devices):
+		if index < 0 or index >= len(self.store):
 			raise ValueError("Index out of range")
 
-		self.devices.pop(index)
+		self.store.delete(index)
+		self.store.emit(DEVICEREMOVED, index)
 
 	# this should be toggleSwitchAt to match the other names
 	# but that's what the rubric says ¯\_(ツ)_/¯
 	def toggleSwitch(self, index):
-		if index < 0 or index >= len(self.devices):
+		if index < 0 or index >= len(self.store):
 			raise ValueError("Index out of range")
 
-		self.devices[index].toggleSwitch()
+		self.store.toggleSwitch(index)
+		self.store.emit(DEVICECHANGED, index)
+
+	def getTotals(self):
+		"""
+		Returns totals for the whole home without looking at every device,
+		as they're kept up to date as devices change. A dict with:
+		activeWattage (consumption rate of every plug switched on), switchedOn,
+		switchedOff, sleepingDoorbells, and how many plugs and doorbells there are
+		"""
+		return self.store.getTotals()
+
+	def simulate(self, days, startHour=0):
+		"""
+		Runs the schedules for days simulated days without a GUI, as fast as
+		possible, and returns a SimulationResult. The devices aren't changed
+		"""
+		return simulateSchedules(self.store, days, startHour)
+
+	############################################
+	# Devices by id. A device's id stays the same as other devices are
+	# added and removed, unlike its index, and finding it by id is constant time
+	############################################
+	def getIndexOf(self, deviceId):
+		"""Returns the index of the device with an id"""
+		return self.store.getRow(deviceId)
+
+	def getDeviceById(self, deviceId):
+		index = self.store.getRow(deviceId)
+		return KINDCLASSES[self.store.getKind(index)].view(self.store, index)
+
+	def toggleSwitchById(self, deviceId):
+		self.toggleSwitch(self.store.getRow(deviceId))
+
+	def removeDeviceById(self, deviceId):
+		"""
+		Removes a device in constant time. The last device moves into its
+		index rather than every later device moving up, so the order changes
+		(use removeDeviceAt to keep it)
+		"""
+		index = self.store.getRow(deviceId)
+		last = self.store.deleteUnordered(index)
+		self.store.emit(DEVICEREMOVED, last)
+		if index != last:
+			self.store.emit(DEVICECHANGED, index)
 
 	def turnOffAll(self):
-		for device in self.devices:
-			device.switchedOn = False
+		self.store.setAllSwitchedOn(False)
+		self.store.emit(BULKCHANGED)
 
 	def turnOnAll(self):
-		for device in self.devices:
-			device.switchedOn = True
+		self.store.setAllSwitchedOn(True)
+		self.store.emit(BULKCHANGED)
+
+	def applyScheduleAtHour(self, hour):
+		"""
+		Carries out every device's scheduled action for the given hour,
+		returns the indexes of the devices that were switched on or off
+		"""
+		if hour < 0 or hour > 23:
+			raise ValueError("Hour must be between 0 and 23")
+
+		changed = self.store.applyScheduleAt(hour)
+		for index in changed:
+			self.store.emit(DEVICECHANGED, index)
+		return changed
+
+	############################################
+	# Bulk operations, these change many devices in one call
+	# and work on the store's columns rather than a device at a time
+	############################################
+	def checkIndices(self, indices):
+		"""Raises if any of the indices are out of range, returns them as a list"""
+		indices = list(indices)
+		if indices and (min(indices) < 0 or max(indices) >= len(self.store)):
+			raise ValueError("Index out of range")
+		return indices
+
+	def indexList(self, indices):
+		"""Returns indices as a list (or the range given), for store changes that check them as they go"""
+		return indices if isinstance(indices, range) else list(indices)
+
+	def toggleSwitches(self, indices):
+		try:
+			self.store.toggleSwitchMany(self.indexList(indices))
+		except IndexError:
+			raise ValueError("Index out of range") from None
+		self.store.emit(BULKCHANGED)
+
+	def setSwitchedOnAt(self, indices, switchedOn):
+		try:
+			self.store.setSwitchedOnMany(self.indexList(indices), switchedOn)
+		except IndexError:
+			raise ValueError("Index out of range") from None
+		self.store.emit(BULKCHANGED)
+
+	def setSwitchedOnWhere(self, mask, switchedOn):
+		"""Sets every device where mask (one bool per device) is True"""
+		flags = bytes(mask)
+		if len(flags) != len(self.store):
+			raise ValueError("Mask must have one value per device")
+		if flags.translate(bytes([0, 1]) + bytes(254)) != flags:
+			raise ValueError("Mask values must be True or False")
+
+		self.store.setSwitchedOnFlags(flags, switchedOn)
+		self.store.emit(BULKCHANGED)
+
+	def setSwitchedOnOverRate(self, threshold, switchedOn):
+		"""Sets every plug with a consumption rate over threshold, e.g. to shed load"""
+		self.store.setSwitchedOnOverRate(threshold, switchedOn)
+		self.store.emit(BULKCHANGED)
+
+	def setConsumptionRates(self, indices, consumptionRates):
+		"""Sets the consumption rate of many plugs, to one rate or one rate each"""
+		indices = self.indexList(indices)
+
+		# only need to look at each device if the home isn't all plugs
+		if self.store.countKind(PLUG) != len(self.store):
+			kinds = bytes(map(self.store.kinds.__getitem__, self.checkIndices(indices)))
+			if kinds.count(PLUG) != len(kinds):
+				raise ValueError("Device must be a SmartPlug")
+
+		if isinstance(consumptionRates, int):
+			checkConsumptionRate(consumptionRates)
+		else:
+			# every rate is checked before any is written. Making the array
+			# checks they're all whole numbers that fit in a byte, in C
+			try:
+				consumptionRates = array("B", consumptionRates)
+			except TypeError:
+				raise ValueError("Consumption rate must be a whole number") from None
+			except OverflowError:
+				raise ValueError("Consumption rate must be between 0 and 150") from None
+
+			if len(consumptionRates) != len(indices):
+				raise ValueError("Must have one consumption rate per index")
+			if consumptionRates and max(consumptionRates) > 150:
+				raise ValueError("Consumption rate must be between 0 and 150")
+
+		try:
+			self.store.setConsumptionRateMany(indices, consumptionRates)
+		except IndexError:
+			raise ValueError("Index out of range") from None
+		self.store.emit(BULKCHANGED)
+
+	def getIndicesOfType(self, deviceType):
+		"""Returns the indices of every device of a type, e.g. SmartPlug"""
+		# compress picks out the indices in C
+		return list(compress(range(len(self.store)), self.store.kindFlags(deviceType.kind)))
+
+	############################################
+	# Bulk schedule editing. Each different schedule the devices have is
+	# only worked on once, however many devices have it
+	############################################
+	def applyScheduleTemplate(self, indices, template):
+		"""Gives many devices the same schedule, template is 24 actions like getSchedule returns"""
+		codes = scheduleToCodes(template)
+		self.store.mapSchedules(self.checkIndices(indices), lambda old: codes)
+		self.store.emit(BULKCHANGED)
+
+	def copySchedule(self, fromIndex, indices):
+		"""Gives many devices the schedule of the device at fromIndex"""
+		self.checkIndices([fromIndex])
+		codes = self.store.getScheduleCodes(fromIndex)
+		self.store.mapSchedules(self.checkIndices(indices), lambda old: codes)
+		self.store.emit(BULKCHANGED)
+
+	def shiftSchedules(self, indices, hours):
+		"""Moves every action in many devices' schedules hours later (or earlier if negative)"""
+		self.store.mapSchedules(self.checkIndices(indices), lambda old: shiftScheduleCodes(old, hours))
+		self.store.emit(BULKCHANGED)
+
+	def mergeScheduleTemplate(self, indices, template):
+		"""
+		Puts a template's actions on top of many devices' schedules, the hours
+		the template doesn't change keep each device's own action
+		"""
+		codes = scheduleToCodes(template)
+		self.store.mapSchedules(self.checkIndices(indices), lambda old: mergeScheduleCodes(old, codes))
+		self.store.emit(BULKCHANGED)
 
 	def getCSV(self):
-		out = "DeviceType, Switched On, Device Option, Schedule\n"
-		for device in self.devices:
-			out += f"{device.getCSVRow()}\n"
-		return out
+		return "".join(self.iterCSV())
+
+	def iterCSV(self):
+		"""Yields the CSV a line at a time, so the whole file never has to be in memory"""
+		yield CSVHEADER
+		store = self.store
+		for row in range(len(store)):
+			yield f"{KINDCLASSES[store.getKind(row)].csvRow(store, row)}\n"
+
+	def writeCSV(self, file, progress=None, chunkRows=10000):
+		"""
+		Writes the CSV to a file (or anything with a write method) as it's made.
+		If given, progress(linesWritten) is called every chunkRows lines
+		"""
+		for i, line in enumerate(self.iterCSV()):
+			file.write(line)
+			if progress and i % chunkRows == 0:
+				progress(i)
 	
 	def importCSV(self, csv):
-		self.devices = []
-
-		csv = csv.split("\n")[1:]  # remove first line
-		for line in csv:
+		"""
+		Replaces the devices with the ones in a CSV string. Every row is checked
+		before any device is added, so if a row is invalid this raises and the
+		home is left empty (it used to keep the devices on the rows before it)
+		"""
+		self.store.clear()
+		try:
+			self.importLines(csv.split("\n")[1:]) # remove first line
+		finally:
+			# the old devices have gone even if a row was invalid
+			self.store.emit(BULKCHANGED)
+
+	def writeSnapshot(self, file, progress=None):
+		"""Saves the devices to a binary file, see snapshot.py for progress"""
+		writeSnapshot(self.store, file, progress)
+
+	def importSnapshot(self, buffer, progress=None):
+		"""
+		Replaces the devices with the ones in a snapshot, from bytes or
+		anything else with the buffer protocol, e.g. an mmap of the file.
+		See snapshot.py for progress
+		"""
+		self.store.takeRows(readSnapshot(buffer, progress))
+		self.store.emit(BULKCHANGED)
+
+	def openSnapshot(self, buffer):
+		"""
+		Uses the devices in a snapshot where they are rather than loading them,
+		so opening takes the same time however many devices there are. buffer
+		should be an mmap of the file, opened with ACCESS_WRITE for changes to be
+		written straight back to it. Adding or removing a device loads them all
+		"""
+		self.store.takeRows(MappedDeviceStore(buffer))
+		self.store.emit(BULKCHANGED)
+
+	def importFile(self, file, progress=None, chunkRows=10000):
+		"""
+		Imports devices from an open CSV file, reading chunkRows lines at a time
+		so the whole file is never in memory. If given, progress(devices, charsRead)
+		is called after each chunk. Each chunk is checked before any of it is
+		added, so if a row is invalid the chunks before its chunk are kept
+		"""
+		self.store.clear()
+
+		try:
+			charsRead = len(file.readline()) # skip the header
+			while True:
+				lines = list(islice(file, chunkRows))
+				if not lines:
+					break
+
+				charsRead += sum(map(len, lines))
+				self.importLines([line.rstrip("\n") for line in lines])
+
+				if progress:
+					progress(len(self.store), charsRead)
+		finally:
+			# even if a row was invalid, the old devices have gone and the chunks before its chunk have been added
+			self.store.emit(BULKCHANGED)
+
+	def importLines(self, lines):
+		"""
+		Adds the devices from lines of CSV (without the header). Each row is
+		checked once as it's parsed, then all the devices go into the store
+		at once rather than being made and validated one by one
+		"""
+		kinds = bytearray()
+		switchedOn = bytearray()
+		consumptionRates = array("B")
+		sleepMode = bytearray()
+		schedules = bytearray()
+
+		for line in lines:
 			if not line:
 				continue
 
 			device = line.split(", ")
+			if len(device) < 4:
+				raise ValueError("Each row must have a device type, switched on, option and schedule")
+
 			deviceType = device[0]
-			switchedOn = device[1]
 			option = device[2]
-			schedule = device[3]
 
 			if deviceType == "SmartPlug":
-				newDevice = SmartPlug(int(option))
+				consumptionRate = int(option)
+				if consumptionRate < 0 or consumptionRate > 150:
+					raise ValueError("Consumption rate must be between 0 and 150")
+
+				kinds.append(PLUG)
+				consumptionRates.append(consumptionRate)
+				sleepMode.append(0)
 			elif deviceType == "SmartDoorbell":
-				newDevice = SmartDoorbell()
-				if option == "True":
-					newDevice.setSleep(True)
-				else:
-					newDevice.setSleep(False)
+				kinds.append(DOORBELL)
+				consumptionRates.append(0)
+				sleepMode.append(option == "True")
 			else:
 				raise ValueError("Invalid device type")
 
-			if switchedOn == "True":
-				newDevice.toggleSwitch()
-			
-			schedule = schedule.split(";")
-			for i in range(24):
-				newDevice.setActionAtHour(i, eval(schedule[i])) # eval is used to convert string to boolean
+			switchedOn.append(device[1] == "True")
+			schedules += parseSchedule(device[3])
 
-			self.addDevice(newDevice)
+		self.store.extend(kinds, switchedOn, consumptionRates, sleepMode, schedules)
 			
 	def __str__(self):
 		out = "SmartHome"
 
-		i = 0
-		for device in self.devices:
-			out += f"\n{i}: {device}"
-			i += 1
+		store = self.store
+		for row in range(len(store)):
+			out += f"\n{row}: {KINDCLASSES[store.getKind(row)].text(store, row)}"
 		return out
 
 def testSmartPlug():
@@ -236,6 +744,7 @@ def testSmartHome():
 	print(home)
 
 
-testSmartPlug()
-testSmartDoorbell()
-testSmartHome()
\ No newline at end of file
+if __name__ == "__main__":
+	testSmartPlug()
+	testSmartDoorbell()
+	testSmartHome()
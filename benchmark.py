@@ -0,0 +1,798 @@
+from backendChallenge import *
+from energyLedger import *
+from scheduler import *
+from widgetPool import *
+import io
+import mmap
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# how many devices to benchmark with, a big building's worth of plugs
+NUMDEVICES = 50000
+
+
+class ObjectPlug:
+	"""The old list-of-objects plug layout, kept here to compare against"""
+	def __init__(self, consumptionRate=0):
+		self.switchedOn = False
+		self.schedule = []
+		for _ in range(24):
+			self.schedule.append(None)
+		self.consumptionRate = consumptionRate
+
+
+def timeIt(func, repeats=5):
+	"""Returns the best time in ms of calling func a few times"""
+	best = None
+	for _ in range(repeats):
+		start = time.perf_counter()
+		func()
+		taken = (time.perf_counter() - start) * 1000
+		if best is None or taken < best:
+			best = taken
+	return best
+
+def measureMemory(build):
+	"""Returns what build() returned, and how many bytes it allocated"""
+	tracemalloc.start()
+	result = build()
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return result, size
+
+def printResult(name, before, after, unit="ms", higherIsBetter=False):
+	speedup = after / before if higherIsBetter else before / max(after, 1e-9)
+	print(f"{name:<32} {before:>12.2f}{unit} {after:>12.2f}{unit} {speedup:>8.1f}x")
+
+def benchmarkStore():
+	print(f"\nList of objects vs column store, {NUMDEVICES} plugs")
+	print(f"{'':<32} {'objects':>14} {'store':>14} {'speedup':>9}")
+
+	def buildObjects():
+		return [ObjectPlug(i % 151) for i in range(NUMDEVICES)]
+
+	def buildHome():
+		home = SmartHome()
+		for i in range(NUMDEVICES):
+			home.addDevice(SmartPlug(i % 151))
+		return home
+
+	devices, objectBytes = measureMemory(buildObjects)
+	home, storeBytes = measureMemory(buildHome)
+	printResult("memory (KiB)", objectBytes / 1024, storeBytes / 1024, "  ")
+	printResult("build", timeIt(buildObjects, 1), timeIt(buildHome, 1))
+
+	def turnOnObjects():
+		for device in devices:
+			device.switchedOn = True
+
+	printResult("turn on all", timeIt(turnOnObjects), timeIt(home.turnOnAll))
+
+	def readObjects():
+		for device in devices:
+			device.switchedOn
+
+	def readHome():
+		for device in home.getDevices():
+			device.getSwitchedOn()
+
+	printResult("read every switch", timeIt(readObjects), timeIt(readHome))
+
+	def countObjects():
+		return sum(1 for device in devices if device.switchedOn)
+
+	printResult("count switched on", timeIt(countObjects), timeIt(home.store.switchedOn.count))
+
+def benchmarkSchedules():
+	print(f"\nSchedules, {NUMDEVICES} plugs, 1 in 4 scheduled")
+	print(f"{'':<32} {'lists':>14} {'store':>14} {'speedup':>9}")
+
+	templates = [{hour: hour % 2 == 0 for hour in range(i, HOURS, 6)} for i in range(8)]
+
+	# four actions at random hours, so about 11k of the 12.5k schedules are different
+	rng = random.Random(1)
+	ownSchedules = [dict(zip(rng.sample(range(HOURS), 4), (True, False, True, False))) for _ in range(NUMDEVICES // 4)]
+
+	homes = {}
+	for name, scheduleOf in (("8 schedules", lambda i: templates[i // 4 % 8]), ("own schedules", lambda i: ownSchedules[i // 4])):
+		def buildObjects():
+			devices = [ObjectPlug(i % 151) for i in range(NUMDEVICES)]
+			for i in range(0, NUMDEVICES, 4):
+				for hour, action in scheduleOf(i).items():
+					devices[i].schedule[hour] = action
+			return devices
+
+		def buildHome():
+			home = SmartHome()
+			for i in range(NUMDEVICES):
+				plug = SmartPlug(i % 151)
+				if i % 4 == 0:
+					for hour, action in scheduleOf(i).items():
+						plug.setActionAtHour(hour, action)
+				home.addDevice(plug)
+			return home
+
+		objectBytes = measureMemory(buildObjects)[1]
+		homes[name], storeBytes = measureMemory(buildHome)
+		printResult(f"bytes per device, {name}", objectBytes / NUMDEVICES, storeBytes / NUMDEVICES, "  ")
+		printResult(f"build, {name}", timeIt(buildObjects, 1), timeIt(buildHome, 1))
+	home = homes["8 schedules"]
+
+	# saving the schedule window, an hour at a time like its old OptionMenus or all at once
+	print(f"{'':<32} {'each hour':>14} {'setSchedule':>14} {'speedup':>9}")
+	devices = list(islice(home.getDevices(), 1000))
+	# different schedules, so both really change every device
+	eachHourSchedule = [templates[3].get(hour) for hour in range(HOURS)]
+	wholeSchedule = [templates[5].get(hour) for hour in range(HOURS)]
+
+	def setEachHour():
+		for device in devices:
+			for hour, action in enumerate(eachHourSchedule):
+				device.setActionAtHour(hour, action)
+
+	def setWhole():
+		for device in devices:
+			device.setSchedule(wholeSchedule)
+
+	printResult("save 1000 schedules", timeIt(setEachHour, 1), timeIt(setWhole, 1))
+
+	# a template for 10k devices, a device at a time or all at once
+	print(f"{'':<32} {'each device':>14} {'template':>14} {'speedup':>9}")
+	indices = range(0, 40000, 4)
+	eachDeviceTemplate = [templates[1].get(hour) for hour in range(HOURS)]
+	bulkTemplate = [templates[2].get(hour) for hour in range(HOURS)]
+
+	def applyEachDevice():
+		for index in indices:
+			home.getDeviceAt(index).setSchedule(eachDeviceTemplate)
+
+	printResult("template to 10000 devices", timeIt(applyEachDevice, 1), timeIt(lambda: home.applyScheduleTemplate(indices, bulkTemplate), 1))
+
+	def shiftEachDevice():
+		for index in indices:
+			device = home.getDeviceAt(index)
+			device.setSchedule(shiftSchedule(device.getSchedule(), 1))
+
+	printResult("shift 10000 schedules", timeIt(shiftEachDevice, 1), timeIt(lambda: home.shiftSchedules(indices, 1), 1))
+
+def benchmarkBulk():
+	print(f"\nBulk operations, {NUMDEVICES} plugs")
+	print(f"{'':<32} {'objects':>14} {'store':>14} {'speedup':>9}")
+
+	devices = [ObjectPlug(i % 151) for i in range(NUMDEVICES)]
+	home = SmartHome()
+	for i in range(NUMDEVICES):
+		home.addDevice(SmartPlug(i % 151))
+
+	def shedObjects():
+		for device in devices:
+			if device.consumptionRate > 100:
+				device.switchedOn = False
+
+	printResult("shed load (rate > 100)", timeIt(shedObjects), timeIt(lambda: home.setSwitchedOnOverRate(100, False)))
+
+	mask = [i % 3 == 0 for i in range(NUMDEVICES)]
+
+	def maskObjects():
+		for device, value in zip(devices, mask):
+			if value:
+				device.switchedOn = True
+
+	printResult("switch on by mask", timeIt(maskObjects), timeIt(lambda: home.setSwitchedOnWhere(mask, True)))
+
+	indices = range(0, NUMDEVICES, 2)
+
+	def toggleObjects():
+		for i in indices:
+			devices[i].switchedOn = not devices[i].switchedOn
+
+	printResult("toggle every other device", timeIt(toggleObjects), timeIt(lambda: home.toggleSwitches(indices)))
+
+	def rateObjects():
+		for i in indices:
+			devices[i].consumptionRate = 50
+
+	printResult("set rate of every other plug", timeIt(rateObjects), timeIt(lambda: home.setConsumptionRates(indices, 50)))
+
+	# a range is changed with one slice assignment, a list of indices is
+	# scattered a device at a time (in C)
+	random.seed(0)
+	indices = random.sample(range(NUMDEVICES), NUMDEVICES // 4)
+	printResult("toggle random 1 in 4", timeIt(toggleObjects), timeIt(lambda: home.toggleSwitches(indices)))
+	printResult("set rate of random 1 in 4", timeIt(rateObjects), timeIt(lambda: home.setConsumptionRates(indices, 50)))
+
+def benchmarkScheduleTick():
+	print(f"\nClock tick, {NUMDEVICES} plugs with 1 in 100 scheduled")
+	print(f"{'':<32} {'scan all':>14} {'index':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	for i in range(NUMDEVICES):
+		plug = SmartPlug(i % 151)
+		if i % 100 == 0:
+			plug.setActionAtHour(7, i % 200 == 0)
+		home.addDevice(plug)
+
+	def scanTick():
+		# what incrementClock used to do
+		for device in home.getDevices():
+			if device.getSchedule()[7] == 0:
+				device.switchedOn = False
+			elif device.getSchedule()[7] == 1:
+				device.switchedOn = True
+
+	printResult("tick", timeIt(scanTick, 1), timeIt(lambda: home.applyScheduleAtHour(7)))
+
+def benchmarkTimedActions(numActions=2000, numDevices=1000):
+	print(f"\nTimed actions, {numActions} one-off actions over a day, checked every minute")
+	print(f"{'':<32} {'scan all':>14} {'heap':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	ids = [home.addDevice(SmartPlug(i % 151)) for i in range(numDevices)]
+	random.seed(0)
+	actions = [(random.randrange(DAY), ids[i % numDevices], i % 2 == 0) for i in range(numActions)]
+
+	def scanActions():
+		# a list of actions, every one is looked at each minute to see if it's due
+		pending = list(actions)
+		for now in range(MINUTE, DAY + 1, MINUTE):
+			due = [action for action in pending if action[0] <= now]
+			pending = [action for action in pending if action[0] > now]
+			for _, deviceId, switchedOn in sorted(due):
+				home.store.setSwitchedOn(home.getIndexOf(deviceId), switchedOn)
+
+	def runHeap():
+		scheduler = Scheduler(home)
+		for at, deviceId, switchedOn in actions:
+			scheduler.scheduleAction(deviceId, at, switchedOn)
+		for _ in range(DAY // MINUTE):
+			scheduler.advance(MINUTE)
+
+	printResult("one day", timeIt(scanActions, 1), timeIt(runHeap, 1))
+
+def benchmarkTotals():
+	print(f"\nHome totals, {NUMDEVICES} plugs")
+	print(f"{'':<32} {'loop':>14} {'running':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	for i in range(NUMDEVICES):
+		home.addDevice(SmartPlug(i % 151))
+	home.toggleSwitches(range(0, NUMDEVICES, 3))
+
+	def loopTotals():
+		# what working them out meant before, a device at a time
+		wattage = 0
+		switchedOn = 0
+		for device in home.getDevices():
+			if device.getSwitchedOn():
+				switchedOn += 1
+				wattage += device.getConsumptionRate()
+		return wattage, switchedOn
+
+	def toggleAndTotal():
+		home.toggleSwitch(7)
+		home.getTotals()
+
+	printResult("toggle then total", timeIt(lambda: (home.toggleSwitch(7), loopTotals())), timeIt(toggleAndTotal))
+
+def benchmarkLedger(numDevices=100000, top=100):
+	print(f"\nEnergy ledger, {numDevices} plugs over a simulated week")
+	print(f"{'':<32} {'raw hours':>14} {'rollups':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	for i in range(numDevices):
+		plug = SmartPlug(i % 151)
+		plug.setActionAtHour(i % 24, True)
+		plug.setActionAtHour((i * 7) % 24, False)
+		home.addDevice(plug)
+
+	ledger = EnergyLedger(home)
+	recordTime = 0
+	for hour in range(HOURS * 7):
+		start = time.perf_counter()
+		ledger.record()
+		recordTime += time.perf_counter() - start
+		home.applyScheduleAtHour((hour + 1) % HOURS)
+
+	# every device's use each hour, what a ledger without rollups would keep.
+	# It's the last day 7 times, as it's only to time adding them up
+	rawHours = list(ledger.hours) * 7
+
+	def topFromRawHours():
+		totals = [0] * numDevices
+		for hour in rawHours:
+			for device, used in enumerate(hour):
+				totals[device] += used
+		return heapq.nlargest(top, range(numDevices), key=totals.__getitem__)
+
+	printResult(f"top {top} this week", timeIt(topFromRawHours, 1), timeIt(lambda: ledger.topConsumers(top, "week")))
+	print(f"recording an hour takes {recordTime * 1000 / (HOURS * 7):.2f}ms")
+
+def benchmarkSimulation(days=7):
+	print(f"\nSimulating {days} days, {NUMDEVICES} plugs with 1 in 4 scheduled")
+	print(f"{'':<32} {'clock ticks':>14} {'simulate':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	for i in range(NUMDEVICES):
+		plug = SmartPlug(i % 151)
+		if i % 4 == 0:
+			plug.setActionAtHour(i % 24, True)
+			plug.setActionAtHour((i + 8) % 24, False)
+		home.addDevice(plug)
+
+	def tickThrough():
+		# what the GUI does every tick, but without waiting 3 seconds between them
+		copy = home.copy()
+		ledger = EnergyLedger(copy)
+		for hour in range(days * HOURS):
+			ledger.record()
+			copy.applyScheduleAtHour((hour + 1) % HOURS)
+
+	printResult(f"{days} days", timeIt(tickThrough, 1), timeIt(lambda: home.simulate(days), 1))
+
+	start = time.perf_counter()
+	home.simulate(365)
+	print(f"a year takes {(time.perf_counter() - start) * 1000:.2f}ms")
+
+def benchmarkParallelSimulation(numHomes=1000, devicesPerHome=500, days=30):
+	print(f"\nSimulating {days} days of {numHomes} homes of {devicesPerHome} plugs")
+	print(f"{'':<32} {'1 process':>14} {'pool':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	for i in range(devicesPerHome):
+		plug = SmartPlug(i % 151)
+		plug.setActionAtHour(i % 24, True)
+		plug.setActionAtHour((i + 8) % 24, False)
+		home.addDevice(plug)
+	homes = [home.copy() for _ in range(numHomes)]
+
+	serial = timeIt(lambda: simulateHomes(homes, days, workers=1), 1)
+	cores = os.cpu_count() or 1
+	workers = 2
+	while workers <= cores:
+		printResult(f"{workers} workers", serial, timeIt(lambda: simulateHomes(homes, days, workers=workers), 1))
+		workers *= 2
+	if cores == 1:
+		print(f"1 process took {serial:.2f}ms, there's only one core so nothing to scale across")
+
+	buffer = io.BytesIO()
+	home.writeSnapshot(buffer)
+	printResult("payload per home (KiB)", len(pickle.dumps(home)) / 1024, len(buffer.getvalue()) / 1024, "  ")
+
+def benchmarkRemoval(removals=1000):
+	print(f"\nRemoving {removals} random devices from {NUMDEVICES} plugs with 1 in 10 scheduled")
+	print(f"{'':<32} {'list.pop':>14} {'store':>14} {'speedup':>9}")
+
+	def makeHome():
+		home = SmartHome()
+		for i in range(NUMDEVICES):
+			plug = SmartPlug(i % 151)
+			if i % 10 == 0:
+				plug.setActionAtHour(i % 24, True)
+			home.addDevice(plug)
+		return home
+
+	random.seed(0)
+	indexes = [random.randrange(NUMDEVICES - i) for i in range(removals)]
+	ids = random.sample(range(NUMDEVICES), removals) # every id is valid until its device is removed
+
+	# each removal changes what's being removed from, so each is timed once on a fresh copy
+	def removeFromList():
+		devices = [ObjectPlug(i % 151) for i in range(NUMDEVICES)]
+		start = time.perf_counter()
+		for index in indexes:
+			devices.pop(index)
+		return (time.perf_counter() - start) * 1000
+
+	def removeByIndex():
+		home = makeHome()
+		start = time.perf_counter()
+		for index in indexes:
+			home.removeDeviceAt(index)
+		return (time.perf_counter() - start) * 1000
+
+	def removeById():
+		home = makeHome()
+		start = time.perf_counter()
+		for deviceId in ids:
+			home.removeDeviceById(deviceId)
+		return (time.perf_counter() - start) * 1000
+
+	listTime = removeFromList()
+	printResult("remove by index, keeps order", listTime, removeByIndex())
+	printResult("remove by id, reorders", listTime, removeById())
+
+def measurePeak(func):
+	"""Returns the most memory in bytes func allocated at once"""
+	tracemalloc.start()
+	func()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return peak
+
+def benchmarkExport():
+	print(f"\nCSV export, {NUMDEVICES} plugs")
+	print(f"{'':<32} {'one string':>14} {'streamed':>14} {'speedup':>9}")
+
+	home = SmartHome()
+	for i in range(NUMDEVICES):
+		home.addDevice(SmartPlug(i % 151))
+
+	def exportString():
+		# what getCSV used to do
+		out = "DeviceType, Switched On, Device Option, Schedule\n"
+		for device in home.getDevices():
+			schedule = ""
+			for action in device.getSchedule():
+				schedule += f"{action};"
+			out += f"SmartPlug, {device.getSwitchedOn()}, {device.getConsumptionRate()}, {schedule}\n"
+		with open(os.devnull, "w") as file:
+			file.write(out)
+
+	def exportStreamed():
+		with open(os.devnull, "w") as file:
+			home.writeCSV(file)
+
+	printResult("export", timeIt(exportString, 1), timeIt(exportStreamed, 1))
+	printResult("peak memory (KiB)", measurePeak(exportString) / 1024, measurePeak(exportStreamed) / 1024, "  ")
+
+def importCSVWithEval(home, csv):
+	"""What importCSV used to do, kept here to compare against"""
+	csv = csv.split("\n")[1:]
+	for line in csv:
+		if not line:
+			continue
+
+		device = line.split(", ")
+		if device[0] == "SmartPlug":
+			newDevice = SmartPlug(int(device[2]))
+		else:
+			newDevice = SmartDoorbell()
+			newDevice.setSleep(device[2] == "True")
+
+		if device[1] == "True":
+			newDevice.toggleSwitch()
+
+		schedule = device[3].split(";")
+		for i in range(24):
+			newDevice.setActionAtHour(i, eval(schedule[i]))
+
+		home.addDevice(newDevice)
+
+def makeCSVFile(numRows):
+	"""Writes a CSV file of numRows devices with a few different schedules, returns its path"""
+	schedules = []
+	for i in range(8):
+		plug = SmartPlug()
+		for hour in range(i, 24, 8):
+			plug.setActionAtHour(hour, hour % 2 == 0)
+		schedules.append(plug.getScheduleText())
+
+	path = os.path.join(tempfile.gettempdir(), f"smarthome{numRows}.csv")
+	with open(path, "w") as file:
+		file.write("DeviceType, Switched On, Device Option, Schedule\n")
+		for i in range(numRows):
+			if i % 10 == 0:
+				file.write(f"SmartDoorbell, {i % 3 == 0}, {i % 4 == 0}, {schedules[i % 8]}\n")
+			else:
+				file.write(f"SmartPlug, {i % 3 == 0}, {i % 151}, {schedules[i % 8]}\n")
+	return path
+
+def benchmarkImport(numRows=1000000, evalRows=20000):
+	print(f"\nCSV import, {numRows} rows (eval import timed on the first {evalRows})")
+	print(f"{'':<32} {'eval':>14} {'parser':>14} {'speedup':>9}")
+
+	path = makeCSVFile(numRows)
+	with open(path) as file:
+		content = file.read()
+	evalContent = "\n".join(content.split("\n", evalRows + 1)[:evalRows + 1])
+
+	start = time.perf_counter()
+	importCSVWithEval(SmartHome(), evalContent)
+	evalRate = evalRows / (time.perf_counter() - start)
+
+	home = SmartHome()
+	start = time.perf_counter()
+	home.importCSV(content)
+	parserRate = numRows / (time.perf_counter() - start)
+
+	printResult("devices per second", evalRate, parserRate, "  ", True)
+	os.remove(path)
+
+def benchmarkStreamingImport(numRows=200000):
+	print(f"\nStreaming CSV import, {numRows} rows")
+	print(f"{'':<32} {'read all':>14} {'chunked':>14} {'speedup':>9}")
+
+	path = makeCSVFile(numRows)
+
+	def importWhole():
+		with open(path) as file:
+			SmartHome().importCSV(file.read())
+
+	def importChunked():
+		with open(path) as file:
+			SmartHome().importFile(file)
+
+	printResult("import", timeIt(importWhole, 1), timeIt(importChunked, 1))
+	printResult("peak memory (KiB)", measurePeak(importWhole) / 1024, measurePeak(importChunked) / 1024, "  ")
+	# the peak includes the imported home itself, so show how big that is too
+	def importedHome():
+		with open(path) as file:
+			home = SmartHome()
+			home.importFile(file)
+			return home
+
+	homeBytes = measureMemory(importedHome)[1]
+	print(f"(the file is {os.path.getsize(path) / 1024:.2f}KiB, the imported home is {homeBytes / 1024:.2f}KiB)")
+	os.remove(path)
+
+def benchmarkSnapshot(numRows=1000000):
+	print(f"\nCSV vs binary snapshot, {numRows} devices")
+	print(f"{'':<32} {'csv':>14} {'snapshot':>14} {'speedup':>9}")
+
+	csvPath = makeCSVFile(numRows)
+	home = SmartHome()
+	with open(csvPath) as file:
+		home.importFile(file)
+
+	snapshotPath = os.path.join(tempfile.gettempdir(), f"smarthome{numRows}{SNAPSHOTEXTENSION}")
+	with open(snapshotPath, "wb") as file:
+		home.writeSnapshot(file)
+
+	def loadCSV():
+		with open(csvPath) as file:
+			SmartHome().importFile(file)
+
+	def loadSnapshot():
+		with open(snapshotPath, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+			SmartHome().importSnapshot(buffer)
+
+	def saveSnapshot():
+		with open(snapshotPath, "wb") as file:
+			home.writeSnapshot(file)
+
+	def saveCSV():
+		with open(csvPath, "w") as file:
+			home.writeCSV(file)
+
+	printResult("file size (KiB)", os.path.getsize(csvPath) / 1024, os.path.getsize(snapshotPath) / 1024, "  ")
+	printResult("load", timeIt(loadCSV, 1), timeIt(loadSnapshot, 3))
+	printResult("save", timeIt(saveCSV, 1), timeIt(saveSnapshot, 3))
+	os.remove(csvPath)
+	os.remove(snapshotPath)
+
+def makeSnapshotFile(numDevices):
+	"""Writes a snapshot of numDevices devices by repeating the sections of a small one, returns its path"""
+	sample = SmartHome()
+	for i in range(1000):
+		device = SmartPlug(i % 151) if i % 4 else SmartDoorbell()
+		device.setActionAtHour(i % 24, i % 2 == 0)
+		sample.addDevice(device)
+
+	buffer = io.BytesIO()
+	sample.writeSnapshot(buffer)
+	sample = buffer.getvalue()
+
+	# 1000 devices fill whole bytes of the bitsets, so every section can be repeated as is
+	repeats = numDevices // 1000
+	layout = snapshotLayout(1000)
+	path = os.path.join(tempfile.gettempdir(), f"smarthome{numDevices}{SNAPSHOTEXTENSION}")
+	with open(path, "wb") as file:
+		file.write(SNAPSHOTHEADER.pack(SNAPSHOTMAGIC, SNAPSHOTVERSION, repeats * 1000))
+		for start, end in zip(layout, layout[1:]):
+			file.write(sample[start:end] * repeats)
+	return path
+
+def benchmarkMappedSnapshot(numDevices=1000000, bigDevices=10000000, reads=1000):
+	print(f"\nLoaded vs memory mapped snapshot, {numDevices} devices ({reads} random devices read)")
+	print(f"{'':<32} {'loaded':>14} {'mapped':>14} {'speedup':>9}")
+
+	def openHome(path, mapped):
+		home = SmartHome()
+		file = open(path, "r+b")
+		buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE)
+		if mapped:
+			home.openSnapshot(buffer)
+		else:
+			home.importSnapshot(buffer)
+		return home, file, buffer
+
+	def measure(path, mapped):
+		start = time.perf_counter()
+		home, file, buffer = openHome(path, mapped)
+		opened = time.perf_counter()
+
+		for row in random.sample(range(len(home.getDevices())), reads):
+			home.toggleSwitch(row)
+			str(home.getDeviceAt(row))
+		read = time.perf_counter()
+
+		home.applyScheduleAtHour(7)
+		ticked = time.perf_counter()
+
+		del home # let go of the mapped columns before closing
+		buffer.close()
+		file.close()
+		return (opened - start) * 1000, (read - opened) * 1000, (ticked - read) * 1000
+
+	path = makeSnapshotFile(numDevices)
+	loaded = measure(path, False)
+	mapped = measure(path, True)
+	printResult("open", loaded[0], mapped[0])
+	printResult("read and toggle", loaded[1], mapped[1])
+	printResult("clock tick", loaded[2], mapped[2])
+	os.remove(path)
+
+	path = makeSnapshotFile(bigDevices)
+	opened, read, ticked = measure(path, True)
+	print(f"mapped, {bigDevices} devices: open {opened:.2f}ms, read and toggle {read:.2f}ms, clock tick {ticked:.2f}ms")
+	os.remove(path)
+
+def benchmarkWidgetSoak(ticks=28800, numDevices=5):
+	"""
+	Redraws a device list through a WidgetPool once per clock tick, by default
+	a day's worth (a tick every 3 seconds), to check memory stays flat.
+	Needs a display, as it makes real tk widgets
+	"""
+	from tkinter import Tk, Label, Button, TclError
+
+	print(f"\nWidget pool soak test, {ticks} refreshes of {numDevices} rows")
+	try:
+		win = Tk()
+	except TclError:
+		print("skipped, there's no display")
+		return
+	win.withdraw()
+
+	pool = WidgetPool()
+	widgets = []
+
+	def makeButton():
+		butt = Button(win, text="Toggle")
+		butt.config(command=lambda: butt.deviceIndex)
+		return butt
+
+	tracemalloc.start()
+	for tick in range(ticks + 1):
+		pool.releaseAll(widgets)
+
+		for i in range(numDevices):
+			label = pool.get("label", lambda: Label(win, width=28))
+			label.config(text=f"Plug: on, Consumption: {tick % 151}")
+			label.grid(row=i, column=0)
+			widgets.append(("label", label))
+
+			butt = pool.get("button", makeButton)
+			butt.deviceIndex = i
+			butt.grid(row=i, column=1)
+			widgets.append(("button", butt))
+
+		if tick % (ticks // 8) == 0:
+			win.update()
+			print(f"tick {tick:>6}: {tracemalloc.get_traced_memory()[0] / 1024:>8.1f}KiB {pool.getCounts()}")
+
+	tracemalloc.stop()
+	win.destroy()
+
+
+def benchmarkDialogSoak(opens=2000):
+	"""
+	Opens and closes a schedule window over and over through a DialogPool,
+	to check memory stays flat. Needs a display, as it makes real tk windows
+	"""
+	from tkinter import Tk, Toplevel, Label, TclError
+
+	print(f"\nDialog pool soak test, {opens} schedule windows opened and closed")
+	try:
+		win = Tk()
+	except TclError:
+		print("skipped, there's no display")
+		return
+	win.withdraw()
+
+	pool = DialogPool()
+
+	def makeDialog():
+		dialog = Toplevel(win)
+		dialog.labels = [Label(dialog) for hour in range(HOURS)]
+		for hour, label in enumerate(dialog.labels):
+			label.grid(row=hour, column=0)
+		return dialog
+
+	tracemalloc.start()
+	for i in range(opens + 1):
+		dialog = pool.get("schedule", makeDialog)
+		for hour, label in enumerate(dialog.labels):
+			label.config(text=f"{hour:02}:00 {i % 3}")
+		win.update()
+		pool.release("schedule", dialog)
+
+		if i % (opens // 8) == 0:
+			print(f"open {i:>6}: {tracemalloc.get_traced_memory()[0] / 1024:>8.1f}KiB {pool.getCounts()}")
+
+	tracemalloc.stop()
+	win.destroy()
+
+# run in a new python by benchmarkStartup, prints ms from starting to import
+# until the first frame is drawn and how many icons were loaded, or "nodisplay"
+FIRSTFRAMESCRIPT = """
+import time
+start = time.perf_counter()
+from frontendChallenge import *
+home = SmartHome()
+for i in range(20):
+	home.addDevice(SmartPlug(i) if i % 3 else SmartDoorbell())
+try:
+	system = SmartHomeSystem(home)
+except TclError:
+	print("nodisplay")
+	raise SystemExit
+if EAGER:
+	system.icons.loadAll()
+system.createStaticButtons()
+system.refreshDeviceList()
+system.win.update()
+print((time.perf_counter() - start) * 1000, system.icons.getLoadedCount())
+system.win.destroy()
+"""
+
+def benchmarkStartup(modules=("backendChallenge", "frontendChallenge")):
+	"""
+	How long importing takes (from python -X importtime) and whether it prints
+	anything, and how long until the GUI's first frame is drawn
+	"""
+	here = os.path.dirname(os.path.abspath(__file__))
+	print("\nStartup")
+
+	for module in modules:
+		result = subprocess.run(
+			[sys.executable, "-X", "importtime", "-c", f"import {module}"],
+			cwd=here, capture_output=True, text=True
+		)
+
+		# each line is "import time: self [us] | cumulative | module", the module itself comes last
+		cumulative = int(result.stderr.strip().splitlines()[-1].split("|")[1])
+		print(f"{'import ' + module:<32} {cumulative / 1000:>12.2f}ms, printed {len(result.stdout)} characters")
+
+	times = []
+	loaded = []
+	for eager in (True, False):
+		result = subprocess.run(
+			[sys.executable, "-c", f"EAGER = {eager}" + FIRSTFRAMESCRIPT],
+			cwd=here, capture_output=True, text=True
+		)
+		if result.stdout.strip() == "nodisplay":
+			print("time to first frame skipped, there's no display")
+			return
+		taken, count = result.stdout.split()
+		times.append(float(taken))
+		loaded.append(int(count))
+
+	print(f"{'':<32} {'all icons':>14} {'lazy icons':>14} {'speedup':>9}")
+	printResult("time to first frame", *times)
+	print(f"{'icons loaded':<32} {loaded[0]:>14} {loaded[1]:>14}")
+
+if __name__ == "__main__":
+	benchmarkStore()
+	benchmarkSchedules()
+	benchmarkBulk()
+	benchmarkScheduleTick()
+	benchmarkTimedActions()
+	benchmarkTotals()
+	benchmarkRemoval()
+	benchmarkLedger()
+	benchmarkSimulation()
+	benchmarkParallelSimulation()
+	benchmarkExport()
+	benchmarkImport()
+	benchmarkStreamingImport()
+	benchmarkSnapshot()
+	benchmarkMappedSnapshot()
+	benchmarkWidgetSoak()
+	benchmarkDialogSoak()
+	benchmarkStartup()
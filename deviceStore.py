@@ -0,0 +1,963 @@
+from array import array
+from collections import deque
+from functools import lru_cache
+from itertools import compress, repeat
+from weakref import WeakValueDictionary
+
+# device kinds, stored as one byte per device
+DEVICE = 0
+PLUG = 1
+DOORBELL = 2
+
+# schedule actions are one byte per hour, 24 per schedule
+HOURS = 24
+ACTIONCODES = {None: 0, True: 1, False: 2}
+CODEACTIONS = (None, True, False)
+EMPTYSCHEDULE = bytes(HOURS)
+
+# events sent to a store's listeners when its devices change
+DEVICECHANGED = "deviceChanged"
+DEVICEADDED = "deviceAdded"
+DEVICEREMOVED = "deviceRemoved"
+BULKCHANGED = "bulkChanged" # lots of devices changed at once, no row given
+
+# flags (bytes of 0 or 1) are turned into binary digits and back, so int()
+# and format() can pack and unpack a whole bitset in one go
+FLAGSTODIGITS = bytes.maketrans(b"\x00\x01", b"01")
+DIGITSTOFLAGS = bytes.maketrans(b"01", b"\x00\x01")
+
+# a device's id is the slot it has in the store's slot table, plus how many
+# times that slot has been reused (its generation) in the bits above it
+SLOTBITS = 32
+SLOTMASK = (1 << SLOTBITS) - 1
+
+# translate table turning any schedule action into 1, and no change into 0
+ANYACTION = bytes([0] + [1] * 255)
+
+# translate tables turning a schedule's action codes into binary digits,
+# 1 for the hours with an on (or off) action, to make the schedule's masks
+ONDIGITS = bytes(ord("1") if b == ACTIONCODES[True] else ord("0") for b in range(256))
+OFFDIGITS = bytes(ord("1") if b == ACTIONCODES[False] else ord("0") for b in range(256))
+
+# translate table turning flags into masks, 1 becomes all 8 bits set
+FLAGSTOMASK = bytes.maketrans(b"\x00\x01", b"\x00\xff")
+
+# translate tables turning action codes into 1 for the given action and 0 otherwise
+ACTIONFLAGS = {action: bytes(1 if b == code else 0 for b in range(256)) for action, code in ACTIONCODES.items()}
+
+
+# bulk changes to fewer rows than 1 in this many go a row at a time, which
+# keeps the running totals up to date and doesn't touch every row's flags
+FEWROWS = 64
+
+
+def rowsSlice(rows):
+	"""
+	Returns a slice for rows if they're a range going up (e.g. every other
+	row), so they can be changed with one slice assignment. Otherwise returns None
+	"""
+	if isinstance(rows, range) and rows and rows.step > 0:
+		return slice(rows[0], rows[-1] + 1, rows.step)
+	return None
+
+def callEach(func, *iterables):
+	"""
+	Calls func with an item from each iterable in turn, like a for loop but
+	faster as map runs the loop in C. The deque just throws away what func returns
+	"""
+	deque(map(func, *iterables), maxlen=0)
+
+def scatter(target, keys, values):
+	"""Sets target[key] = value for each key and value, see callEach"""
+	callEach(target.__setitem__, keys, values)
+
+def setBitPositions(value):
+	"""Returns the positions of the bits set in a big int, lowest first"""
+	digits = format(value, "b")[::-1]
+	positions = []
+	pos = digits.find("1")
+	while pos != -1:
+		positions.append(pos)
+		pos = digits.find("1", pos + 1)
+	return positions
+
+def toggleBit(bits, i):
+	"""Flips bit i of a bytearray, growing it first if it's too short"""
+	if i >> 3 >= len(bits):
+		bits.extend(bytes((i >> 3) + 1 - len(bits)))
+	bits[i >> 3] ^= 1 << (i & 7)
+
+def toggleMask(bits, mask):
+	"""Flips the bits of a bytearray that are set in mask (a big int), growing it first if it's too short"""
+	value = int.from_bytes(bits, "little") ^ mask
+	bits[:] = value.to_bytes(max(len(bits), (mask.bit_length() + 7) // 8), "little")
+
+def toggleBits(bits, positions):
+	"""Flips many bits of a bytearray at once, see toggleMask"""
+	flags = bytearray(max(positions) + 1)
+	scatter(flags, positions, repeat(1))
+	toggleMask(bits, int(flags.translate(FLAGSTODIGITS)[::-1], 2))
+
+def checkScheduleCodes(codes):
+	"""Returns a schedule's action codes as bytes, raises if there aren't 24 of them"""
+	codes = bytes(codes)
+	if len(codes) != HOURS:
+		raise ValueError("Schedule must have an action for each of the 24 hours")
+	return codes
+
+@lru_cache(maxsize=1024)
+def scheduleHours(codes):
+	"""Returns the hours a schedule's action codes switch on, and the hours they switch off, cached as lots of devices share a schedule"""
+	onHours = []
+	offHours = []
+	# find skips straight to the next hour with an action in C
+	actions = codes.translate(ANYACTION)
+	hour = actions.find(1)
+	while hour != -1:
+		(onHours if codes[hour] == ACTIONCODES[True] else offHours).append(hour)
+		hour = actions.find(1, hour + 1)
+	return tuple(onHours), tuple(offHours)
+
+def shiftScheduleCodes(codes, hours):
+	"""Returns a schedule's action codes with every action moved hours later, wrapping round midnight"""
+	split = HOURS - hours % HOURS
+	return codes[split:] + codes[:split]
+
+def mergeScheduleCodes(base, overlay):
+	"""Returns base's action codes with overlay's on top, where overlay has no change base's action is kept"""
+	return bytes([action or baseAction for baseAction, action in zip(base, overlay)])
+
+
+class BitSet:
+	"""
+		A growable list of booleans, packed 8 to a byte
+	"""
+	def __init__(self, length=0):
+		self.data = bytearray((length + 7) // 8)
+		self.length = length
+
+	@classmethod
+	def fromData(cls, data, length):
+		"""Makes a bitset of length bits from a copy of some packed bytes"""
+		bits = cls()
+		bits.data = bytearray(data)
+		bits.length = length
+		bits.fromInt(bits.toInt()) # clear any bits past the end
+		return bits
+
+	@classmethod
+	def fromBuffer(cls, data, length):
+		"""Makes a bitset of length bits that uses data (e.g. a memoryview) rather than a copy of it"""
+		bits = cls()
+		bits.data = data
+		bits.length = length
+		return bits
+
+	def __len__(self):
+		return self.length
+
+	def get(self, i):
+		return (self.data[i >> 3] >> (i & 7)) & 1 == 1
+
+	def set(self, i, value):
+		if value:
+			self.data[i >> 3] |= 1 << (i & 7)
+		else:
+			self.data[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+	def toggle(self, i):
+		self.data[i >> 3] ^= 1 << (i & 7)
+
+	def append(self, value):
+		if self.length & 7 == 0:
+			self.data.append(0)
+		self.length += 1
+		self.set(self.length - 1, value)
+
+	def pop(self):
+		"""Removes the last bit and returns it"""
+		value = self.get(self.length - 1)
+		self.set(self.length - 1, False)
+		self.length -= 1
+		if self.length & 7 == 0:
+			self.data.pop()
+		return value
+
+	def extendFlags(self, flags):
+		"""Adds a bit to the end for each byte (0 or 1) in flags"""
+		value = self.toInt() | (self.flagsToInt(flags) << self.length)
+		self.length += len(flags)
+		self.fromInt(value)
+
+	def delete(self, i):
+		"""Removes bit i, shifting every later bit down by one"""
+		# only the bytes from the one holding bit i on change, so just those
+		# are shifted, which is half as much work on average as every byte
+		start = i >> 3
+		bit = i & 7
+		value = int.from_bytes(self.data[start:], "little")
+		value = value & ((1 << bit) - 1) | (value >> (bit + 1) << bit)
+		self.length -= 1
+		self.data[start:] = value.to_bytes((self.length + 7) // 8 - start, "little")
+
+	def toInt(self):
+		"""Returns every bit at once as one big int (bit i = device i)"""
+		return int.from_bytes(self.data, "little")
+
+	def fromInt(self, value):
+		"""Overwrites every bit at once from one big int"""
+		value &= (1 << self.length) - 1 # drop anything past the end
+		self.data[:] = value.to_bytes((self.length + 7) // 8, "little")
+
+	def setAll(self, value):
+		self.fromInt(-1 if value else 0)
+
+	def toFlags(self):
+		"""Returns the bits as bytes, one byte (0 or 1) per bit"""
+		if self.length == 0:
+			return b""
+		# format puts the highest bit first, so the digits are reversed
+		digits = format(self.toInt(), f"0{self.length}b")[::-1]
+		return digits.encode().translate(DIGITSTOFLAGS)
+
+	def flagsToInt(self, flags):
+		"""Packs bytes of 0s and 1s (one per bit) into a big int, like toInt"""
+		digits = bytes(flags).translate(FLAGSTODIGITS)[::-1]
+		return int(digits or b"0", 2)
+
+	def setMask(self, mask, value):
+		"""Sets every bit that's set in mask (a big int) to value"""
+		if value:
+			self.fromInt(self.toInt() | mask)
+		else:
+			self.fromInt(self.toInt() & ~mask)
+
+	def toggleMask(self, mask):
+		"""Flips every bit that's set in mask (a big int)"""
+		self.fromInt(self.toInt() ^ mask)
+
+	def count(self):
+		return self.toInt().bit_count()
+
+	def copy(self):
+		return BitSet.fromBuffer(bytearray(self.data), self.length)
+
+
+class DeviceRecord:
+	"""
+		Storage for a single device that isn't part of a home yet,
+		has the same methods as DeviceStore (with row always 0)
+	"""
+	def __init__(self, kind):
+		self.kind = kind
+		self.switchedOn = False
+		self.consumptionRate = 0
+		self.sleepMode = False
+		self.schedule = bytearray(HOURS)
+
+	@classmethod
+	def fromRow(cls, store, row):
+		"""Makes a record with a copy of a row of a store"""
+		record = cls(store.getKind(row))
+		record.switchedOn = store.getSwitchedOn(row)
+		record.consumptionRate = store.getConsumptionRate(row)
+		record.sleepMode = store.getSleep(row)
+		record.schedule = bytearray(store.getScheduleCodes(row))
+		return record
+
+	def __len__(self):
+		return 1
+
+	def getKind(self, row):
+		return self.kind
+
+	def getSwitchedOn(self, row):
+		return self.switchedOn
+
+	def setSwitchedOn(self, row, switchedOn):
+		self.switchedOn = switchedOn
+
+	def toggleSwitch(self, row):
+		self.switchedOn = not self.switchedOn
+
+	def getConsumptionRate(self, row):
+		return self.consumptionRate
+
+	def setConsumptionRate(self, row, consumptionRate):
+		self.consumptionRate = consumptionRate
+
+	def getSleep(self, row):
+		return self.sleepMode
+
+	def setSleep(self, row, sleepMode):
+		self.sleepMode = sleepMode
+
+	def getAction(self, row, hour):
+		return CODEACTIONS[self.schedule[hour]]
+
+	def setAction(self, row, hour, action):
+		self.schedule[hour] = ACTIONCODES[action]
+
+	def setScheduleCodes(self, row, codes):
+		self.schedule[:] = codes
+
+	def getScheduleCodes(self, row):
+		return bytes(self.schedule)
+
+	def getId(self, row):
+		return None # ids are given out by a home
+
+	def emit(self, event, row=None):
+		pass # nothing can listen to a device that isn't in a home
+
+
+class DeviceStore:
+	"""
+		Column storage for every device in a home, one row per device.
+		Switch and sleep states are bitsets, consumption rates are a byte
+		array and schedules are 24 action codes per device in a bytearray
+	"""
+	def __init__(self):
+		self.listeners = [] # called with (event, row) when devices change
+		# id -> the device objects added to the home, so when a row is removed its
+		# device can be given a copy of it. Weak, as the objects belong to whoever added them
+		self.views = WeakValueDictionary()
+		self.clear()
+
+	def __getstate__(self):
+		# a pickled store is a copy, and the device objects follow the original
+		# (a WeakValueDictionary can't be pickled anyway), so they're left out
+		return dict(vars(self), views=None)
+
+	def __setstate__(self, state):
+		self.__dict__.update(state, views=WeakValueDictionary())
+
+	def clear(self):
+		"""Removes every row"""
+		self.detachAll()
+		self.kinds = bytearray()
+		self.switchedOn = BitSet()
+		self.sleepMode = BitSet()
+		self.consumptionRates = array("B") # rates are always 0 - 150
+		self.schedules = bytearray() # 24 action codes per row, back to back
+
+		# for each hour, a bit per slot set if that device has an on (or off)
+		# action then, so a clock tick only has to look at the devices that are
+		# scheduled to change. It's by slot, which doesn't change when rows are
+		# deleted, so deleting doesn't have to renumber it. The bytearrays only
+		# grow as far as the last slot with an action, so empty schedules cost nothing
+		self.onAtHour = [bytearray() for _ in range(HOURS)]
+		self.offAtHour = [bytearray() for _ in range(HOURS)]
+
+		# running totals, kept up to date as single rows change. Bulk changes
+		# just set counted to False and they're worked out again when next asked for
+		self.counted = True
+		self.onCount = 0
+		self.activeRate = 0 # total consumption rate of the devices switched on
+		self.sleepCount = 0
+		self.kindCounts = [0, 0, 0]
+
+		self.clearSlots()
+
+		# ids start again from 0 once every row has gone, so devices that were
+		# looking at the old rows check this to know they've been removed
+		self.idSpace = object()
+
+	def clearSlots(self):
+		"""
+		Empties the slot table that device ids point into. Until a row is
+		deleted, row i is in slot i so the table isn't needed and isn't made
+		"""
+		self.rowSlots = None # slot of each row
+		self.slotRows = None # row in each slot, -1 if the slot is free
+		self.slotRowsStale = False # rows have moved since slotRows was worked out
+		self.slotGenerations = None
+		self.freeSlots = []
+
+	def __len__(self):
+		return len(self.kinds)
+
+	def append(self, kind, switchedOn=False, consumptionRate=0, sleepMode=False, schedule=EMPTYSCHEDULE):
+		"""Adds a row to the end of every column, returns the new row"""
+		row = len(self.kinds)
+		schedule = checkScheduleCodes(schedule)
+
+		# the columns that can turn a value down (e.g. a rate that isn't a whole
+		# number) go first, and are put back if one does, so a row is never half added
+		try:
+			self.consumptionRates.append(consumptionRate)
+			self.kinds.append(kind)
+		except:
+			del self.consumptionRates[row:]
+			del self.kinds[row:]
+			raise
+
+		self.switchedOn.append(switchedOn)
+		self.sleepMode.append(sleepMode)
+		self.schedules += schedule
+
+		self.addSlots(row, 1)
+		self.countRow(row, 1)
+		if schedule != EMPTYSCHEDULE:
+			self.indexSchedule(self.getSlot(row), EMPTYSCHEDULE, schedule)
+		return row
+
+	def extend(self, kinds, switchedOn, consumptionRates, sleepMode, schedules):
+		"""
+		Adds many rows to the end at once. switchedOn and sleepMode are one
+		byte (0 or 1) per row, schedules are 24 action codes per row back to back
+		"""
+		first = len(self.kinds)
+		self.addSlots(first, len(kinds))
+		self.counted = False
+		self.kinds += kinds
+		self.switchedOn.extendFlags(switchedOn)
+		self.sleepMode.extendFlags(sleepMode)
+		self.consumptionRates.extend(consumptionRates)
+		self.addSchedules(schedules)
+
+	def setColumns(self, kinds, switchedOn, consumptionRates, sleepMode, schedules):
+		"""Replaces every row with whole columns at once, switchedOn and sleepMode are BitSets"""
+		self.clear()
+		self.kinds = bytearray(kinds)
+		self.switchedOn = switchedOn
+		self.sleepMode = sleepMode
+		self.consumptionRates = consumptionRates
+		self.addSchedules(schedules)
+		self.counted = False
+
+	def copy(self):
+		"""
+		Returns a new store with a copy of every row, but none of the listeners.
+		The columns and tables are copied as they are, rather than the rows being
+		added again, so the schedule index isn't built again and ids stay the same
+		"""
+		store = DeviceStore()
+		store.kinds = self.kinds[:]
+		store.switchedOn = self.switchedOn.copy()
+		store.sleepMode = self.sleepMode.copy()
+		store.consumptionRates = self.consumptionRates[:]
+		store.schedules = self.schedules[:]
+		store.onAtHour = [bits[:] for bits in self.onAtHour]
+		store.offAtHour = [bits[:] for bits in self.offAtHour]
+
+		store.counted = self.counted
+		store.onCount = self.onCount
+		store.activeRate = self.activeRate
+		store.sleepCount = self.sleepCount
+		store.kindCounts = self.kindCounts[:]
+
+		if self.rowSlots is not None:
+			store.rowSlots = self.rowSlots[:]
+			store.slotRows = self.slotRows[:]
+			store.slotRowsStale = self.slotRowsStale
+			store.slotGenerations = self.slotGenerations[:]
+			store.freeSlots = self.freeSlots[:]
+		return store
+
+	def takeRows(self, other):
+		"""
+		Replaces every row with another store's rows, the other store shouldn't be used after.
+		This store also becomes the same type as the other, e.g. a MappedDeviceStore
+		"""
+		self.detachAll()
+		# everything but the listeners is row data, so just take it all
+		self.__class__ = other.__class__
+		self.__dict__ = dict(vars(other), listeners=self.listeners, views=WeakValueDictionary())
+
+	def appendFrom(self, storage, row):
+		"""Copies a row from another store (or a DeviceRecord) to the end of this one"""
+		return self.append(
+			storage.getKind(row),
+			storage.getSwitchedOn(row),
+			storage.getConsumptionRate(row),
+			storage.getSleep(row),
+			storage.getScheduleCodes(row)
+		)
+
+	def delete(self, row):
+		"""Removes a row, every later row moves up by one"""
+		self.detachRow(row)
+		self.countRow(row, -1)
+		self.trackSlots()
+		self.indexSchedule(self.rowSlots[row], self.getScheduleCodes(row), EMPTYSCHEDULE)
+		self.freeSlot(self.rowSlots[row])
+
+		# every later row moves up, but only rowSlots (like the columns) has to
+		# move with them. The schedule index is by slot so it doesn't change, and
+		# slotRows is worked out again the next time a row is found from its slot,
+		# so deleting many rows in a row only does that once
+		del self.rowSlots[row]
+		self.slotRowsStale = True
+
+		del self.kinds[row]
+		self.switchedOn.delete(row)
+		self.sleepMode.delete(row)
+		del self.consumptionRates[row]
+		del self.schedules[row * HOURS:(row + 1) * HOURS]
+
+	def deleteUnordered(self, row):
+		"""
+		Removes a row in constant time by moving the last row into its place,
+		rather than moving every later row up. Returns the row that was last
+		"""
+		last = len(self) - 1
+		self.detachRow(row)
+		self.countRow(row, -1)
+		self.trackSlots()
+		self.indexSchedule(self.rowSlots[row], self.getScheduleCodes(row), EMPTYSCHEDULE)
+		self.freeSlot(self.rowSlots[row])
+
+		if row != last:
+			self.kinds[row] = self.kinds[last]
+			self.switchedOn.set(row, self.switchedOn.get(last))
+			self.sleepMode.set(row, self.sleepMode.get(last))
+			self.consumptionRates[row] = self.consumptionRates[last]
+			# the last row keeps its slot, so the schedule index doesn't change
+			self.schedules[row * HOURS:(row + 1) * HOURS] = self.schedules[last * HOURS:]
+
+			self.rowSlots[row] = self.rowSlots[last]
+			self.slotRows[self.rowSlots[row]] = row
+
+		self.kinds.pop()
+		self.switchedOn.pop()
+		self.sleepMode.pop()
+		self.consumptionRates.pop()
+		del self.schedules[last * HOURS:]
+		self.rowSlots.pop()
+		return last
+
+	def detachRow(self, row):
+		"""Gives the device object added for a row a copy of it, before the row is removed"""
+		deviceId = self.getId(row)
+		device = self.views.pop(deviceId, None)
+		if device is not None:
+			device.detach(self, deviceId)
+
+	def detachAll(self):
+		"""Gives every device object added to the store a copy of its row, before every row is replaced"""
+		for deviceId, device in list(self.views.items()):
+			device.detach(self, deviceId)
+		self.views.clear()
+
+	def trackSlots(self):
+		"""Makes the slot table, before rows stop being in the slot with the same number"""
+		if self.rowSlots is None:
+			self.rowSlots = array("I", range(len(self)))
+			self.slotRows = array("q", range(len(self)))
+			self.slotGenerations = array("I", bytes(4 * len(self)))
+
+	def updateSlotRows(self):
+		"""Works out slotRows again from rowSlots if deletes have moved rows since it last was"""
+		if self.slotRowsStale:
+			slotRows = array("q", [-1]) * len(self.slotRows)
+			scatter(slotRows, self.rowSlots, range(len(self.rowSlots)))
+			self.slotRows = slotRows
+			self.slotRowsStale = False
+
+	def getSlot(self, row):
+		return row if self.rowSlots is None else self.rowSlots[row]
+
+	def slotsToRows(self, slots):
+		"""Returns the rows of the devices in some slots (an iterable)"""
+		if self.rowSlots is None:
+			return slots
+		self.updateSlotRows()
+		return map(self.slotRows.__getitem__, slots)
+
+	def addSlots(self, firstRow, count):
+		"""Gives slots to count new rows from firstRow, reusing free slots first"""
+		if self.rowSlots is None:
+			return # the new rows are in the slots with their numbers
+
+		reused = self.freeSlots[len(self.freeSlots) - min(count, len(self.freeSlots)):]
+		del self.freeSlots[len(self.freeSlots) - len(reused):]
+		new = range(len(self.slotRows), len(self.slotRows) + count - len(reused))
+		self.slotRows.extend(new)
+		self.slotGenerations.frombytes(bytes(4 * len(new)))
+
+		slots = reused + list(new)
+		self.rowSlots.extend(slots)
+		scatter(self.slotRows, slots, range(firstRow, firstRow + count))
+
+	def freeSlot(self, slot):
+		# the generation goes up so ids for the old device stop working
+		self.slotRows[slot] = -1
+		self.slotGenerations[slot] = (self.slotGenerations[slot] + 1) & SLOTMASK
+		self.freeSlots.append(slot)
+
+	def getId(self, row):
+		"""Returns the id of the device in a row, which stays the same when other rows move"""
+		if self.rowSlots is None:
+			return row
+		slot = self.rowSlots[row]
+		return self.slotGenerations[slot] << SLOTBITS | slot
+
+	def getSlotId(self, slot):
+		"""Returns the id of the device in a slot, or None if the slot is free"""
+		if self.rowSlots is None:
+			return slot if slot < len(self) else None
+		self.updateSlotRows()
+		if slot < len(self.slotRows) and self.slotRows[slot] != -1:
+			return self.slotGenerations[slot] << SLOTBITS | slot
+		return None
+
+	def getRow(self, deviceId):
+		"""Returns the row of the device with an id, raises if there isn't one"""
+		slot = deviceId & SLOTMASK
+		generation = deviceId >> SLOTBITS
+
+		if self.rowSlots is None:
+			if generation == 0 and slot < len(self):
+				return slot
+			raise ValueError("No device with that ID")
+
+		self.updateSlotRows()
+		if slot < len(self.slotRows) and self.slotGenerations[slot] == generation and self.slotRows[slot] != -1:
+			return self.slotRows[slot]
+		raise ValueError("No device with that ID")
+
+	def addListener(self, listener):
+		self.listeners.append(listener)
+
+	def removeListener(self, listener):
+		self.listeners.remove(listener)
+
+	def emit(self, event, row=None):
+		for listener in self.listeners:
+			listener(event, row)
+
+	def getKind(self, row):
+		return self.kinds[row]
+
+	def getSwitchedOn(self, row):
+		return self.switchedOn.get(row)
+
+	def setSwitchedOn(self, row, switchedOn):
+		self.countRow(row, -1)
+		try:
+			self.switchedOn.set(row, switchedOn)
+		finally:
+			self.countRow(row, 1)
+
+	def toggleSwitch(self, row):
+		self.countRow(row, -1)
+		try:
+			self.switchedOn.toggle(row)
+		finally:
+			self.countRow(row, 1)
+
+	def setAllSwitchedOn(self, switchedOn):
+		self.switchedOn.setAll(switchedOn)
+		self.counted = False
+
+	def getConsumptionRate(self, row):
+		return self.consumptionRates[row]
+
+	def setConsumptionRate(self, row, consumptionRate):
+		self.countRow(row, -1)
+		try:
+			self.consumptionRates[row] = consumptionRate
+		finally:
+			self.countRow(row, 1)
+
+	def getSleep(self, row):
+		return self.sleepMode.get(row)
+
+	def setSleep(self, row, sleepMode):
+		self.countRow(row, -1)
+		try:
+			self.sleepMode.set(row, sleepMode)
+		finally:
+			self.countRow(row, 1)
+
+	def getAction(self, row, hour):
+		return CODEACTIONS[self.schedules[row * HOURS + hour]]
+
+	def setAction(self, row, hour, action):
+		i = row * HOURS + hour
+		oldCode = self.schedules[i]
+		self.schedules[i] = ACTIONCODES[action]
+		# just this hour of the index changes, take the row out for the old action and in for the new
+		slot = self.getSlot(row)
+		for code in (oldCode, self.schedules[i]):
+			if code == ACTIONCODES[True]:
+				toggleBit(self.onAtHour[hour], slot)
+			elif code == ACTIONCODES[False]:
+				toggleBit(self.offAtHour[hour], slot)
+
+	def getScheduleCodes(self, row):
+		return bytes(self.schedules[row * HOURS:(row + 1) * HOURS])
+
+	def setScheduleCodes(self, row, codes):
+		"""Sets a row's whole schedule (24 action codes) at once"""
+		codes = checkScheduleCodes(codes)
+		self.indexSchedule(self.getSlot(row), self.getScheduleCodes(row), codes)
+		self.schedules[row * HOURS:(row + 1) * HOURS] = codes
+
+	def getScheduleMasks(self, row):
+		"""Returns the hours a row's schedule switches it on and off, as 24 bit masks"""
+		codes = self.getScheduleCodes(row)
+		return int(codes.translate(ONDIGITS)[::-1], 2), int(codes.translate(OFFDIGITS)[::-1], 2)
+
+	def scheduleColumn(self, start=0, end=None):
+		"""Returns every row's schedule (or those of rows start to end) as 24 action codes, back to back"""
+		start, end, _ = slice(start, end).indices(len(self))
+		return bytes(self.schedules[start * HOURS:end * HOURS])
+
+	def indexSchedule(self, slot, oldCodes, codes):
+		"""Moves a slot in the per hour index from the hours of one schedule's actions to another's"""
+		if oldCodes == codes:
+			return
+		# flipping the slot's bits for the old actions takes it out and for the
+		# new ones puts it in, an hour with the same action in both is flipped back
+		for onHours, offHours in (scheduleHours(oldCodes), scheduleHours(codes)):
+			for hour in onHours:
+				toggleBit(self.onAtHour[hour], slot)
+			for hour in offHours:
+				toggleBit(self.offAtHour[hour], slot)
+
+	def addSchedules(self, schedules):
+		"""
+		Adds the schedules (24 action codes per row, back to back) of rows that have
+		just been added to the other columns, e.g. by extend, and indexes them
+		"""
+		schedules = bytes(schedules)
+		firstRow = len(self.schedules) // HOURS
+		self.schedules += schedules
+		rows = range(firstRow, len(self.schedules) // HOURS)
+		if not self.isFewRows(rows):
+			self.reindexRows(rows, bytes(len(schedules)), schedules)
+			return
+
+		# find skips straight to the next row with an action in C, so rows
+		# with an empty schedule cost nothing
+		actions = schedules.translate(ANYACTION)
+		pos = actions.find(1)
+		while pos != -1:
+			row = pos // HOURS
+			self.indexSchedule(self.getSlot(firstRow + row), EMPTYSCHEDULE, schedules[row * HOURS:(row + 1) * HOURS])
+			pos = actions.find(1, (row + 1) * HOURS)
+
+	def mapSchedules(self, rows, change):
+		"""
+		Gives many rows new schedules, change(codes) returns the new action
+		codes for a schedule. It's called once for each different schedule
+		the rows have rather than once per row, and every new schedule is
+		checked before any row is changed
+		"""
+		rows = list(rows)
+		if rows and (min(rows) < 0 or max(rows) >= len(self)):
+			raise IndexError("Row out of range")
+		spans = [slice(row * HOURS, (row + 1) * HOURS) for row in rows]
+		oldCodes = list(map(bytes, map(self.schedules.__getitem__, spans)))
+		newCodesOf = {codes: checkScheduleCodes(change(codes)) for codes in set(oldCodes)}
+		newCodes = list(map(newCodesOf.__getitem__, oldCodes))
+
+		if self.isFewRows(rows):
+			callEach(self.setScheduleCodes, rows, newCodes)
+			return
+		self.reindexRows(rows, b"".join(oldCodes), b"".join(newCodes))
+		scatter(self.schedules, spans, newCodes)
+
+	def reindexRows(self, rows, oldSchedules, schedules):
+		"""
+		Moves many rows in the per hour index from their old schedules to their
+		new ones (24 action codes per row, back to back) at once. Each hour is
+		done in one go, with every row's old and new action then picked out together
+		"""
+		slots = rows if self.rowSlots is None else list(map(self.rowSlots.__getitem__, rows))
+		# rows one after another in the slots with their numbers (e.g. added by
+		# extend before any row's been deleted) already line up with the index bits
+		inOrder = isinstance(slots, range) and slots.step == 1
+		for hour in range(HOURS):
+			for index, digits in ((self.onAtHour, ONDIGITS), (self.offAtHour, OFFDIGITS)):
+				# bit i is set if the action of rows[i] at hour changes to or from this one
+				old = int(oldSchedules[hour::HOURS].translate(digits)[::-1] or b"0", 2)
+				new = int(schedules[hour::HOURS].translate(digits)[::-1] or b"0", 2)
+				changed = old ^ new
+				if not changed:
+					continue
+				if inOrder:
+					toggleMask(index[hour], changed << slots.start)
+				else:
+					flags = format(changed, f"0{len(slots)}b")[::-1].encode().translate(DIGITSTOFLAGS)
+					toggleBits(index[hour], list(compress(slots, flags)))
+
+	def applyScheduleAt(self, hour):
+		"""
+		Switches on/off the rows with an action at the given hour,
+		returns the rows that actually changed
+		"""
+		changed = []
+		onSlots = setBitPositions(int.from_bytes(self.onAtHour[hour], "little"))
+		for row in self.slotsToRows(onSlots):
+			if not self.switchedOn.get(row):
+				self.setSwitchedOn(row, True)
+				changed.append(row)
+
+		offSlots = setBitPositions(int.from_bytes(self.offAtHour[hour], "little"))
+		for row in self.slotsToRows(offSlots):
+			if self.switchedOn.get(row):
+				self.setSwitchedOn(row, False)
+				changed.append(row)
+
+		return changed
+
+	def countRow(self, row, sign):
+		"""
+		Adds a row to the running totals (sign 1) or takes it away (sign -1).
+		Single row changes take the row away, write, and add it back in a
+		finally, so if the write raises the row's old values go back in
+		"""
+		if self.counted:
+			switchedOn = self.switchedOn.get(row)
+			self.onCount += sign * switchedOn
+			self.activeRate += sign * switchedOn * self.consumptionRates[row]
+			self.sleepCount += sign * self.sleepMode.get(row)
+			self.kindCounts[self.kinds[row]] += sign
+
+	def recount(self):
+		"""Works out the running totals again from whole columns at once"""
+		self.onCount = self.switchedOn.count()
+		self.sleepCount = self.sleepMode.count()
+		self.kindCounts = [self.countKind(kind) for kind in (DEVICE, PLUG, DOORBELL)]
+		self.activeRate = sum(self.activeRates())
+		self.counted = True
+
+	def getTotals(self):
+		"""Returns the running totals, see SmartHome.getTotals"""
+		if not self.counted:
+			self.recount()
+
+		return {
+			"activeWattage": self.activeRate,
+			"switchedOn": self.onCount,
+			"switchedOff": len(self) - self.onCount,
+			"sleepingDoorbells": self.sleepCount,
+			"plugs": self.kindCounts[PLUG],
+			"doorbells": self.kindCounts[DOORBELL]
+		}
+
+	############################################
+	# Bulk operations, these work on whole columns at once
+	# rather than going through a device at a time
+	############################################
+	def countKind(self, kind):
+		return self.kinds.count(kind)
+
+	def kindFlags(self, kind):
+		"""Returns one byte per device, 1 if it's of the given kind"""
+		table = bytes(1 if b == kind else 0 for b in range(256))
+		return self.kinds.translate(table)
+
+	def rateFlags(self, threshold):
+		"""Returns one byte per device, 1 if its consumption rate is over threshold"""
+		table = bytes(1 if b > threshold else 0 for b in range(256))
+		return self.consumptionRates.tobytes().translate(table)
+
+	def activeRates(self):
+		"""Returns one byte per device, its consumption rate if it's switched on or 0 if not"""
+		# and-ing the rates with 0xFF for devices that are on and 0 for those
+		# that are off leaves just the rates of the devices that are on
+		onMask = int.from_bytes(self.switchedOn.toFlags().translate(FLAGSTOMASK), "little")
+		rates = int.from_bytes(self.consumptionRates.tobytes(), "little") & onMask
+		return rates.to_bytes(len(self), "little")
+
+	def actionFlags(self, hour, action):
+		"""Returns one byte per device, 1 if its scheduled action at hour is action (True or False)"""
+		# every row's action at hour is every 24th byte of the column
+		return self.schedules[hour::HOURS].translate(ACTIONFLAGS[action])
+
+	def rowFlags(self, rows):
+		"""
+		Returns one byte per device, 1 if its row is in rows. Raises IndexError
+		if any row is out of range, negative rows included
+		"""
+		length = len(self)
+		span = rowsSlice(rows)
+		if span is not None:
+			if span.start < 0 or span.stop > length:
+				raise IndexError("Row out of range")
+			flags = bytearray(length)
+			flags[span] = bytes([1]) * len(rows)
+			return flags
+
+		# a row past the end raises as it's set, but a negative one would count
+		# back from the end, so those are looked for first
+		rows = rows if isinstance(rows, (list, range)) else list(rows)
+		if rows and min(rows) < 0:
+			raise IndexError("Row out of range")
+		flags = bytearray(length)
+		scatter(flags, rows, repeat(1))
+		return flags
+
+	def isFewRows(self, rows):
+		"""
+		Whether rows (a list or range) are few enough to change one at a time,
+		which keeps the running totals up to date. They're checked if they are
+		"""
+		if len(rows) * FEWROWS >= len(self):
+			return False
+		if rows and (min(rows) < 0 or max(rows) >= len(self)):
+			raise IndexError("Row out of range")
+		return True
+
+	# the bulk changes below check every row before changing any
+	def setSwitchedOnMany(self, rows, switchedOn):
+		if self.isFewRows(rows):
+			for row in rows:
+				self.setSwitchedOn(row, switchedOn)
+			return
+		self.setSwitchedOnFlags(self.rowFlags(rows), switchedOn)
+
+	def toggleSwitchMany(self, rows):
+		"""Flips each of the rows once, even if a row is given twice"""
+		if self.isFewRows(rows):
+			for row in set(rows):
+				self.toggleSwitch(row)
+			return
+		self.switchedOn.toggleMask(self.switchedOn.flagsToInt(self.rowFlags(rows)))
+		self.counted = False
+
+	def setSwitchedOnFlags(self, flags, switchedOn):
+		"""Sets every device with a 1 in flags (one byte per device) to switchedOn"""
+		self.switchedOn.setMask(self.switchedOn.flagsToInt(flags), switchedOn)
+		self.counted = False
+
+	def setSwitchedOnOverRate(self, threshold, switchedOn):
+		"""Sets every plug using more than threshold to switchedOn"""
+		# the flags are all 0 or 1, so and-ing them as big ints ands each device
+		plugs = int.from_bytes(self.kindFlags(PLUG), "little")
+		overRate = int.from_bytes(self.rateFlags(threshold), "little")
+		flags = (plugs & overRate).to_bytes(len(self), "little")
+		self.setSwitchedOnFlags(flags, switchedOn)
+
+	def setConsumptionRateMany(self, rows, consumptionRates):
+		"""
+		Sets the rate of each row, consumptionRates is one int for all or an
+		array("B") with one per row, so every rate is known to fit before any is written
+		"""
+		if self.isFewRows(rows):
+			if isinstance(consumptionRates, int):
+				consumptionRates = repeat(consumptionRates)
+			for row, consumptionRate in zip(rows, consumptionRates):
+				self.setConsumptionRate(row, consumptionRate)
+			return
+
+		span = rowsSlice(rows)
+		if span is not None:
+			if span.start < 0 or span.stop > len(self):
+				raise IndexError("Row out of range")
+			if isinstance(consumptionRates, int):
+				consumptionRates = bytes([consumptionRates]) * len(rows)
+			self.counted = False
+			memoryview(self.consumptionRates)[span] = consumptionRates
+			return
+
+		if rows and (min(rows) < 0 or max(rows) >= len(self)):
+			raise IndexError("Row out of range")
+		self.counted = False
+		if isinstance(consumptionRates, int):
+			consumptionRates = repeat(consumptionRates)
+		scatter(self.consumptionRates, rows, consumptionRates)
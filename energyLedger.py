@@ -0,0 +1,218 @@
+from deviceStore import *
+import heapq
+import sys
+
+# how much history is kept, one simulated hour is recorded per clock tick
+DAYSKEPT = 31
+DAYSPERMONTH = 30 # the clock doesn't have a calendar, so every month is 30 days
+MONTHSKEPT = 12
+
+# every device's total is kept in one big int, with a fixed width "lane" of
+# bytes per device slot, so adding an hour to every device is one big int add.
+# A day is at most 150W * 24h = 3600Wh (a week 25200Wh) so fits in 2 bytes,
+# and a year fits in 4
+HOURWIDTH = 1
+DAYWIDTH = 2
+MONTHWIDTH = 4
+
+PERIODS = ("hour", "day", "week", "month", "year")
+
+
+def widenLanes(value, numLanes, fromWidth, toWidth):
+	"""Returns a big int of lanes with each lane widened from fromWidth bytes to toWidth"""
+	data = value.to_bytes(numLanes * fromWidth, "little")
+	wide = bytearray(numLanes * toWidth)
+	for i in range(fromWidth):
+		wide[i::toWidth] = data[i::fromWidth]
+	return int.from_bytes(wide, "little")
+
+def lanesToArray(value, numLanes, width):
+	"""Returns an array with a number for each lane of a big int"""
+	lanes = array({HOURWIDTH: "B", DAYWIDTH: "H", MONTHWIDTH: "I"}[width])
+	lanes.frombytes(value.to_bytes(numLanes * width, "little"))
+	if sys.byteorder == "big":
+		lanes.byteswap()
+	return lanes
+
+def laneMask(slots, numLanes, width):
+	"""Returns a big int with every lane's bits set, apart from the lanes for slots"""
+	mask = bytearray(b"\xff" * (numLanes * width))
+	for slot in slots:
+		mask[slot * width:(slot + 1) * width] = bytes(width)
+	return int.from_bytes(mask, "little")
+
+
+class EnergyLedger:
+	"""
+		Records how much energy (in Wh) each device in a home uses, an hour at
+		a time. Hours are added up into days and days into months as they're
+		recorded, so asking about a week or a year adds a few totals together
+		rather than every hour. Devices are kept by the slot in their id, so
+		their history stays with them as other devices are added and removed.
+		A removed device's history goes with it, but it still counts towards
+		the whole home's totals
+	"""
+	def __init__(self, home):
+		self.home = home
+		self.clear()
+
+	def clear(self):
+		"""Forgets everything recorded so far, e.g. when the home's devices are replaced"""
+		self.hoursRecorded = 0
+		self.numLanes = 0 # number of device slots when last recorded
+		self.generations = b"" # slot generations when last recorded, to spot removed devices
+
+		# the last day's hours (bytes, one per slot), finished days and finished months
+		self.hours = deque(maxlen=HOURS)
+		self.days = deque(maxlen=DAYSKEPT)
+		self.months = deque(maxlen=MONTHSKEPT)
+		self.today = 0 # the hours so far today, added up
+		self.thisMonth = 0 # the days so far this month, not counting today
+
+		# the same, but for the whole home
+		self.hourTotals = deque(maxlen=HOURS)
+		self.dayTotals = deque(maxlen=DAYSKEPT)
+		self.monthTotals = deque(maxlen=MONTHSKEPT)
+		self.todayTotal = 0
+		self.thisMonthTotal = 0
+
+	def record(self):
+		"""
+		Records an hour of each device using its consumption rate if it's
+		switched on, call once per simulated hour (e.g. every clock tick)
+		"""
+		store = self.home.store
+		self.forgetRemoved(store)
+
+		hour = self.slotOrder(store, store.activeRates())
+		self.numLanes = max(self.numLanes, len(hour))
+		total = sum(hour)
+
+		self.hours.append(hour)
+		self.hourTotals.append(total)
+		self.today += widenLanes(int.from_bytes(hour, "little"), len(hour), HOURWIDTH, DAYWIDTH)
+		self.todayTotal += total
+		self.hoursRecorded += 1
+
+		if self.hoursRecorded % HOURS == 0:
+			self.days.append(self.today)
+			self.dayTotals.append(self.todayTotal)
+			self.thisMonth += widenLanes(self.today, self.numLanes, DAYWIDTH, MONTHWIDTH)
+			self.thisMonthTotal += self.todayTotal
+			self.today = 0
+			self.todayTotal = 0
+
+			if self.hoursRecorded % (HOURS * DAYSPERMONTH) == 0:
+				self.months.append(self.thisMonth)
+				self.monthTotals.append(self.thisMonthTotal)
+				self.thisMonth = 0
+				self.thisMonthTotal = 0
+
+	def slotOrder(self, store, rowValues):
+		"""Reorders one byte per row into one byte per slot, 0 for free slots"""
+		if store.rowSlots is None:
+			return rowValues # row i is in slot i
+
+		values = bytearray(len(store.slotRows))
+		scatter(values, store.rowSlots, rowValues)
+		return bytes(values)
+
+	def forgetRemoved(self, store):
+		"""Clears the history of slots whose device has been removed since the last record"""
+		if store.slotGenerations is None:
+			return # nothing has been removed
+
+		# a slot's generation goes up when its device is removed, and before
+		# there's a slot table every slot is on generation 0
+		generations = store.slotGenerations.tobytes()
+		recorded = self.generations.ljust(self.numLanes * 4, b"\x00")
+		common = min(len(generations), len(recorded)) // 4 * 4
+		self.generations = generations
+		if generations[:common] == recorded[:common]:
+			return
+
+		old = array("I", recorded[:common])
+		removed = [slot for slot in range(len(old)) if old[slot] != store.slotGenerations[slot]]
+
+		hourMask = laneMask(removed, self.numLanes, HOURWIDTH)
+		self.hours = deque(
+			[(int.from_bytes(hour, "little") & hourMask).to_bytes(len(hour), "little") for hour in self.hours],
+			maxlen=HOURS
+		)
+
+		dayMask = laneMask(removed, self.numLanes, DAYWIDTH)
+		self.days = deque([day & dayMask for day in self.days], maxlen=DAYSKEPT)
+		self.today &= dayMask
+
+		monthMask = laneMask(removed, self.numLanes, MONTHWIDTH)
+		self.months = deque([month & monthMask for month in self.months], maxlen=MONTHSKEPT)
+		self.thisMonth &= monthMask
+
+	def rollup(self, period):
+		"""
+		Returns every slot's use over a period as a big int of lanes, and the
+		width of its lanes. hour is the last hour recorded, day and month are
+		so far today and this month, week and year go back 7 days and 12 months
+		"""
+		if period == "hour":
+			return int.from_bytes(self.hours[-1], "little") if self.hours else 0, HOURWIDTH
+		if period == "day":
+			return self.today, DAYWIDTH
+		if period == "week":
+			return self.today + sum(list(self.days)[-6:]), DAYWIDTH
+
+		month = self.thisMonth + widenLanes(self.today, self.numLanes, DAYWIDTH, MONTHWIDTH)
+		if period == "month":
+			return month, MONTHWIDTH
+		if period == "year":
+			return month + sum(list(self.months)[-11:]), MONTHWIDTH
+		raise ValueError(f"Period must be one of {', '.join(PERIODS)}")
+
+	def getUsage(self, period="day"):
+		"""Returns an array of how much each slot used over a period"""
+		value, width = self.rollup(period)
+		return lanesToArray(value, self.numLanes, width)
+
+	def getEnergy(self, deviceId, period="day"):
+		"""Returns how much a device has used over a period"""
+		self.home.getIndexOf(deviceId) # raises if there's no device with this id
+		slot = deviceId & SLOTMASK
+
+		value, width = self.rollup(period)
+		return value >> (slot * width * 8) & ((1 << width * 8) - 1)
+
+	def getHourlyEnergy(self, deviceId):
+		"""Returns how much a device used in each of the last 24 hours recorded, oldest first"""
+		self.home.getIndexOf(deviceId)
+		slot = deviceId & SLOTMASK
+		return [hour[slot] if slot < len(hour) else 0 for hour in self.hours]
+
+	def getTotalEnergy(self, period="day"):
+		"""Returns how much the whole home has used over a period"""
+		if period == "hour":
+			return self.hourTotals[-1] if self.hourTotals else 0
+		if period == "day":
+			return self.todayTotal
+		if period == "week":
+			return self.todayTotal + sum(list(self.dayTotals)[-6:])
+		if period == "month":
+			return self.thisMonthTotal + self.todayTotal
+		if period == "year":
+			return self.thisMonthTotal + self.todayTotal + sum(list(self.monthTotals)[-11:])
+		raise ValueError(f"Period must be one of {', '.join(PERIODS)}")
+
+	def topConsumers(self, count=100, period="week"):
+		"""Returns (device id, Wh) for the count devices that used the most over a period, most first"""
+		usage = self.getUsage(period)
+		store = self.home.store
+
+		# free slots might still have some history until the next record,
+		# so ask for enough extra to be able to skip them
+		slots = heapq.nlargest(count + len(store.freeSlots), range(len(usage)), key=usage.__getitem__)
+
+		top = []
+		for slot in slots:
+			deviceId = store.getSlotId(slot)
+			if deviceId is not None and usage[slot] > 0:
+				top.append((deviceId, usage[slot]))
+		return top[:count]
@@ -1,4 +1,5 @@
 from backendChallenge import *
+from widgetPool import *
 from tkinter import *
 from tkinter import messagebox
 
@@ -48,7 +49,9 @@ class SmartHomeSystem:
 			raise ValueError("Home must be a SmartHome")
 
 		self.home = home
-		self.deviceWidgets = [] # list of widgets to be destroyed on refresh
+		self.deviceWidgets = [] # (key, widget) pairs to be released back to the pool on refresh
+		self.widgetPool = WidgetPool()
+		self.dialogPool = DialogPool() # closed dialogs, shown again when next opened
 
 		self.win = Tk()
 		self.win.title("Smart Home System")
@@ -99,12 +102,11 @@ class SmartHomeSystem:
 
 	def refreshDeviceList(self):
 		"""
-		Removes all widgets from the devicesFrame and re-creates
-		them with current devices/statuses
+		Puts all widgets in the devicesFrame back in the pool and
+		re-draws them with current devices/statuses
 		"""
 
-		for widget in self.deviceWidgets:
-			widget.destroy()
+		self.widgetPool.releaseAll(self.deviceWidgets)
 
 		devices = self.home.getDevices()
 		numDevices = len(devices)
@@ -114,12 +116,15 @@ class SmartHomeSystem:
 			self.createDeviceRow(self.deviceWidgets, self.devicesFrame, device, i)
 
 		if numDevices == 0:
-			noDevicesLabel = Label(self.devicesFrame, text="No devices")
+			noDevicesLabel = self.widgetPool.get("noDevicesLabel", lambda: Label(self.devicesFrame, text="No devices"))
 			noDevicesLabel.grid(row=0, column=0, columnspan=4)
-			self.deviceWidgets.append(noDevicesLabel)
+			self.deviceWidgets.append(("noDevicesLabel", noDevicesLabel))
 
 	def createDeviceRow(self, widgetList, parentFrame, device, i):
-		"""Creates a row of widgets for a device, and draws it to the given frame"""
+		"""
+		Draws a row of widgets for a device to the given frame,
+		reusing widgets from the pool where it can
+		"""
 
 		if not isinstance(parentFrame, Frame):
 			raise ValueError("Widget must be a Frame")
@@ -138,39 +143,36 @@ class SmartHomeSystem:
 		else:
 			textLabel = "Unknown device"
 
-		deviceLabel = Label(parentFrame, text=textLabel, width=28)
+		deviceLabel = self.widgetPool.get("deviceLabel", lambda: Label(parentFrame, width=28))
+		deviceLabel.config(text=textLabel)
 		deviceLabel.grid(row=i, column=0, padx=10, pady=5)
-		widgetList.append(deviceLabel) # add to list to be destroyed later
+		widgetList.append(("deviceLabel", deviceLabel)) # add to list to be released later
 
-		
-		toggleButt = Button(
-			parentFrame,
-			text="Toggle",
-			padx=5,
-			command=lambda: self.toggleDeviceAt(i)
-		)
-		
+		toggleButt = self.getRowButton("toggleButt", parentFrame, i, self.toggleDeviceAt, text="Toggle")
 		toggleButt.grid(row=i, column=1, pady=5, padx=2.5)
-		widgetList.append(toggleButt)
+		widgetList.append(("toggleButt", toggleButt))
 
-		editButt = Button(
-			parentFrame,
-			text="Edit",
-			padx=5,
-			command=lambda: self.editDeviceWindow(i)
-		)
+		editButt = self.getRowButton("editButt", parentFrame, i, self.editDeviceWindow, text="Edit")
 		editButt.grid(row=i, column=2, pady=5, padx=2.5)
-		widgetList.append(editButt)
+		widgetList.append(("editButt", editButt))
 
-		removeButt = Button(
-			parentFrame,
-			text="Delete",
-			padx=5,
-			fg="red",
-			command=lambda: self.removeDeviceAt(i)
-		)
+		removeButt = self.getRowButton("removeButt", parentFrame, i, self.removeDeviceAt, text="Delete", fg="red")
 		removeButt.grid(row=i, column=3, pady=5, padx=2.5)
-		widgetList.append(removeButt)
+		widgetList.append(("removeButt", removeButt))
+
+	def getRowButton(self, key, parentFrame, i, action, **options):
+		"""Gets a button from the pool that calls action with the index of the row it's on"""
+
+		def makeButton():
+			butt = Button(parentFrame, padx=5, **options)
+			# the command is only set once, as tkinter keeps every command it's given
+			# until the widget is destroyed, so the row index is looked up when clicked
+			butt.config(command=lambda: action(butt.deviceIndex))
+			return butt
+
+		butt = self.widgetPool.get(key, makeButton)
+		butt.deviceIndex = i
+		return butt
 
 	############################################
 	# Device manipulation functions
@@ -201,7 +203,16 @@ class SmartHomeSystem:
 	############################################
 	def addDeviceWindow(self):
 		"""Shows a window that allows a user to add a device to the home"""
+		# there's only ever one add window, clicking again brings it forward
+		if self.dialogPool.getShowing("add"):
+			self.dialogPool.getShowing("add")[0].lift()
+			return
+
+		addWin = self.dialogPool.get("add", self.makeAddWindow)
+		addWin.consumptionVar.set(0)
 
+	def makeAddWindow(self):
+		"""Builds the add window, it's kept and reused after it's closed"""
 		addWin = Toplevel(self.win)
 		addWin.title("Add a device")
 		addWin.resizable(False, False)
@@ -209,13 +220,13 @@ class SmartHomeSystem:
 		consumptionText = Label(addWin, text="Plug consumption rate (0-150):")
 		consumptionText.grid(row=0, column=0, padx=10, pady=10)
 
-		consumptionVar = IntVar(value=0)
+		addWin.consumptionVar = IntVar(value=0)
 		consumptionEntry = Spinbox(
 			addWin,
 			from_=0,
 			to=150,
 			width=4,
-			textvariable=consumptionVar,
+			textvariable=addWin.consumptionVar,
 			wrap=True
 		)
 		consumptionEntry.grid(row=0, column=1, padx=10, pady=10)
@@ -225,7 +236,7 @@ class SmartHomeSystem:
 			text="Add a plug",
 			# we need to pass the tk variable here rather than its value
 			# so we can show a warning if it's invalid before adding the device
-			command=lambda: self.addPlug(addWin, consumptionVar)
+			command=lambda: self.addPlug(addWin, addWin.consumptionVar)
 		)
 		addPlugButt.grid(row=1, column=0, columnspan=2,
 		                 padx=10, pady=10, sticky=EW)
@@ -241,12 +252,12 @@ class SmartHomeSystem:
 		addDoorbellButt.grid(row=3, column=0, columnspan=2,
 		                     padx=10, pady=10, sticky=EW)
 
-		addWin.mainloop()
+		return addWin
 
 	def addPlug(self, addWin, consumptionVar):
 		"""
 		From the add window, adds a plug to the home,
-		then destroys the window and refreshes the device list
+		then closes the window and refreshes the device list
 		"""
 		try:
 			consumption = consumptionVar.get()
@@ -265,16 +276,16 @@ class SmartHomeSystem:
 			return
 
 		self.home.addDevice(SmartPlug(consumption))
-		addWin.destroy()
+		self.dialogPool.release("add", addWin)
 		self.refreshDeviceList()
 
 	def addDoorbell(self, addWin):
 		"""
 		From the add window, adds a doorbell to the home,
-		then destroys the window and refreshes the device list
+		then closes the window and refreshes the device list
 		"""
 		self.home.addDevice(SmartDoorbell())
-		addWin.destroy()
+		self.dialogPool.release("add", addWin)
 		self.refreshDeviceList()
 
 	############################################
@@ -288,58 +299,83 @@ class SmartHomeSystem:
 		device = self.home.getDeviceAt(i)
 		deviceType = "plug" if isinstance(device, SmartPlug) else "doorbell"
 
-		editWin = Toplevel(self.win)
+		# if the device is already being edited bring its window forward
+		for editWin in self.dialogPool.getShowing("editPlug") + self.dialogPool.getShowing("editDoorbell"):
+			if editWin.index == i:
+				editWin.lift()
+				return
+
+		# plugs and doorbells have different windows, a closed one is reused for the next device
+		if deviceType == "plug":
+			editWin = self.dialogPool.get("editPlug", self.makeEditPlugWindow)
+			editWin.consumptionVar.set(device.getConsumptionRate())
+		else:
+			editWin = self.dialogPool.get("editDoorbell", self.makeEditDoorbellWindow)
+			editWin.sleepModeVar.set(device.getSleep())
+
+		editWin.index = i
 		editWin.title(f"{deviceType.title()} at index {i}")
+		editWin.label.config(text=f"{deviceType.title()} at index {i}")
+
+	def makeEditWindow(self):
+		"""Builds the parts of the edit window that plugs and doorbells share"""
+		editWin = Toplevel(self.win)
 		editWin.resizable(False, False)
+		editWin.index = None
 
-		label = Label(editWin, text=f"{deviceType.title()} at index {i}")
-		label.grid(row=0, column=0, padx=10, columnspan=2, pady=10)
+		editWin.label = Label(editWin)
+		editWin.label.grid(row=0, column=0, padx=10, columnspan=2, pady=10)
+		return editWin
 
-		if deviceType == "plug":
-			consumptionText = Label(editWin, text="Consumption rate:")
-			consumptionText.grid(row=1, column=0, padx=10)
-
-			consumptionVar = IntVar(value=device.getConsumptionRate())
-			consumptionEntry = Spinbox(
-				editWin,
-				from_=0,
-				to=150,
-				textvariable=consumptionVar,
-				wrap=True
-			)
-			consumptionEntry.grid(row=2, column=0, padx=10, pady=10)
-
-			editButt = Button(
-				editWin,
-				text="Save",
-				# as with adding a plug, we need to pass the variable here rather than its value
-				# so we can show a warning if it's invalid before editing the device
-				command=lambda: self.editPlugConsumptionRate(editWin, i, consumptionVar)
-			)
-			editButt.grid(row=2, column=1, padx=10, pady=10)
-
-		elif deviceType == "doorbell":
-			sleepModeVar = BooleanVar(value=device.getSleep())
-			sleepCheck = Checkbutton(
-				editWin,
-				text="Enable sleep mode",
-				variable=sleepModeVar
-			)
-			sleepCheck.grid(row=2, column=0, padx=10, pady=10)
+	def makeEditPlugWindow(self):
+		editWin = self.makeEditWindow()
 
-			editButt = Button(
-				editWin,
-				text="Save",
-				command=lambda: self.setDoorbellSleepMode(editWin, i, sleepModeVar.get())
-			)
-			editButt.grid(row=2, column=1, padx=10, pady=10)
+		consumptionText = Label(editWin, text="Consumption rate:")
+		consumptionText.grid(row=1, column=0, padx=10)
 
-		editWin.mainloop()
+		editWin.consumptionVar = IntVar(value=0)
+		consumptionEntry = Spinbox(
+			editWin,
+			from_=0,
+			to=150,
+			textvariable=editWin.consumptionVar,
+			wrap=True
+		)
+		consumptionEntry.grid(row=2, column=0, padx=10, pady=10)
+
+		editButt = Button(
+			editWin,
+			text="Save",
+			# as with adding a plug, we need to pass the variable here rather than its value
+			# so we can show a warning if it's invalid before editing the device
+			command=lambda: self.editPlugConsumptionRate(editWin, editWin.index, editWin.consumptionVar)
+		)
+		editButt.grid(row=2, column=1, padx=10, pady=10)
+		return editWin
+
+	def makeEditDoorbellWindow(self):
+		editWin = self.makeEditWindow()
+
+		editWin.sleepModeVar = BooleanVar(value=False)
+		sleepCheck = Checkbutton(
+			editWin,
+			text="Enable sleep mode",
+			variable=editWin.sleepModeVar
+		)
+		sleepCheck.grid(row=2, column=0, padx=10, pady=10)
+
+		editButt = Button(
+			editWin,
+			text="Save",
+			command=lambda: self.setDoorbellSleepMode(editWin, editWin.index, editWin.sleepModeVar.get())
+		)
+		editButt.grid(row=2, column=1, padx=10, pady=10)
+		return editWin
 
 	def editPlugConsumptionRate(self, editWin, i, consumptionVar):
 		"""
 		From the edit window, sets the consumption rate of a plug at the given index,
-		then destroys the window and refreshes the device list
+		then closes the window and refreshes the device list
 		"""
 		try:
 			consumption = consumptionVar.get()
@@ -358,16 +394,16 @@ class SmartHomeSystem:
 			return
 
 		self.home.getDeviceAt(i).setConsumptionRate(consumption)
-		editWin.destroy()
+		self.dialogPool.release("editPlug", editWin)
 		self.refreshDeviceList()
 
 	def setDoorbellSleepMode(self, editWin, i, sleepMode):
 		"""
 		From the edit window, sets the sleep mode of a doorbell at the given index,
-		then destroys the window and refreshes the device list
+		then closes the window and refreshes the device list
 		"""
 		self.home.getDeviceAt(i).setSleep(sleepMode)
-		editWin.destroy()
+		self.dialogPool.release("editDoorbell", editWin)
 		self.refreshDeviceList()
 
 	############################################
@@ -385,4 +421,5 @@ def main():
 	system = SmartHomeSystem(home)
 	system.run()
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+	main()
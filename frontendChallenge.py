@@ -1,8 +1,29 @@
 from backendChallenge import *
+from energyLedger import *
+from scheduler import *
+from iconCache import *
+from widgetPool import *
 from tkinter import *
-from tkinter import messagebox, filedialog, font
-
-IMAGESPATH = "images/"
+from tkinter import messagebox, filedialog, font, ttk
+import mmap
+import os
+import threading
+
+FILETYPES = [("CSV files", "*.csv"), ("Smart home snapshots", f"*{SNAPSHOTEXTENSION}")]
+VISIBLEROWS = 12 # how many device rows to show at once, the rest are scrolled to
+
+# the schedule window's grid, one cell per hour, and how each action is shown in it
+SCHEDULETIMEWIDTH = 60
+SCHEDULECELLWIDTH = 110
+SCHEDULECELLHEIGHT = 22
+SCHEDULECELLS = {
+	True: ("Turn On", "#a8dca0"),
+	False: ("Turn Off", "#f2a8a8"),
+	None: ("No Change", "#e6e6e6"),
+}
+
+# which devices the schedule window can save its schedule to, as a template
+SCHEDULETARGETS = ["This device", "Selected devices", "All plugs", "All doorbells", "All devices"]
 
 def setUpHome():
 	"""Sets up a home with 5 devices via shell input, returns the home"""
@@ -50,6 +71,252 @@ def setUpHome():
 
 	return newHome
 
+class TaskCancelled(Exception):
+	"""Raised inside a BackgroundTask's work when it has been cancelled"""
+
+class BackgroundTask:
+	"""
+	Runs work(progress) on a worker thread so the tk main loop keeps going.
+	work should call progress(fraction) every so often, which raises
+	TaskCancelled once cancel() has been called. The main thread polls
+	isDone() rather than the worker touching any widgets
+	"""
+
+	def __init__(self, work):
+		self.work = work
+		self.fraction = 0 # how far through the work is, 0 to 1
+		self.result = None
+		self.error = None
+		self.cancelled = threading.Event()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+
+	def start(self):
+		self.thread.start()
+
+	def run(self):
+		try:
+			self.result = self.work(self.progress)
+		except Exception as e:
+			self.error = e
+
+	def progress(self, fraction):
+		if self.cancelled.is_set():
+			raise TaskCancelled()
+		self.fraction = fraction
+
+	def cancel(self):
+		self.cancelled.set()
+
+	def isDone(self):
+		return not self.thread.is_alive()
+
+class DeviceRow:
+	"""
+	The widgets for one row of the device list. A row remembers what each
+	of its widgets is showing, so updating it only touches the widgets
+	whose values have actually changed
+	"""
+
+	def __init__(self, system, parentFrame, gridRow):
+		self.system = system
+		self.parentFrame = parentFrame
+		self.gridRow = gridRow
+		self.deviceId = None # id of the device this row is showing
+		self.shown = {} # what each widget is currently showing
+
+		# the commands look up self.deviceId when clicked, so they don't
+		# need remaking when the row starts showing a different device.
+		# ids don't change when other devices are removed, unlike indexes
+		self.indexLabel = Label(parentFrame)
+		self.indexLabel.grid(row=gridRow, column=0, sticky=EW, pady=5, padx=2.5)
+
+		self.deviceTypeLabel = Label(parentFrame, compound=LEFT, width=120)
+		self.deviceTypeLabel.grid(row=gridRow, column=1, sticky=EW, pady=5, padx=2.5)
+
+		self.statusLabel = Label(parentFrame, width=5)
+		self.statusLabel.grid(row=gridRow, column=2, sticky=EW, pady=5, padx=2.5)
+
+		self.toggleButt = Button(
+			parentFrame,
+			text="Toggle",
+			padx=5,
+			highlightthickness=0,
+			bd=0,
+			command=lambda: system.toggleDevice(self.deviceId)
+		)
+		self.toggleButt.grid(row=gridRow, column=3, pady=5, padx=2.5)
+
+		# the plug and doorbell widgets are made the first time they're needed,
+		# and hidden (not destroyed) when the row shows the other type
+		self.plugWidgets = None
+		self.doorbellWidgets = None
+
+		self.scheduleButt = Button(
+			parentFrame,
+			text="Schedule",
+			image=system.icons.get("schedule"),
+			padx=5,
+			command=lambda: system.scheduleDeviceWindow(self.deviceId)
+		)
+		self.scheduleButt.grid(row=gridRow, column=7, pady=5, padx=2.5)
+
+		self.removeButt = Button(
+			parentFrame,
+			text="Remove",
+			image=system.icons.get("delete"),
+			padx=5,
+			fg="red",
+			command=lambda: system.removeDevice(self.deviceId)
+		)
+		self.removeButt.grid(row=gridRow, column=8, pady=5, padx=2.5)
+
+		# ticked devices can be given a schedule all at once from the schedule window
+		self.selectVar = BooleanVar()
+		self.selectCheck = Checkbutton(
+			parentFrame,
+			text="Select",
+			variable=self.selectVar,
+			command=self.selectClicked
+		)
+		self.selectCheck.grid(row=gridRow, column=9, pady=5, padx=2.5)
+
+	def selectClicked(self):
+		selected = self.selectVar.get()
+		self.shown["selected"] = selected # the checkbox is already showing it
+		self.system.selectDevice(self.deviceId, selected)
+
+	def changed(self, name, value):
+		"""Returns True (and remembers value) if the widget for name isn't showing value yet"""
+		if name in self.shown and self.shown[name] == value:
+			return False
+
+		self.shown[name] = value
+		return True
+
+	def makePlugWidgets(self):
+		"""Makes the consumption rate widgets, shown for plugs"""
+		consumptionVar = IntVar()
+
+		# is consumption rate in W? looks weird without any unit so we'll go with that
+		consumptionText = Label(self.parentFrame, width=5)
+		consumptionText.grid(row=self.gridRow, column=4, sticky=EW, pady=5, padx=2.5)
+
+		consumptionEntry = Spinbox(
+			self.parentFrame,
+			from_=0,
+			to=150,
+			width=5,
+			textvariable=consumptionVar,
+			wrap=True
+		)
+		consumptionEntry.grid(row=self.gridRow, column=5, sticky=EW, pady=5, padx=2.5)
+
+		consumptionConfirmButt = Button(
+			self.parentFrame,
+			text="Set",
+			image=self.system.icons.get("edit"),
+			compound=LEFT,
+			padx=5,
+			# we need to pass the tk variable here rather than its value
+			# so we can show a warning if it's invalid before adding the device
+			command=lambda: self.system.editPlugConsumptionRate(self.deviceId, consumptionVar)
+		)
+		consumptionConfirmButt.grid(row=self.gridRow, column=6, pady=5, padx=2.5)
+
+		self.consumptionVar = consumptionVar
+		self.consumptionText = consumptionText
+		self.plugWidgets = [consumptionText, consumptionEntry, consumptionConfirmButt]
+
+	def makeDoorbellWidgets(self):
+		"""Makes the sleep mode widgets, shown for doorbells"""
+		sleepLabel = Label(self.parentFrame)
+		sleepLabel.grid(row=self.gridRow, column=4, pady=5, padx=2.5)
+
+		# checkbox should be checked if device is sleeping (in sleep mode)
+		sleepVar = BooleanVar()
+		sleepChangeCheckbox = Checkbutton(
+			self.parentFrame,
+			text="Sleep Mode",
+			variable=sleepVar,
+			command=lambda: self.system.setDoorbellSleepMode(self.deviceId, sleepVar.get())
+		)
+		sleepChangeCheckbox.grid(row=self.gridRow, column=5, columnspan=2, pady=5, padx=2.5)
+
+		self.sleepVar = sleepVar
+		self.sleepLabel = sleepLabel
+		self.doorbellWidgets = [sleepLabel, sleepChangeCheckbox]
+
+	def showWidgets(self, widgets, show):
+		for widget in widgets or []:
+			if show:
+				widget.grid()
+			else:
+				widget.grid_remove()
+
+	def update(self, index, device):
+		"""Makes the row show the device at the given index, only changing what's different"""
+		if not isinstance(device, SmartDevice):
+			raise ValueError("Device must be a SmartDevice")
+
+		self.deviceId = device.getId()
+		system = self.system
+		isPlug = isinstance(device, SmartPlug)
+
+		if self.changed("index", index):
+			self.indexLabel.config(text=str(index))
+
+		if self.changed("isPlug", isPlug):
+			if isPlug:
+				self.deviceTypeLabel.config(text="Plug", image=system.icons.get("plug"))
+				if self.plugWidgets is None:
+					self.makePlugWidgets()
+			else:
+				self.deviceTypeLabel.config(text="Doorbell", image=system.icons.get("doorbell"))
+				if self.doorbellWidgets is None:
+					self.makeDoorbellWidgets()
+
+			self.showWidgets(self.plugWidgets, isPlug)
+			self.showWidgets(self.doorbellWidgets, not isPlug)
+
+		switchedOn = device.getSwitchedOn()
+		if self.changed("switchedOn", switchedOn):
+			self.statusLabel.config(text="ON" if switchedOn else "OFF")
+			self.toggleButt.config(image=system.icons.get("toggleon") if switchedOn else system.icons.get("toggleoff"))
+
+		if isPlug:
+			consumptionRate = device.getConsumptionRate()
+			if self.changed("consumptionRate", consumptionRate):
+				self.consumptionText.config(text=f"{consumptionRate}W")
+				self.consumptionVar.set(consumptionRate)
+		else:
+			sleepMode = device.getSleep()
+			if self.changed("sleepMode", sleepMode):
+				self.sleepLabel.config(image=system.icons.get("sleep") if sleepMode else system.icons.get("sleepoff"))
+				self.sleepVar.set(sleepMode)
+
+		selected = self.deviceId in system.selectedIds
+		if self.changed("selected", selected):
+			self.selectVar.set(selected)
+
+	def getWidgets(self):
+		"""Returns the widgets for the type of device the row is showing"""
+		widgets = [self.indexLabel, self.deviceTypeLabel, self.statusLabel, self.toggleButt, self.scheduleButt, self.removeButt, self.selectCheck]
+		if "isPlug" in self.shown:
+			widgets += (self.plugWidgets if self.shown["isPlug"] else self.doorbellWidgets)
+		return widgets
+
+	# grid and grid_remove work like a widget's, so rows can go in a WidgetPool
+	def grid(self, row):
+		"""Shows the row on the given row of the grid"""
+		self.gridRow = row
+		for widget in self.getWidgets():
+			widget.grid(row=row)
+
+	def grid_remove(self):
+		"""Hides the row, it keeps its widgets so it can be shown again"""
+		for widget in self.getWidgets():
+			widget.grid_remove()
+
 class SmartHomeSystem:
 	"""Represents the smart home system as whole, with a GUI frontend"""
 
@@ -58,7 +325,20 @@ class SmartHomeSystem:
 			raise ValueError("Home must be a SmartHome")
 
 		self.home = home
-		self.deviceWidgets = [] # list of widgets to be destroyed on refresh
+		self.deviceRows = [] # one DeviceRow per visible row, reused as the list scrolls
+		self.firstVisible = 0 # index of the device shown in the top row
+		self.selectedIds = set() # ids of the devices ticked in the list, they stay ticked as the list scrolls
+
+		# changes to the home are collected here and drawn together once tk is idle,
+		# so lots of changes in a row only cause one redraw
+		self.changedIndexes = set()
+		self.refreshAll = False
+		self.flushScheduled = False
+		self.home.addListener(self.homeChanged)
+		self.ledger = EnergyLedger(home) # what each device has used, recorded every clock tick
+		self.scheduler = Scheduler(home) # timed actions, and the hourly schedules as the clock ticks
+		self.widgetPool = WidgetPool() # rows that have been scrolled or removed away
+		self.dialogPool = DialogPool() # dialogs that have been closed, shown again when next opened
 
 		self.win = Tk()
 		self.win.title("Smart Home System")
@@ -72,9 +352,19 @@ class SmartHomeSystem:
 		self.devicesFrame = Frame(self.win)
 		self.devicesFrame.grid(row=1, column=0, padx=10, pady=10)
 
+		# only shown when there are more devices than fit on screen
+		self.devicesScrollbar = Scrollbar(self.win, orient=VERTICAL, command=self.scrollDeviceList)
+
+		# mouse wheel scrolling, windows/mac and then linux
+		self.win.bind("<MouseWheel>", lambda event: self.scrollDeviceList("scroll", -1 if event.delta > 0 else 1, "units"))
+		self.win.bind("<Button-4>", lambda event: self.scrollDeviceList("scroll", -1, "units"))
+		self.win.bind("<Button-5>", lambda event: self.scrollDeviceList("scroll", 1, "units"))
+
 		self.footerFrame = Frame(self.win)
 		self.footerFrame.grid(row=2, column=0, padx=10, pady=10)
 
+		self.noDevicesLabel = Label(self.devicesFrame, text="No devices")
+
 		# set up fonts and images (must be done after creating the window)
 		# this changes the default font for everything
 		self.font = font.nametofont("TkDefaultFont")
@@ -90,21 +380,8 @@ class SmartHomeSystem:
 			size=11
 		)
 
-		# here are all of our images for the devices, to be used in the GUI
-		self.IMAGEADD = PhotoImage(file=f"{IMAGESPATH}add.png")
-		self.IMAGECLOCK = PhotoImage(file=f"{IMAGESPATH}clock.png")
-		self.IMAGEDELETE = PhotoImage(file=f"{IMAGESPATH}delete.png")
-		self.IMAGEEDIT = PhotoImage(file=f"{IMAGESPATH}edit.png")
-		self.IMAGEEXPORT = PhotoImage(file=f"{IMAGESPATH}export.png")
-		self.IMAGEIMPORT = PhotoImage(file=f"{IMAGESPATH}import.png")
-		self.IMAGEDOORBELL = PhotoImage(file=f"{IMAGESPATH}doorbell.png")
-		self.IMAGESLEEP = PhotoImage(file=f"{IMAGESPATH}sleep.png")
-		self.IMAGESLEEPOFF = PhotoImage(file=f"{IMAGESPATH}sleepoff.png")
-		self.IMAGESCHEDULE = PhotoImage(file=f"{IMAGESPATH}schedule.png")
-		self.IMAGEPLUG = PhotoImage(file=f"{IMAGESPATH}plug.png")
-		self.IMAGEPLUGOFF = PhotoImage(file=f"{IMAGESPATH}plugoff.png")
-		self.IMAGETOGGLEOFF = PhotoImage(file=f"{IMAGESPATH}toggleoff.png")
-		self.IMAGETOGGLEON = PhotoImage(file=f"{IMAGESPATH}toggleon.png")
+		# every window shares the same icons, each is only loaded when it's first shown
+		self.icons = IconCache(self.win)
 
 		# also set up the time here
 		self.time = 0
@@ -117,7 +394,7 @@ class SmartHomeSystem:
 		turnOnAllButt = Button(
 			self.headerFrame,
 			text="Turn on all",
-			image=self.IMAGEPLUG,
+			image=self.icons.get("plug"),
 			compound=LEFT,
 			command=self.turnOnAll,
 			padx=5,
@@ -128,7 +405,7 @@ class SmartHomeSystem:
 		turnOffAllButt = Button(
 			self.headerFrame,
 			text="Turn off all",
-			image=self.IMAGEPLUGOFF,
+			image=self.icons.get("plugoff"),
 			compound=LEFT,
 			command=self.turnOffAll,
 			padx=5,
@@ -140,7 +417,7 @@ class SmartHomeSystem:
 		self.timeLabel = Label(
 			self.headerFrame,
 			textvariable=self.timeString,
-			image=self.IMAGECLOCK,
+			image=self.icons.get("clock"),
 			compound=LEFT,
 			font=self.monoFont,
 			padx=5,
@@ -148,11 +425,17 @@ class SmartHomeSystem:
 		)
 		self.timeLabel.grid(row=0, column=2, padx=10)
 
+		# totals for the whole home next to the clock, kept up to date by the
+		# home as devices change so showing them doesn't need every device
+		self.totalsLabel = Label(self.headerFrame, justify=LEFT, padx=5, pady=5)
+		self.totalsLabel.grid(row=0, column=3, padx=10)
+		self.refreshTotals()
+
 		# add, import, and export devices in the footer
 		addButt = Button(
 			self.footerFrame,
 			text="Add device",
-			image=self.IMAGEADD,
+			image=self.icons.get("add"),
 			compound=LEFT,
 			command=self.addDeviceWindow,
 			padx=5,
@@ -163,7 +446,7 @@ class SmartHomeSystem:
 		importButt = Button(
 			self.footerFrame,
 			text="Load from file",
-			image=self.IMAGEIMPORT,
+			image=self.icons.get("import"),
 			compound=LEFT,
 			command=self.importDevices,
 			padx=5,
@@ -174,7 +457,7 @@ class SmartHomeSystem:
 		exportButt = Button(
 			self.footerFrame,
 			text="Save to file",
-			image=self.IMAGEEXPORT,
+			image=self.icons.get("export"),
 			compound=LEFT,
 			command=self.exportDevices,
 			padx=5,
@@ -184,170 +467,123 @@ class SmartHomeSystem:
 
 	def refreshDeviceList(self):
 		"""
-		Removes all widgets from the devicesFrame and re-creates
-		them with current devices/statuses
+		Brings the device list up to date with the home. Only the rows that
+		fit on screen have widgets, and they're reused for whichever devices
+		are scrolled into view, so big homes don't need more widgets.
+		Rows only update the widgets showing something that has changed
 		"""
 
-		for widget in self.deviceWidgets:
-			widget.destroy()
-
-		devices = self.home.getDevices()
-		numDevices = len(devices)
-
-		for i in range(numDevices):
-			device = devices[i]
-			self.createDeviceRow(self.deviceWidgets, self.devicesFrame, device, i)
-
-		if numDevices == 0:
-			noDevicesLabel = Label(self.devicesFrame, text="No devices")
-			noDevicesLabel.grid(row=0, column=0)
-			self.deviceWidgets.append(noDevicesLabel)
-
-	def createDeviceRow(self, widgetList, parentFrame, device, i):
-		"""Creates a row of widgets for a device, and draws it to the given frame"""
-
-		if not isinstance(parentFrame, Frame):
-			raise ValueError("Widget must be a Frame")
-		
-		if not isinstance(device, SmartDevice):
-			raise ValueError("Device must be a SmartDevice")
-				
-		deviceType = "Plug" if isinstance(device, SmartPlug) else "Doorbell"
-
-		indexLabel = Label(parentFrame, text=str(i))
-		indexLabel.grid(row=i, column=0, sticky=EW, pady=5, padx=2.5)
-		widgetList.append(indexLabel)
+		numDevices = len(self.home.getDevices())
+		numRows = min(numDevices, VISIBLEROWS)
 
-		if deviceType == "Plug":
-			deviceImage = self.IMAGEPLUG
-		elif deviceType == "Doorbell":
-			deviceImage = self.IMAGEDOORBELL
+		# keep the view in range if devices were removed
+		self.firstVisible = max(0, min(self.firstVisible, numDevices - numRows))
 
-		deviceTypeLabel = Label(parentFrame, text=deviceType, image=deviceImage, compound=LEFT, width=120)
-		deviceTypeLabel.grid(row=i, column=1, sticky=EW, pady=5, padx=2.5)
-		widgetList.append(deviceTypeLabel) # add it to a list so we can destroy it later on refresh
+		# show or hide rows if the number on screen has changed,
+		# hidden rows go back to the pool rather than being destroyed
+		while len(self.deviceRows) < numRows:
+			row = self.widgetPool.get("deviceRow", lambda: DeviceRow(self, self.devicesFrame, len(self.deviceRows)))
+			row.grid(len(self.deviceRows))
+			self.deviceRows.append(row)
 
-		statusText = "ON" if device.getSwitchedOn() else "OFF"
-		statusTextVar = StringVar(value=statusText)
-		statusLabel = Label(parentFrame, textvariable=statusTextVar, width=5)
-		statusLabel.grid(row=i, column=2, sticky=EW, pady=5, padx=2.5)
-		widgetList.append(statusLabel)
+		while len(self.deviceRows) > numRows:
+			self.widgetPool.release("deviceRow", self.deviceRows.pop())
 
-		statusImage = self.IMAGETOGGLEON if device.getSwitchedOn() else self.IMAGETOGGLEOFF
-		toggleButt = Button(
-			parentFrame,
-			text="Toggle",
-			image=statusImage,
-			padx=5,
-			highlightthickness=0,
-			bd=0,
-			command=lambda: self.toggleDeviceAt(i)
-		)
-		toggleButt.grid(row=i, column=3, pady=5, padx=2.5)
-		widgetList.append(toggleButt)
-
-		if deviceType == "Plug":
-			consumptionVar = IntVar(value=device.getConsumptionRate())
-
-			# is consumption rate in W? looks weird without any unit so we'll go with that
-			consumptionText = Label(parentFrame, text=f"{device.getConsumptionRate()}W", width=5)
-			consumptionText.grid(row=i, column=4, sticky=EW, pady=5, padx=2.5)
-			widgetList.append(consumptionText)
-
-			consumptionEntry = Spinbox(
-				parentFrame,
-				from_=0,
-				to=150,
-				width=5,
-				textvariable=consumptionVar,
-				wrap=True
-			)
-			consumptionEntry.grid(row=i, column=5, sticky=EW, pady=5, padx=2.5)
-			widgetList.append(consumptionEntry)
-
-			consumptionConfirmButt = Button(
-				parentFrame,
-				text="Set",
-				image=self.IMAGEEDIT,
-				compound=LEFT,
-				padx=5,
-				# we need to pass the tk variable here rather than its value
-				# so we can show a warning if it's invalid before adding the device
-				command=lambda: self.editPlugConsumptionRate(i, consumptionVar)
-			)
-			consumptionConfirmButt.grid(row=i, column=6, pady=5, padx=2.5)
-			widgetList.append(consumptionConfirmButt)
+		for i in range(numRows):
+			index = self.firstVisible + i
+			self.deviceRows[i].update(index, self.home.getDeviceAt(index))
 
-		elif deviceType == "Doorbell":
-			sleepImage = self.IMAGESLEEP if device.getSleep() else self.IMAGESLEEPOFF
+		if numDevices == 0:
+			self.noDevicesLabel.grid(row=0, column=0)
+		else:
+			self.noDevicesLabel.grid_remove()
 
-			sleepLabel = Label(parentFrame, image=sleepImage)
-			sleepLabel.grid(row=i, column=4, pady=5, padx=2.5)
-			widgetList.append(sleepLabel)
+		if numDevices > VISIBLEROWS:
+			self.devicesScrollbar.grid(row=1, column=1, sticky=NS, pady=10)
+			self.devicesScrollbar.set(self.firstVisible / numDevices, (self.firstVisible + numRows) / numDevices)
+		else:
+			self.devicesScrollbar.grid_remove()
+
+	def refreshTotals(self):
+		"""Shows the home's running totals in the header"""
+		totals = self.home.getTotals()
+		self.totalsLabel.config(text=(
+			f"{totals['activeWattage']}W in use, {totals['switchedOn']} on, {totals['switchedOff']} off, "
+			f"{self.ledger.getTotalEnergy('day') / 1000:.1f}kWh used today\n"
+			f"{totals['plugs']} plugs, {totals['doorbells']} doorbells ({totals['sleepingDoorbells']} sleeping)"
+		))
+
+	def refreshDeviceAt(self, index):
+		"""Updates just the row for the device at the given index, if it's on screen"""
+		i = index - self.firstVisible
+		if 0 <= i < len(self.deviceRows):
+			self.deviceRows[i].update(index, self.home.getDeviceAt(index))
+
+	def homeChanged(self, event, index):
+		"""Called by the home when its devices change, queues a redraw"""
+		if event == DEVICECHANGED:
+			self.changedIndexes.add(index)
+		else:
+			# the number of devices changed, so bring the whole list up to date.
+			# Only the rows on screen are redrawn, and only the widgets in them
+			# whose values changed
+			self.refreshAll = True
+
+		if not self.flushScheduled:
+			self.flushScheduled = True
+			self.win.after_idle(self.flushChanges)
+
+	def flushChanges(self):
+		"""Redraws everything that changed since the last flush"""
+		if self.refreshAll:
+			self.refreshDeviceList()
+		else:
+			for index in self.changedIndexes:
+				self.refreshDeviceAt(index)
 
-			invertCurrentSleepStatus = not device.getSleep()
+		self.refreshTotals()
 
-			sleepChangeCheckbox = Checkbutton(
-				parentFrame,
-				text="Sleep Mode",
-				command=lambda: self.setDoorbellSleepMode(i, invertCurrentSleepStatus)
-			)
+		self.changedIndexes.clear()
+		self.refreshAll = False
+		self.flushScheduled = False
 
-			if device.getSleep():
-				# checkbox should be checked if device is sleeping (in sleep mode)
-				sleepChangeCheckbox.select()
-				
-			sleepChangeCheckbox.grid(row=i, column=5, columnspan=2, pady=5, padx=2.5)
+	def scrollDeviceList(self, action, amount, units=None):
+		"""Called by the scrollbar (and mouse wheel) to move which devices are shown"""
+		numDevices = len(self.home.getDevices())
+		if numDevices <= VISIBLEROWS:
+			return
 
-			widgetList.append(sleepChangeCheckbox)
+		if action == "moveto":
+			# amount is how far down the list the top of the scrollbar was dragged
+			self.firstVisible = round(float(amount) * numDevices)
+		elif action == "scroll":
+			step = VISIBLEROWS if units == "pages" else 1
+			self.firstVisible += int(amount) * step
 
-		scheduleButt = Button(
-			parentFrame,
-			text="Schedule",
-			image=self.IMAGESCHEDULE,
-			padx=5,
-			command=lambda: self.scheduleDeviceWindow(i)
-		)
-		scheduleButt.grid(row=i, column=7, pady=5, padx=2.5)
-		widgetList.append(scheduleButt)
-
-		removeButt = Button(
-			parentFrame,
-			text="Remove",
-			image=self.IMAGEDELETE,
-			padx=5,
-			fg="red",
-			command=lambda: self.removeDeviceAt(i)
-		)
-		removeButt.grid(row=i, column=8, pady=5, padx=2.5)
-		widgetList.append(removeButt)
+		self.refreshDeviceList()
 
 	############################################
 	# Device manipulation functions
 	############################################
-	def toggleDeviceAt(self, index, statusVar=None):
-		"""Toggles the device at the given index"""
-		device = self.home.getDeviceAt(index)
+	def toggleDevice(self, deviceId, statusVar=None):
+		"""Toggles the device with the given id"""
+		device = self.home.getDeviceById(deviceId)
 		device.toggleSwitch()
 
 		if statusVar:
 			statusVar.set("ON" if device.getSwitchedOn() else "OFF")
-
-		self.refreshDeviceList()
 	
 	def turnOnAll(self):
 		"""Turns on all devices"""
 		self.home.turnOnAll()
-		self.refreshDeviceList()
 
 	def turnOffAll(self):
 		"""Turns off all devices"""
 		self.home.turnOffAll()
-		self.refreshDeviceList()
 
-	def removeDeviceAt(self, index):
-		"""Removes the device at the given index, after confirmation"""
-		deviceType = "plug" if isinstance(self.home.getDeviceAt(index), SmartPlug) else "doorbell"
+	def removeDevice(self, deviceId):
+		"""Removes the device with the given id, after confirmation"""
+		deviceType = "plug" if isinstance(self.home.getDeviceById(deviceId), SmartPlug) else "doorbell"
 
 		# create an "are you sure" messagebox
 		sure = messagebox.askyesno(
@@ -357,15 +593,26 @@ class SmartHomeSystem:
 		if not sure:
 			return
 		
-		self.home.removeDeviceAt(index)
-		self.refreshDeviceList()
+		# removed in place so the list (and any CSV exported later) keeps the
+		# order the user gave it. The later devices move up, but only the rows
+		# on screen are redrawn
+		self.home.removeDeviceAt(self.home.getIndexOf(deviceId))
 
 	############################################
 	# Add window and its related functions
 	############################################
 	def addDeviceWindow(self):
 		"""Shows a window that allows a user to add a device to the home"""
+		# there's only ever one add window, clicking again brings it forward
+		if self.dialogPool.getShowing("add"):
+			self.dialogPool.getShowing("add")[0].lift()
+			return
+
+		addWin = self.dialogPool.get("add", self.makeAddWindow)
+		addWin.consumptionVar.set(0)
 
+	def makeAddWindow(self):
+		"""Builds the add window, it's kept and reused after it's closed"""
 		addWin = Toplevel(self.win)
 		addWin.title("Add a device")
 		addWin.resizable(False, False)
@@ -373,13 +620,13 @@ class SmartHomeSystem:
 		consumptionText = Label(addWin, text="Plug consumption rate (0-150):")
 		consumptionText.grid(row=0, column=0, padx=10, pady=10)
 
-		consumptionVar = IntVar(value=0)
+		addWin.consumptionVar = IntVar(value=0)
 		consumptionEntry = Spinbox(
 			addWin,
 			from_=0,
 			to=150,
 			width=4,
-			textvariable=consumptionVar,
+			textvariable=addWin.consumptionVar,
 			wrap=True
 		)
 		consumptionEntry.grid(row=0, column=1, padx=10, pady=10)
@@ -389,7 +636,7 @@ class SmartHomeSystem:
 			text="Add a plug",
 			# as with adding a plug, we need to pass the variable here rather than its value
 			# so we can show a warning if it's invalid before editing the device
-			command=lambda: self.addPlug(addWin, consumptionVar)
+			command=lambda: self.addPlug(addWin, addWin.consumptionVar)
 		)
 		addPlugButt.grid(row=1, column=0, columnspan=2,
 		                 padx=10, pady=10, sticky="we")
@@ -405,12 +652,12 @@ class SmartHomeSystem:
 		addDoorbellButt.grid(row=3, column=0, columnspan=2,
 		                     padx=10, pady=10, sticky="we")
 
-		addWin.mainloop()
+		return addWin
 
 	def addPlug(self, addWin, consumptionVar):
 		"""
 		From the add window, adds a plug to the home,
-		then destroys the window and refreshes the device list
+		then closes the window
 		"""
 		try:
 			consumption = consumptionVar.get()
@@ -430,23 +677,21 @@ class SmartHomeSystem:
 			return
 		
 		self.home.addDevice(SmartPlug(consumption))
-		addWin.destroy()
-		self.refreshDeviceList()
+		self.dialogPool.release("add", addWin)
 
 	def addDoorbell(self, addWin):
 		"""
 		From the add window, adds a doorbell to the home,
-		then destroys the window and refreshes the device list
+		then closes the window
 		"""
 		self.home.addDevice(SmartDoorbell())
-		addWin.destroy()
-		self.refreshDeviceList()
+		self.dialogPool.release("add", addWin)
 
 	############################################
 	# Device editing functions
 	############################################
-	def editPlugConsumptionRate(self, index, consumptionVar):
-		"""Sets the consumption rate of a plug, then refreshes the device list"""
+	def editPlugConsumptionRate(self, deviceId, consumptionVar):
+		"""Sets the consumption rate of a plug"""
 
 		try:
 			consumption = consumptionVar.get()
@@ -465,13 +710,28 @@ class SmartHomeSystem:
 			)
 			return
 
-		self.home.getDeviceAt(index).setConsumptionRate(consumption)
-		self.refreshDeviceList()
+		self.home.getDeviceById(deviceId).setConsumptionRate(consumption)
 
-	def setDoorbellSleepMode(self, index, sleepMode):
-		"""Sets the sleep mode of a doorbell, then refreshes the device list"""
-		self.home.getDeviceAt(index).setSleep(sleepMode)
-		self.refreshDeviceList()
+	def setDoorbellSleepMode(self, deviceId, sleepMode):
+		"""Sets the sleep mode of a doorbell"""
+		self.home.getDeviceById(deviceId).setSleep(sleepMode)
+
+	def selectDevice(self, deviceId, selected):
+		"""Ticks (or unticks) a device, e.g. to give it a schedule along with other ticked devices"""
+		if selected:
+			self.selectedIds.add(deviceId)
+		else:
+			self.selectedIds.discard(deviceId)
+
+	def getSelectedIndices(self):
+		"""Returns the indexes of the ticked devices in order, forgetting any that have been removed"""
+		indices = []
+		for deviceId in list(self.selectedIds):
+			try:
+				indices.append(self.home.getIndexOf(deviceId))
+			except ValueError:
+				self.selectedIds.discard(deviceId)
+		return sorted(indices)
 
 	############################################
 	# Schedule window and its related functions, and accompanying clock things
@@ -483,107 +743,256 @@ class SmartHomeSystem:
 	def incrementClock(self):
 		"""Increment the clock every 3 seconds, and update the devices accordingly"""
 
-		newTime = self.time + 1 if self.time < 23 else 0
-		self.time = newTime
-		self.timeString.set(self.getTimeString())
+		# record the hour that's just finished before the schedule changes anything
+		self.ledger.record()
 
-		devicesUpdated = False
-		devices = self.home.getDevices()
-		for device in devices:
-			if device.getSchedule()[newTime] == 0:
-				devicesUpdated = True
-				device.switchedOn = False
-			elif device.getSchedule()[newTime] == 1:
-				devicesUpdated = True
-				device.switchedOn = True
-
-		if devicesUpdated:
-			self.refreshDeviceList()
+		# each tick is an hour, the scheduler carries out any timed actions
+		# during it and then the hourly schedules. The home tells us about the
+		# devices that changed so only they get redrawn
+		self.scheduler.advance(HOUR)
+		self.time = self.scheduler.getHour()
+		self.timeString.set(self.getTimeString())
+		self.refreshTotals()
 
 		self.timeLabel.config(text=self.getTimeString())
 
 		self.win.after(3000, self.incrementClock)
 
-	def scheduleDeviceWindow(self, index):
+	def scheduleDeviceWindow(self, deviceId):
 		"""Shows a window that allows a user to view and edit the schedule for a device"""
 
-		device = self.home.getDeviceAt(index)
+		device = self.home.getDeviceById(deviceId)
+		index = self.home.getIndexOf(deviceId)
 		deviceType = "plug" if isinstance(device, SmartPlug) else "doorbell"
 		deviceSchedule = device.getSchedule()
 
-		scheduleWin = Toplevel(self.win)
+		# if the device's schedule is already open bring it forward, otherwise
+		# a closed schedule window is reused for whichever device is opened next
+		for scheduleWin in self.dialogPool.getShowing("schedule"):
+			if scheduleWin.deviceId == deviceId:
+				scheduleWin.lift()
+				return
+
+		scheduleWin = self.dialogPool.get("schedule", self.makeScheduleWindow)
+		scheduleWin.deviceId = deviceId
 		scheduleWin.title(f"Schedule for {deviceType} at index {index}")
-		scheduleWin.resizable(False, False)
+		scheduleWin.deviceLabel.config(text=f"Schedule for {deviceType} at index {index}")
 
-		deviceLabel = Label(scheduleWin, text=f"Schedule for {deviceType} at index {index}")
-		deviceLabel.grid(row=0, column=0, padx=10, pady=10)
+		# edits are made to this copy, and only written to the device when saved
+		scheduleWin.schedule = deviceSchedule
+		scheduleWin.brush.set(ACTIONCODES[True])
+		scheduleWin.target.set(SCHEDULETARGETS[0])
+		for hr in range(24):
+			self.drawScheduleCell(scheduleWin, hr)
+
+	def makeScheduleWindow(self):
+		"""
+		Builds a schedule window, it's kept and reused for another device after
+		it's closed. The hours are cells on one canvas, and clicking or dragging
+		over them paints them with the action picked above
+		"""
+		scheduleWin = Toplevel(self.win)
+		scheduleWin.resizable(False, False)
+		scheduleWin.deviceId = None
+		scheduleWin.schedule = [None] * 24
+
+		scheduleWin.deviceLabel = Label(scheduleWin)
+		scheduleWin.deviceLabel.grid(row=0, column=0, columnspan=3, padx=10, pady=10)
+
+		# the action that's painted, as its action code
+		scheduleWin.brush = IntVar(value=ACTIONCODES[True])
+		for column, action in enumerate([True, False, None]):
+			brushButt = Radiobutton(
+				scheduleWin,
+				text=SCHEDULECELLS[action][0],
+				variable=scheduleWin.brush,
+				value=ACTIONCODES[action],
+				indicatoron=False,
+				selectcolor=SCHEDULECELLS[action][1],
+				padx=5,
+				pady=5
+			)
+			brushButt.grid(row=1, column=column, padx=5, sticky=EW)
 
-		timesFrame = Frame(scheduleWin)
-		timesFrame.grid(row=1, column=0, padx=10, pady=10)
+		canvas = Canvas(
+			scheduleWin,
+			width=SCHEDULETIMEWIDTH + SCHEDULECELLWIDTH,
+			height=24 * SCHEDULECELLHEIGHT,
+			highlightthickness=0
+		)
+		canvas.grid(row=2, column=0, columnspan=3, padx=10, pady=10)
 
+		# the cells are made once, opening the window again just recolours them
+		scheduleWin.canvas = canvas
+		scheduleWin.cells = []
 		for hr in range(24): # 0 to 23
-			timeLabel = Label(timesFrame, text=f"{str(hr).zfill(2)}:00")
-			timeLabel.grid(row=hr, column=0, pady=2)
+			top = hr * SCHEDULECELLHEIGHT
+			middle = top + SCHEDULECELLHEIGHT / 2
+			canvas.create_text(SCHEDULETIMEWIDTH / 2, middle, text=f"{str(hr).zfill(2)}:00", font=self.monoFont)
+
+			rect = canvas.create_rectangle(
+				SCHEDULETIMEWIDTH, top + 1,
+				SCHEDULETIMEWIDTH + SCHEDULECELLWIDTH, top + SCHEDULECELLHEIGHT - 1,
+				outline=""
+			)
+			text = canvas.create_text(SCHEDULETIMEWIDTH + SCHEDULECELLWIDTH / 2, middle)
+			scheduleWin.cells.append((rect, text))
 
-			optionsTexts = ["Turn Off", "Turn On", "No Change"]
-			optionsValues = [False, True, None]
+		# clicking paints one hour, dragging paints every hour the mouse goes over
+		canvas.bind("<Button-1>", lambda event: self.paintScheduleCell(scheduleWin, event.y))
+		canvas.bind("<B1-Motion>", lambda event: self.paintScheduleCell(scheduleWin, event.y))
 
-			# get current text value for the device's schedule
-			optionVar = StringVar()
-			optionVar.set(optionsTexts[optionsValues.index(deviceSchedule[hr])])
+		# the schedule can be saved to many devices at once, as a template
+		targetText = Label(scheduleWin, text="Save to:")
+		targetText.grid(row=3, column=0, padx=10, sticky=EW)
 
-			optionMenu = OptionMenu(
-				timesFrame,
-				optionVar,
-				*optionsTexts
-			)
+		scheduleWin.target = StringVar(value=SCHEDULETARGETS[0])
+		targetMenu = OptionMenu(scheduleWin, scheduleWin.target, *SCHEDULETARGETS)
+		targetMenu.grid(row=3, column=1, columnspan=2, padx=10, sticky=EW)
 
-			# when the user changes the value, update the device's schedule
-			# bit ugly but it seems to work reliably
-			optionMenu.bind(
-				"<Configure>",
-				lambda event, index=index, hr=hr, optionVar=optionVar:
-				self.updateDeviceSchedule(index, hr, optionsValues[optionsTexts.index(optionVar.get())])
-			)
+		saveButt = Button(
+			scheduleWin,
+			text="Save",
+			command=lambda: self.saveDeviceSchedule(scheduleWin)
+		)
+		saveButt.grid(row=4, column=0, columnspan=2, padx=10, pady=10, sticky=EW)
 
-			optionMenu.grid(row=hr, column=1, padx=0, pady=2)
-	
-		scheduleWin.mainloop()
+		cancelButt = Button(
+			scheduleWin,
+			text="Cancel",
+			command=lambda: self.dialogPool.release("schedule", scheduleWin)
+		)
+		cancelButt.grid(row=4, column=2, padx=10, pady=10, sticky=EW)
+
+		return scheduleWin
+
+	def drawScheduleCell(self, scheduleWin, hour):
+		text, colour = SCHEDULECELLS[scheduleWin.schedule[hour]]
+		rect, label = scheduleWin.cells[hour]
+		scheduleWin.canvas.itemconfig(rect, fill=colour)
+		scheduleWin.canvas.itemconfig(label, text=text)
+
+	def paintScheduleCell(self, scheduleWin, y):
+		"""Paints the hour at y on the canvas with the chosen action, if it isn't already"""
+		hour = int(y // SCHEDULECELLHEIGHT)
+		action = CODEACTIONS[scheduleWin.brush.get()]
+		if 0 <= hour < 24 and scheduleWin.schedule[hour] != action:
+			scheduleWin.schedule[hour] = action
+			self.drawScheduleCell(scheduleWin, hour)
+
+	def saveDeviceSchedule(self, scheduleWin):
+		"""
+		Writes the schedule window's edits in one go, to its device or as a
+		template to the ticked devices or every device of a type, then closes the window
+		"""
+		target = scheduleWin.target.get()
+		if target == "Selected devices":
+			indices = self.getSelectedIndices()
+			if not indices:
+				messagebox.showwarning(
+					title="No devices selected",
+					message="Tick the devices to save this schedule to in the device list"
+				)
+				return # left open so the schedule isn't lost
+			self.home.applyScheduleTemplate(indices, scheduleWin.schedule)
+		elif target == "All plugs":
+			self.home.applyScheduleTemplate(self.home.getIndicesOfType(SmartPlug), scheduleWin.schedule)
+		elif target == "All doorbells":
+			self.home.applyScheduleTemplate(self.home.getIndicesOfType(SmartDoorbell), scheduleWin.schedule)
+		elif target == "All devices":
+			self.home.applyScheduleTemplate(range(len(self.home.getDevices())), scheduleWin.schedule)
+		else:
+			try:
+				device = self.home.getDeviceById(scheduleWin.deviceId)
+			except ValueError:
+				messagebox.showwarning(
+					title="Device removed",
+					message="This device has been removed, so its schedule can't be saved"
+				)
+			else:
+				device.setSchedule(scheduleWin.schedule) # only written if something changed
+
+		self.dialogPool.release("schedule", scheduleWin)
 
-	def updateDeviceSchedule(self, index, hour, action):
-		"""Updates the schedule for a device at the given index"""
-		self.home.getDeviceAt(index).setActionAtHour(hour, action)
-	
 	############################################
 	# Import and Export functions
 	############################################
-	def exportDevices(self):
-		"""Lets the user export the devices to a CSV file after choosing a location"""
-		content = self.home.getCSV()
+	def runInBackground(self, title, work, done, errorTitle, cancelled=None):
+		"""
+		Runs work(progress) on a worker thread, showing a window with a progress bar
+		and a cancel button. When it's finished done(result) is called on the main thread,
+		or cancelled() if the user cancelled it
+		"""
+		task = BackgroundTask(work)
+
+		progressWin = Toplevel(self.win)
+		progressWin.title(title)
+		progressWin.resizable(False, False)
+		progressWin.protocol("WM_DELETE_WINDOW", task.cancel)
+
+		progressLabel = Label(progressWin, text=f"{title}...")
+		progressLabel.grid(row=0, column=0, padx=10, pady=10)
 
-		file = filedialog.asksaveasfile(
-			mode="w",
+		progressBar = ttk.Progressbar(progressWin, mode="determinate", maximum=1, length=250)
+		progressBar.grid(row=1, column=0, padx=10, pady=10)
+
+		cancelButt = Button(progressWin, text="Cancel", command=task.cancel)
+		cancelButt.grid(row=2, column=0, padx=10, pady=10)
+
+		def poll():
+			if not task.isDone():
+				progressBar["value"] = task.fraction
+				self.win.after(50, poll)
+				return
+
+			progressWin.destroy()
+			if isinstance(task.error, TaskCancelled):
+				if cancelled:
+					cancelled()
+			elif isinstance(task.error, PermissionError):
+				messagebox.showerror(
+					title="Permission Denied",
+					message="You do not have permission to use this file"
+				)
+			elif task.error:
+				messagebox.showerror(title=errorTitle, message=f"{task.error}")
+			else:
+				done(task.result)
+
+		task.start()
+		self.win.after(50, poll)
+
+	def exportDevices(self):
+		"""Lets the user export the devices to a CSV or snapshot file after choosing a location"""
+		path = filedialog.asksaveasfilename(
 			defaultextension=".csv",
-			filetypes=[("CSV files", "*.csv")]
+			filetypes=FILETYPES
 		)
-		
-		try:
-			file.write(content)
-			file.close()
-		except AttributeError:  # "NoneType has no attribute 'read'"
-			return  # user cancelled saving the file
-		except PermissionError:
-			messagebox.showerror(
-				title="Permission Denied",
-				message="You do not have permission to write this file"
-			)
-			return
-		except Exception as e:
-			messagebox.showerror(title="Error Writing File", message=f"{e}")
-			return
+
+		if not path:
+			return # user cancelled saving the file
+
+		# the worker saves a copy, so the devices can still be changed while it's
+		# saving. Copying is just copying the store's columns and tables as they
+		# are, so it's quick enough to do here
+		home = self.home.copy()
+		numDevices = max(len(home.getDevices()), 1)
+
+		def work(progress):
+			if path.endswith(SNAPSHOTEXTENSION):
+				with open(path, "wb") as file:
+					home.writeSnapshot(file, lambda written, size: progress(written / size))
+			else:
+				with open(path, "w") as file:
+					home.writeCSV(file, lambda lines: progress(lines / numDevices))
+
+		def cancelled():
+			os.remove(path) # don't leave half a file behind
+
+		self.runInBackground("Saving devices", work, lambda result: None, "Error Writing File", cancelled)
 
 	def importDevices(self, warn=True):
-		"""Prompts the user to import devices from a file"""
+		"""Prompts the user to import devices from a CSV or snapshot file"""
 		# warn that this will overwrite the current devices
 		if warn:
 			sure = messagebox.askyesno(
@@ -593,28 +1002,36 @@ class SmartHomeSystem:
 			if not sure:
 				return
 
-		file = filedialog.askopenfile(
-			mode="r",
-			filetypes=[("CSV files", "*.csv")]
+		path = filedialog.askopenfilename(
+			filetypes=[("Smart home files", f"*.csv *{SNAPSHOTEXTENSION}")] + FILETYPES
 		)
 		
-		try:
-			content = file.read()
-			file.close()
-		except AttributeError: # "NoneType has no attribute 'read'"
+		if not path:
 			return # user cancelled opening the file
-		except PermissionError:
-			messagebox.showerror(
-				title="Permission Denied",
-				message="You do not have permission to read this file"
-			)
-			return
-		except Exception as e:
-			messagebox.showerror(title="Error Reading File", message=f"{e}")
-			return
-		
-		self.home.importCSV(content)
-		self.refreshDeviceList()
+
+		def work(progress):
+			# the worker reads into a new home, which replaces our devices once it's done
+			newHome = SmartHome()
+
+			if path.endswith(SNAPSHOTEXTENSION):
+				# snapshots are mapped into memory and copied, there's nothing to parse
+				with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+					newHome.importSnapshot(buffer, lambda devices, numDevices: progress(devices / numDevices))
+			else:
+				fileSize = max(os.path.getsize(path), 1)
+				with open(path, "r") as file:
+					newHome.importFile(file, lambda devices, charsRead: progress(charsRead / fileSize))
+
+			return newHome
+
+		self.runInBackground("Loading devices", work, self.loadDevices, "Error Reading File")
+
+	def loadDevices(self, newHome):
+		"""Replaces the home's devices with ones that have been loaded, their energy use starts again"""
+		self.selectedIds.clear() # ids start again for the new devices
+		self.home.loadDevicesFrom(newHome)
+		self.ledger.clear()
+		self.scheduler.clear(self.scheduler.now) # the actions were for the old devices
 
 	############################################
 	# Run the GUI
@@ -638,4 +1055,5 @@ def main():
 	system = SmartHomeSystem(home)
 	system.run()
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+	main()
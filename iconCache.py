@@ -0,0 +1,44 @@
+from tkinter import PhotoImage
+import os
+
+# found next to this file, so it works wherever it's run or imported from
+IMAGESPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images", "")
+
+# every icon there is, each is images/<name>.png
+ICONNAMES = (
+	"add", "clock", "delete", "edit", "export", "import", "doorbell",
+	"sleep", "sleepoff", "schedule", "plug", "plugoff", "toggleoff", "toggleon",
+)
+
+
+class IconCache:
+	"""
+	Loads icons the first time they're asked for, and then gives everything
+	that asks for the same icon the same PhotoImage. Images belong to a
+	Tk window but can be shown in any of its Toplevels, so one cache is
+	enough for the main window and every dialog it opens
+	"""
+
+	def __init__(self, master=None, path=IMAGESPATH):
+		self.master = master
+		self.path = path
+		self.icons = {} # name -> PhotoImage, only the ones that have been used
+
+	def get(self, name):
+		"""Returns an icon, decoding its file if it hasn't been used yet"""
+		icon = self.icons.get(name)
+		if icon is None:
+			if name not in ICONNAMES:
+				raise ValueError(f"No icon called {name}")
+
+			icon = PhotoImage(master=self.master, file=f"{self.path}{name}.png")
+			self.icons[name] = icon
+		return icon
+
+	def loadAll(self):
+		"""Loads every icon now, e.g. to compare with loading them as they're needed"""
+		for name in ICONNAMES:
+			self.get(name)
+
+	def getLoadedCount(self):
+		return len(self.icons)
@@ -0,0 +1,143 @@
+from deviceStore import *
+from itertools import count
+import heapq
+
+# times are in whole seconds since 00:00 on the first day
+SECOND = 1
+MINUTE = 60 * SECOND
+HOUR = 60 * MINUTE
+DAY = HOURS * HOUR
+WEEK = 7 * DAY
+
+# the action id for every device's hourly schedule, which is due every hour
+HOURLYSCHEDULE = 0
+
+# timed actions happen after the hourly schedules due at the same time,
+# so a device can be switched at e.g. 13:00:00 whatever its schedule says
+HOURLYFIRST = 0
+TIMEDAFTER = 1
+
+
+class Scheduler:
+	"""
+		Carries out timed actions for a home's devices, down to the second
+		and as far ahead as needed, as well as the hourly schedule every
+		device has. Actions are kept in a heap by when they're next due, so
+		carrying out each one that's due is O(log n) however many are waiting,
+		and nothing is looked at until it's due. The hourly schedules are one
+		more action in the heap that's due on every hour, so they work on top
+		of this the same as they always have
+	"""
+	def __init__(self, home, now=0):
+		self.home = home
+		self.clear(now)
+
+	def clear(self, now=0):
+		"""Forgets every timed action and starts the clock from now, e.g. when the home's devices are replaced"""
+		if now < 0:
+			raise ValueError("Time must be 0 or more")
+
+		self.now = now
+		self.actions = {} # action id -> (device id, switchedOn, repeat every n seconds or None)
+		self.cancelled = 0 # entries in the heap for actions that have been cancelled
+		self.nextId = count(HOURLYSCHEDULE + 1)
+		self.order = count() # keeps actions due at the same time in the order they were added
+
+		# entries are (due, HOURLYFIRST or TIMEDAFTER, order, action id)
+		self.heap = []
+		self.push((now // HOUR + 1) * HOUR, HOURLYFIRST, HOURLYSCHEDULE)
+
+	def push(self, due, priority, actionId):
+		heapq.heappush(self.heap, (due, priority, next(self.order), actionId))
+
+	def __len__(self):
+		"""Returns how many timed actions are waiting, not counting the hourly schedules"""
+		return len(self.actions)
+
+	def getHour(self):
+		"""Returns the hour of the day it is now, 0 - 23"""
+		return self.now // HOUR % HOURS
+
+	def scheduleAction(self, deviceId, at, switchedOn, every=None):
+		"""
+		Switches the device with an id on (True) or off (False) at a time, and
+		again every so many seconds after that if every is given. Returns the
+		action's id, which cancelAction takes. If the device is removed its
+		actions are dropped the next time they're due
+		"""
+		self.home.getIndexOf(deviceId) # raises if there's no device with this id
+		if at < self.now:
+			raise ValueError("Time can't be in the past")
+		if every is not None and every <= 0:
+			raise ValueError("Actions must repeat every 1 second or more")
+		if switchedOn is not True and switchedOn is not False:
+			raise ValueError("Action must be True (on) or False (off)")
+
+		actionId = next(self.nextId)
+		self.actions[actionId] = (deviceId, switchedOn, every)
+		self.push(at, TIMEDAFTER, actionId)
+		return actionId
+
+	def cancelAction(self, actionId):
+		if actionId not in self.actions:
+			raise ValueError("No action with that ID")
+		del self.actions[actionId]
+
+		# its entry is left in the heap and skipped when it comes up, unless
+		# most of the heap is cancelled entries, then it's worth rebuilding
+		self.cancelled += 1
+		if self.cancelled > len(self.actions):
+			self.heap = [entry for entry in self.heap if entry[3] == HOURLYSCHEDULE or entry[3] in self.actions]
+			heapq.heapify(self.heap)
+			self.cancelled = 0
+
+	def nextDue(self):
+		"""Returns when the next action (or hourly schedule) is due"""
+		while self.heap[0][3] != HOURLYSCHEDULE and self.heap[0][3] not in self.actions:
+			heapq.heappop(self.heap)
+			self.cancelled -= 1
+		return self.heap[0][0]
+
+	def advance(self, seconds):
+		"""Moves the clock on by a number of seconds, see runUntil"""
+		return self.runUntil(self.now + seconds)
+
+	def runUntil(self, time):
+		"""
+		Moves the clock on to time, carrying out every action that's due up to
+		and including then in the order they're due. Returns the indexes of the
+		devices that were switched on or off (each listener is told as they change)
+		"""
+		if time < self.now:
+			raise ValueError("Time can't be in the past")
+
+		store = self.home.store
+		changed = set()
+		while self.nextDue() <= time:
+			due, priority, _, actionId = heapq.heappop(self.heap)
+			self.now = due
+
+			if actionId == HOURLYSCHEDULE:
+				changed.update(self.home.applyScheduleAtHour(self.getHour()))
+				self.push(due + HOUR, HOURLYFIRST, HOURLYSCHEDULE)
+				continue
+
+			deviceId, switchedOn, every = self.actions[actionId]
+			try:
+				row = store.getRow(deviceId)
+			except ValueError:
+				del self.actions[actionId] # the device has been removed
+				continue
+
+			if every is None:
+				del self.actions[actionId]
+			else:
+				self.push(due + every, TIMEDAFTER, actionId)
+
+			if store.getSwitchedOn(row) != switchedOn:
+				store.setSwitchedOn(row, switchedOn)
+				store.emit(DEVICECHANGED, row)
+				changed.add(row)
+
+		self.now = time
+		return sorted(changed)
@@ -0,0 +1,172 @@
+from deviceStore import *
+from energyLedger import *
+from snapshot import *
+from operator import add, mul
+import io
+import os
+
+# enough bits in a device's hour counter for a year before it has to grow
+COUNTERBITS = 14
+
+
+def addToCounter(planes, bits):
+	"""
+	Adds 1 to the count of every device with its bit set in bits (a big int).
+	The counts are bit sliced, planes[k] holds bit k of every device's count,
+	so adding to every device at once is a few big int operations
+	"""
+	carry = bits
+	for k in range(len(planes)):
+		if not carry:
+			return
+		planes[k], carry = planes[k] ^ carry, planes[k] & carry
+	if carry:
+		planes.append(carry)
+
+def counterToArray(planes, numDevices):
+	"""Returns a bit sliced counter's counts as an array, one per device"""
+	bits = BitSet(numDevices)
+	counts = 0
+	for k, plane in enumerate(planes):
+		# each plane's bits become 4 byte lanes of 0 or 1, shifted up to be worth 2^k
+		bits.fromInt(plane)
+		counts += widenLanes(int.from_bytes(bits.toFlags(), "little"), numDevices, 1, 4) << k
+	return lanesToArray(counts, numDevices, 4)
+
+
+class SimulationResult:
+	"""
+		What happened over a simulation. The per hour arrays have one entry for
+		each simulated hour, and the per device arrays one for each device, in
+		the same order as the home's devices
+	"""
+	def __init__(self, hours):
+		self.hours = hours
+		self.switchedOnCounts = array("Q") # devices on during each hour
+		self.switchCounts = array("Q") # devices switched on or off as each hour ends
+		self.hourlyEnergy = array("Q") # Wh used by the whole home in each hour
+		self.hoursOn = array("I") # hours each device spent switched on
+		self.deviceSwitches = array("I") # times each device was switched on or off
+		self.deviceEnergy = array("I") # Wh used by each device
+		self.finalSwitchedOn = b"" # one byte (0 or 1) per device, at the end
+
+	def getTotalEnergy(self):
+		return sum(self.hourlyEnergy)
+
+
+def simulateSchedules(store, days, startHour=0):
+	"""
+	Runs every device's schedule for days simulated days, as fast as possible,
+	starting from the devices as they are now at startHour. Each hour is
+	counted with the devices as they are during it, then the clock moves on
+	and the next hour's actions happen, like SmartHomeSystem.incrementClock.
+	The store isn't changed, returns a SimulationResult
+	"""
+	if days < 0:
+		raise ValueError("Days must be 0 or more")
+	if startHour < 0 or startHour > 23:
+		raise ValueError("Hour must be between 0 and 23")
+
+	numDevices = len(store)
+	hours = days * HOURS
+	result = SimulationResult(hours)
+
+	# every device is a bit in a big int, so each hour is a few big int
+	# operations however many devices there are
+	bits = store.switchedOn
+	switchesOn = [bits.flagsToInt(store.actionFlags(hour, True)) for hour in range(HOURS)]
+	switchesOff = [bits.flagsToInt(store.actionFlags(hour, False)) for hour in range(HOURS)]
+
+	# the consumption rates bit sliced too, so the home's wattage for an hour
+	# is the number of devices on in each plane times what that bit is worth
+	rates = store.consumptionRates.tobytes()
+	ratePlanes = [
+		bits.flagsToInt(rates.translate(bytes((b >> k) & 1 for b in range(256))))
+		for k in range(8)
+	]
+	ratePlanes = [(k, plane) for k, plane in enumerate(ratePlanes) if plane]
+
+	hoursOn = [0] * COUNTERBITS
+	switches = [0] * COUNTERBITS
+	switchedOn = bits.toInt()
+	hour = startHour
+
+	for _ in range(hours):
+		result.switchedOnCounts.append(switchedOn.bit_count())
+		result.hourlyEnergy.append(sum((switchedOn & plane).bit_count() << k for k, plane in ratePlanes))
+		addToCounter(hoursOn, switchedOn)
+
+		hour = (hour + 1) % HOURS
+		after = (switchedOn | switchesOn[hour]) & ~switchesOff[hour]
+		changed = switchedOn ^ after
+		result.switchCounts.append(changed.bit_count())
+		addToCounter(switches, changed)
+		switchedOn = after
+
+	result.hoursOn = counterToArray(hoursOn, numDevices)
+	result.deviceSwitches = counterToArray(switches, numDevices)
+	result.deviceEnergy = array("I", map(mul, result.hoursOn, rates))
+
+	final = BitSet(numDevices)
+	final.fromInt(switchedOn)
+	result.finalSwitchedOn = final.toFlags()
+	return result
+
+
+def mergeResults(results):
+	"""Combines the results of simulating many homes into one, as if they were one big home"""
+	merged = SimulationResult(results[0].hours if results else 0)
+	merged.switchedOnCounts = array("Q", bytes(8 * merged.hours))
+	merged.switchCounts = array("Q", bytes(8 * merged.hours))
+	merged.hourlyEnergy = array("Q", bytes(8 * merged.hours))
+
+	# map(add) adds each hour up in C
+	for result in results:
+		if result.hours != merged.hours:
+			raise ValueError("Results must all be for the same number of hours")
+		merged.switchedOnCounts = array("Q", map(add, merged.switchedOnCounts, result.switchedOnCounts))
+		merged.switchCounts = array("Q", map(add, merged.switchCounts, result.switchCounts))
+		merged.hourlyEnergy = array("Q", map(add, merged.hourlyEnergy, result.hourlyEnergy))
+		merged.hoursOn += result.hoursOn
+		merged.deviceSwitches += result.deviceSwitches
+		merged.deviceEnergy += result.deviceEnergy
+		merged.finalSwitchedOn += result.finalSwitchedOn
+	return merged
+
+def simulateShard(payloads, days, startHour):
+	"""Simulates a shard of homes in a worker process, each payload is a home's snapshot"""
+	# the snapshots are used where they are rather than loaded into a store,
+	# the simulation only needs the columns and not the schedule index
+	return [simulateSchedules(MappedDeviceStore(payload), days, startHour) for payload in payloads]
+
+def simulateHomes(homes, days, startHour=0, workers=None, shardsPerWorker=4):
+	"""
+	Simulates many independent homes across a pool of worker processes (one per
+	core unless workers is given). Each home is sent as a snapshot (bytes)
+	rather than pickled, and homes are sent in shards so each worker gets a
+	few big jobs rather than lots of small ones. Returns a SimulationResult
+	per home in the same order, which mergeResults can combine
+	"""
+	payloads = []
+	for home in homes:
+		buffer = io.BytesIO()
+		writeSnapshot(home.store, buffer)
+		payloads.append(buffer.getvalue())
+
+	workers = workers or os.cpu_count() or 1
+	if workers == 1:
+		return simulateShard(payloads, days, startHour) # no point starting a process
+
+	# shards are made of every nth home, so big and small homes are spread out
+	numShards = min(len(payloads), workers * shardsPerWorker)
+	shards = [payloads[i::numShards] for i in range(numShards)]
+
+	# only imported here, as it's slow to import and most programs never need it
+	from concurrent.futures import ProcessPoolExecutor
+
+	results = [None] * len(payloads)
+	with ProcessPoolExecutor(workers) as pool:
+		futures = [pool.submit(simulateShard, shard, days, startHour) for shard in shards]
+		for i, future in enumerate(futures):
+			results[i::numShards] = future.result()
+	return results
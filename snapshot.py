@@ -0,0 +1,282 @@
+from deviceStore import *
+import struct
+
+# A snapshot is a binary copy of a DeviceStore's columns, so loading one is
+# mostly copying bytes rather than parsing text. After the header come:
+#   kinds             1 byte per device
+#   switched on       bitset, 1 bit per device
+#   sleep mode        bitset, 1 bit per device
+#   consumption rates 1 byte per device
+#   schedules         2 bits per hour (the action code), 6 bytes per device
+SNAPSHOTMAGIC = b"SHOM"
+SNAPSHOTVERSION = 1
+SNAPSHOTHEADER = struct.Struct("<4sHxxQ") # magic, version, number of devices
+SNAPSHOTEXTENSION = ".shome"
+PACKEDHOURS = HOURS // 4 # bytes per device of packed schedule
+
+# translate tables for packing 4 action codes into a byte and back again
+SHIFTCODE = [bytes((b << shift) & 0xFF for b in range(256)) for shift in (0, 2, 4, 6)]
+UNSHIFTCODE = [bytes((b >> shift) & 3 for b in range(256)) for shift in (0, 2, 4, 6)]
+
+# any byte that isn't a valid kind or action code becomes 1
+BADKIND = bytes(0 if b in (DEVICE, PLUG, DOORBELL) else 1 for b in range(256))
+BADCODE = bytes(0 if b < len(CODEACTIONS) else 1 for b in range(256))
+
+# translate tables turning a packed byte into 1 if the action in the given
+# 2 bits is a code, by code and then shift
+PACKEDACTION = [
+	[bytes(1 if (b >> shift) & 3 == code else 0 for b in range(256)) for shift in (0, 2, 4, 6)]
+	for code in range(len(CODEACTIONS))
+]
+
+
+def packSchedules(schedules):
+	"""Packs schedules (one action code per byte) into 2 bits per action"""
+	# every 4th code goes in the same 2 bits of each packed byte, and as they
+	# don't overlap the shifted codes can be or-ed together as big ints
+	packed = 0
+	for i in range(4):
+		packed |= int.from_bytes(schedules[i::4].translate(SHIFTCODE[i]), "little")
+	return packed.to_bytes(len(schedules) // 4, "little")
+
+def unpackSchedules(packed):
+	"""The opposite of packSchedules, returns a bytearray with one action code per byte"""
+	schedules = bytearray(len(packed) * 4)
+	for i in range(4):
+		schedules[i::4] = packed.translate(UNSHIFTCODE[i])
+	return schedules
+
+def snapshotLayout(numDevices):
+	"""Returns where each section starts in a snapshot, and where the snapshot ends"""
+	bitsetSize = (numDevices + 7) // 8
+	kinds = SNAPSHOTHEADER.size
+	switchedOn = kinds + numDevices
+	sleepMode = switchedOn + bitsetSize
+	consumptionRates = sleepMode + bitsetSize
+	schedules = consumptionRates + numDevices
+	end = schedules + numDevices * PACKEDHOURS
+	return kinds, switchedOn, sleepMode, consumptionRates, schedules, end
+
+def readHeader(view):
+	"""Checks a snapshot's header, returns the number of devices in it"""
+	if len(view) < SNAPSHOTHEADER.size:
+		raise ValueError("File is too short to be a snapshot")
+
+	magic, version, numDevices = SNAPSHOTHEADER.unpack_from(view)
+	if magic != SNAPSHOTMAGIC:
+		raise ValueError("File is not a smart home snapshot")
+	if version != SNAPSHOTVERSION:
+		raise ValueError(f"Snapshot version {version} is not supported")
+
+	if len(view) != snapshotLayout(numDevices)[-1]:
+		raise ValueError("Snapshot is the wrong size for its number of devices")
+	return numDevices
+
+def writeSnapshot(store, file, progress=None, chunkRows=100000):
+	"""
+	Writes a store's devices to a binary file. If given, progress(bytesWritten, size)
+	is called after each chunk (at most chunkRows devices' worth) is written
+	"""
+	size = snapshotLayout(len(store))[-1]
+	written = 0
+	for section in snapshotSections(store, chunkRows):
+		file.write(section)
+		written += len(section)
+		if progress:
+			progress(written, size)
+
+def snapshotSections(store, chunkRows):
+	"""Yields the bytes of a store's snapshot in order, a chunk at a time"""
+	if isinstance(store, MappedDeviceStore):
+		# it's already a snapshot
+		for start in range(0, len(store.view), chunkRows * PACKEDHOURS):
+			yield store.view[start:start + chunkRows * PACKEDHOURS]
+		return
+
+	yield SNAPSHOTHEADER.pack(SNAPSHOTMAGIC, SNAPSHOTVERSION, len(store))
+	yield store.kinds
+	yield store.switchedOn.data
+	yield store.sleepMode.data
+	yield store.consumptionRates.tobytes()
+
+	# packing the schedules is most of the work, so it's done a chunk at a time
+	for start in range(0, len(store), chunkRows):
+		yield packSchedules(store.scheduleColumn(start, start + chunkRows))
+
+def readSnapshot(buffer, progress=None, chunkRows=100000):
+	"""
+	Makes a DeviceStore from a snapshot in anything that supports the buffer
+	protocol, e.g. bytes or an mmap of the file. If given, progress(devicesRead,
+	numDevices) is called after the schedules of each chunkRows devices are read
+	"""
+	with memoryview(buffer) as view:
+		numDevices = readHeader(view)
+		kinds, switchedOn, sleepMode, consumptionRates, schedules, end = snapshotLayout(numDevices)
+		kinds = bytes(view[kinds:switchedOn])
+		switchedOn = BitSet.fromData(view[switchedOn:sleepMode], numDevices)
+		sleepMode = BitSet.fromData(view[sleepMode:consumptionRates], numDevices)
+		rates = array("B")
+		rates.frombytes(view[consumptionRates:schedules])
+
+		# checked all at once with translate rather than device by device
+		if kinds.translate(BADKIND).count(1):
+			raise ValueError("Invalid device type")
+		if numDevices and max(rates) > 150:
+			raise ValueError("Consumption rate must be between 0 and 150")
+
+		store = DeviceStore()
+		store.setColumns(kinds, switchedOn, rates, sleepMode, b"")
+
+		# unpacking and indexing the schedules is most of the work, so
+		# it's done a chunk of devices at a time
+		for start in range(0, numDevices, chunkRows):
+			stop = min(start + chunkRows, numDevices)
+			codes = unpackSchedules(bytes(view[schedules + start * PACKEDHOURS:schedules + stop * PACKEDHOURS]))
+			if codes.translate(BADCODE).count(1):
+				raise ValueError("Action must be None (no change), True (on), or False (off)")
+			store.addSchedules(codes)
+
+			if progress:
+				progress(stop, numDevices)
+
+	return store
+
+
+class MappedDeviceStore(DeviceStore):
+	"""
+		A DeviceStore that uses the columns of a snapshot where they are, in
+		anything with the buffer protocol (e.g. an mmap of the file), rather
+		than loading them. Opening one only reads the header, and rows are
+		only read when they're asked for. Changes are written straight to the
+		buffer, so it has to be writable (mmap with ACCESS_WRITE) to change
+		anything. A snapshot can't grow, so adding or removing devices loads
+		every row into memory first and the store becomes a normal DeviceStore
+	"""
+	def __init__(self, buffer):
+		self.listeners = []
+		self.views = WeakValueDictionary()
+		self.buffer = buffer
+		self.view = memoryview(buffer)
+		numDevices = readHeader(self.view)
+
+		kinds, switchedOn, sleepMode, consumptionRates, schedules, end = snapshotLayout(numDevices)
+		self.kinds = self.view[kinds:switchedOn]
+		self.switchedOn = BitSet.fromBuffer(self.view[switchedOn:sleepMode], numDevices)
+		self.sleepMode = BitSet.fromBuffer(self.view[sleepMode:consumptionRates], numDevices)
+		self.consumptionRates = self.view[consumptionRates:schedules]
+		self.schedules = self.view[schedules:end] # still packed, 6 bytes per device
+		self.clearSlots()
+		self.idSpace = object()
+		self.counted = False # worked out the first time they're asked for
+
+	def copy(self):
+		# a copy of the snapshot's bytes, which is all the rows
+		return MappedDeviceStore(bytearray(self.view))
+
+	def unmap(self):
+		"""Loads every row into memory, after this it's a normal DeviceStore"""
+		# they're the same devices, so their ids still work and the device
+		# objects added to the home stay attached
+		idSpace, views = self.idSpace, self.views
+		self.views = WeakValueDictionary()
+		self.takeRows(readSnapshot(self.view))
+		self.idSpace, self.views = idSpace, views
+
+	def clear(self):
+		self.takeRows(DeviceStore())
+
+	# unmap makes this a DeviceStore, but DeviceStore's methods are called
+	# by name rather than relying on that, so these can't come back here
+	def append(self, *args, **kwargs):
+		self.unmap()
+		return DeviceStore.append(self, *args, **kwargs)
+
+	def extend(self, *args):
+		self.unmap()
+		DeviceStore.extend(self, *args)
+
+	def delete(self, row):
+		self.unmap()
+		DeviceStore.delete(self, row)
+
+	def deleteUnordered(self, row):
+		self.unmap()
+		return DeviceStore.deleteUnordered(self, row)
+
+	def getKind(self, row):
+		# nothing is checked when the file is opened, so check as rows are read
+		kind = self.kinds[row]
+		if BADKIND[kind]:
+			raise ValueError("Invalid device type")
+		return kind
+
+	def getConsumptionRate(self, row):
+		consumptionRate = self.consumptionRates[row]
+		if consumptionRate > 150:
+			raise ValueError("Consumption rate must be between 0 and 150")
+		return consumptionRate
+
+	def getAction(self, row, hour):
+		packed = self.schedules[row * PACKEDHOURS + hour // 4]
+		code = UNSHIFTCODE[hour % 4][packed]
+		if BADCODE[code]:
+			raise ValueError("Action must be None (no change), True (on), or False (off)")
+		return CODEACTIONS[code]
+
+	def setAction(self, row, hour, action):
+		i = row * PACKEDHOURS + hour // 4
+		shift = hour % 4 * 2
+		self.schedules[i] = self.schedules[i] & ~(3 << shift) & 0xFF | ACTIONCODES[action] << shift
+
+	def getScheduleCodes(self, row):
+		codes = bytes(unpackSchedules(self.schedules[row * PACKEDHOURS:(row + 1) * PACKEDHOURS].tobytes()))
+		if codes.translate(BADCODE).count(1):
+			raise ValueError("Action must be None (no change), True (on), or False (off)")
+		return codes
+
+	def setScheduleCodes(self, row, codes):
+		self.schedules[row * PACKEDHOURS:(row + 1) * PACKEDHOURS] = packSchedules(checkScheduleCodes(codes))
+
+	def mapSchedules(self, rows, change):
+		# schedules are packed in the snapshot, so each row is written,
+		# but each different schedule is only changed once
+		packed = {}
+		for row in rows:
+			codes = self.getScheduleCodes(row)
+			if codes not in packed:
+				packed[codes] = packSchedules(checkScheduleCodes(change(codes)))
+			self.schedules[row * PACKEDHOURS:(row + 1) * PACKEDHOURS] = packed[codes]
+
+	def scheduleColumn(self, start=0, end=None):
+		start, end, _ = slice(start, end).indices(len(self))
+		return bytes(unpackSchedules(self.schedules[start * PACKEDHOURS:end * PACKEDHOURS].tobytes()))
+
+	def countKind(self, kind):
+		return self.kinds.tobytes().count(kind)
+
+	def kindFlags(self, kind):
+		table = bytes(1 if b == kind else 0 for b in range(256))
+		return self.kinds.tobytes().translate(table)
+
+	def actionFlags(self, hour, action):
+		packed = self.schedules[hour // 4::PACKEDHOURS].tobytes()
+		return packed.translate(PACKEDACTION[ACTIONCODES[action]][hour % 4])
+
+	def applyScheduleAt(self, hour):
+		# there's no per hour index, as building it would mean reading every
+		# schedule when the file's opened. Instead the byte holding this hour
+		# for every device is picked out and checked all at once
+		switchesOn = self.switchedOn.flagsToInt(self.actionFlags(hour, True))
+		switchesOff = self.switchedOn.flagsToInt(self.actionFlags(hour, False))
+
+		before = self.switchedOn.toInt()
+		after = (before | switchesOn) & ~switchesOff
+		self.switchedOn.fromInt(after)
+
+		changed = setBitPositions(before ^ after)
+		if self.counted:
+			for row in changed:
+				sign = 1 if after >> row & 1 else -1
+				self.onCount += sign
+				self.activeRate += sign * self.consumptionRates[row]
+		return changed
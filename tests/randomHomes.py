@@ -0,0 +1,40 @@
+import random
+from backendChallenge import *
+
+# random homes shared by the tests, pytest puts this folder on the path
+
+
+def randomSchedule(rng):
+	"""A schedule with a few random actions, or no actions like most devices"""
+	schedule = [None] * HOURS
+	if rng.random() < 0.5:
+		for hour in rng.sample(range(HOURS), rng.randint(1, 4)):
+			schedule[hour] = rng.choice((True, False))
+	return schedule
+
+def randomDevice(rng):
+	if rng.random() < 0.6:
+		device = SmartPlug(rng.randint(0, 150))
+	else:
+		device = SmartDoorbell()
+		device.setSleep(rng.random() < 0.5)
+	if rng.random() < 0.5:
+		device.toggleSwitch()
+	device.setSchedule(randomSchedule(rng))
+	return device
+
+def deviceState(device):
+	"""Everything about a device, to compare devices by"""
+	option = device.getConsumptionRate() if isinstance(device, SmartPlug) else device.getSleep()
+	return (type(device).__name__, device.getSwitchedOn(), option, tuple(device.getSchedule()))
+
+def homeState(home):
+	return [deviceState(device) for device in home.getDevices()]
+
+def makeHome(numDevices, seed=0):
+	"""A home of random devices, the same ones for the same seed"""
+	rng = random.Random(seed)
+	home = SmartHome()
+	for _ in range(numDevices):
+		home.addDevice(randomDevice(rng))
+	return home
@@ -0,0 +1,312 @@
+import random
+import pytest
+from deviceStore import *
+
+
+def makeStore(numRows):
+	"""A store of plugs whose consumption rate is their number, so rows can be told apart"""
+	store = DeviceStore()
+	for i in range(numRows):
+		store.append(PLUG, consumptionRate=i)
+	return store
+
+def codesOf(actions):
+	"""Action codes for a schedule given as {hour: action}"""
+	codes = bytearray(HOURS)
+	for hour, action in actions.items():
+		codes[hour] = ACTIONCODES[action]
+	return bytes(codes)
+
+
+############################################
+# BitSet, checked against a plain list of bools
+############################################
+def testBitSetMatchesList():
+	rng = random.Random(1)
+	bits = BitSet()
+	expected = []
+	for _ in range(2000):
+		op = rng.random()
+		if op < 0.4 or not expected:
+			value = rng.random() < 0.5
+			bits.append(value)
+			expected.append(value)
+		elif op < 0.55:
+			assert bits.pop() == expected.pop()
+		elif op < 0.7:
+			i = rng.randrange(len(expected))
+			bits.delete(i)
+			del expected[i]
+		elif op < 0.85:
+			i = rng.randrange(len(expected))
+			bits.toggle(i)
+			expected[i] = not expected[i]
+		else:
+			i = rng.randrange(len(expected))
+			value = rng.random() < 0.5
+			bits.set(i, value)
+			expected[i] = value
+
+		assert len(bits) == len(expected)
+		assert len(bits.data) == (len(expected) + 7) // 8
+
+	assert [bits.get(i) for i in range(len(bits))] == expected
+	assert bits.toFlags() == bytes(expected)
+	assert bits.count() == sum(expected)
+
+def testBitSetDeleteClearsTheOldLastBit():
+	bits = BitSet()
+	bits.extendFlags(bytes([1]) * 17)
+	bits.delete(3)
+	assert len(bits) == 16
+	assert bits.toInt() == (1 << 16) - 1 # nothing left over past the end
+
+def testBitSetInts():
+	bits = BitSet(10)
+	bits.fromInt(-1) # bits past the end are dropped
+	assert bits.toInt() == (1 << 10) - 1
+
+	flags = bytes([1, 0, 0, 1, 1, 0, 1, 0, 0, 1])
+	bits.fromInt(bits.flagsToInt(flags))
+	assert bits.toFlags() == flags
+
+	bits.setMask(0b11, False)
+	bits.toggleMask(0b100)
+	assert bits.toFlags() == bytes([0, 0, 1, 1, 1, 0, 1, 0, 0, 1])
+
+def testBitSetExtendFlags():
+	bits = BitSet()
+	bits.append(True)
+	bits.extendFlags(bytes([0, 1, 1]))
+	assert bits.toFlags() == bytes([1, 0, 1, 1])
+	assert BitSet.fromData(bits.data, 2).toFlags() == bytes([1, 0])
+
+def testBitSetCopyIsSeparate():
+	bits = BitSet(9)
+	copy = bits.copy()
+	copy.set(8, True)
+	assert not bits.get(8)
+	assert copy.get(8)
+
+
+############################################
+# The slot table behind device ids
+############################################
+def testIdsFollowRowsThroughRemoval():
+	rng = random.Random(2)
+	store = makeStore(100)
+	ids = {i: store.getId(i) for i in range(100)} # rate -> id
+	removed = []
+
+	for _ in range(60):
+		row = rng.randrange(len(store))
+		removed.append(ids.pop(store.getConsumptionRate(row)))
+		if rng.random() < 0.5:
+			store.delete(row)
+		else:
+			store.deleteUnordered(row)
+
+		for rate, deviceId in ids.items():
+			assert store.getConsumptionRate(store.getRow(deviceId)) == rate
+
+	for deviceId in removed:
+		with pytest.raises(ValueError):
+			store.getRow(deviceId)
+
+def testDeleteKeepsOrder():
+	store = makeStore(10)
+	store.delete(3)
+	store.delete(0)
+	assert list(store.consumptionRates) == [1, 2, 4, 5, 6, 7, 8, 9]
+
+def testReusedSlotsGetNewIds():
+	store = makeStore(5)
+	oldId = store.getId(2)
+	store.delete(2)
+	row = store.append(PLUG, consumptionRate=99)
+
+	newId = store.getId(row)
+	assert newId & SLOTMASK == oldId & SLOTMASK # the free slot is used again
+	assert newId != oldId
+	assert store.getRow(newId) == row
+	with pytest.raises(ValueError):
+		store.getRow(oldId)
+
+def testSlotIdsAndRows():
+	store = makeStore(6)
+	store.delete(1)
+	store.deleteUnordered(0)
+
+	rows = list(store.slotsToRows(range(2, 6)))
+	assert sorted(rows) == list(range(len(store)))
+	for slot in range(6):
+		deviceId = store.getSlotId(slot)
+		if slot in (0, 1):
+			assert deviceId is None
+		else:
+			assert store.getSlot(store.getRow(deviceId)) == slot
+
+def testClearStartsIdsAgain():
+	store = makeStore(3)
+	idSpace = store.idSpace
+	store.delete(0)
+	store.clear()
+	assert store.idSpace is not idSpace
+	store.append(PLUG)
+	assert store.getId(0) == 0
+
+
+############################################
+# Schedules and the per hour index
+############################################
+def indexedRows(store, index, hour):
+	"""The rows whose slots are set in one hour of onAtHour or offAtHour"""
+	slots = setBitPositions(int.from_bytes(index[hour], "little"))
+	return sorted(store.slotsToRows(slots))
+
+def testScheduleMasks():
+	store = makeStore(3)
+	store.setScheduleCodes(0, codesOf({7: True, 22: False}))
+
+	assert store.getScheduleMasks(0) == (1 << 7, 1 << 22)
+	assert store.getScheduleMasks(1) == (0, 0)
+	assert store.getAction(0, 7) is True
+	assert store.getAction(0, 8) is None
+
+def testChangingOneScheduleOnlyChangesOneRow():
+	store = makeStore(2)
+	store.setScheduleCodes(0, codesOf({7: True}))
+	store.setScheduleCodes(1, codesOf({7: True}))
+	store.setAction(1, 8, False)
+
+	assert store.getScheduleCodes(0) == codesOf({7: True})
+	assert store.getScheduleCodes(1) == codesOf({7: True, 8: False})
+	assert indexedRows(store, store.offAtHour, 8) == [1]
+
+def testRemovedRowsLeaveTheIndex():
+	store = makeStore(2)
+	store.setScheduleCodes(0, codesOf({3: True}))
+	store.delete(0)
+	assert indexedRows(store, store.onAtHour, 3) == []
+
+	# the new row reuses the freed slot
+	store.append(PLUG, schedule=codesOf({4: False}))
+	assert indexedRows(store, store.offAtHour, 4) == [1]
+	assert len(store.schedules) == 2 * HOURS
+
+def testSchedulesMustHave24Codes():
+	store = makeStore(2)
+	with pytest.raises(ValueError):
+		store.setScheduleCodes(0, bytes(HOURS - 1))
+	with pytest.raises(ValueError):
+		store.mapSchedules([0, 1], lambda codes: codes + b"\x00")
+	with pytest.raises(ValueError):
+		store.append(PLUG, schedule=bytes(HOURS + 1))
+	assert len(store) == 2
+	assert store.scheduleColumn() == bytes(2 * HOURS)
+
+def testScheduleIndexFollowsRows():
+	rng = random.Random(3)
+	store = makeStore(80)
+	for row in range(80):
+		store.setScheduleCodes(row, codesOf({rng.randrange(HOURS): rng.choice((True, False))}))
+	for _ in range(30):
+		row = rng.randrange(len(store))
+		if rng.random() < 0.5:
+			store.delete(row)
+		else:
+			store.deleteUnordered(row)
+		if rng.random() < 0.3:
+			store.setAction(rng.randrange(len(store)), rng.randrange(HOURS), rng.choice((None, True, False)))
+
+	for hour in range(HOURS):
+		for index, action in ((store.onAtHour, True), (store.offAtHour, False)):
+			assert indexedRows(store, index, hour) == [row for row in range(len(store)) if store.getAction(row, hour) is action]
+			assert store.actionFlags(hour, action) == bytes(store.getAction(row, hour) is action for row in range(len(store)))
+
+	# a tick switches exactly the rows with an action at that hour
+	for hour in range(HOURS):
+		store.setAllSwitchedOn(False)
+		changed = sorted(store.applyScheduleAt(hour))
+		assert changed == [row for row in range(len(store)) if store.getAction(row, hour) is True]
+
+@pytest.mark.parametrize("rows", [range(10), [2, 3]]) # the index an hour at a time, and a row at a time
+def testMapSchedulesChangesEachScheduleOnce(rows):
+	store = makeStore(150)
+	for row in range(150):
+		store.setScheduleCodes(row, codesOf({row % 2: True}))
+
+	seen = []
+	def change(codes):
+		seen.append(codes)
+		return shiftScheduleCodes(codes, 1)
+	store.mapSchedules(rows, change)
+
+	assert len(seen) == 2
+	assert store.getScheduleCodes(3) == codesOf({2: True})
+	assert store.getScheduleCodes(20) == codesOf({0: True})
+	assert indexedRows(store, store.onAtHour, 2) == [row for row in rows if row % 2 == 1]
+
+
+############################################
+# Adding rows and running totals
+############################################
+def checkTotals(store):
+	totals = store.getTotals()
+	store.recount()
+	assert totals == store.getTotals()
+
+def testAppendDoesNotHalfAddARow():
+	store = makeStore(3)
+	with pytest.raises(TypeError):
+		store.append(PLUG, consumptionRate=1.5)
+	with pytest.raises(OverflowError):
+		store.append(PLUG, consumptionRate=300)
+
+	assert len(store) == 3
+	assert len(store.consumptionRates) == len(store.switchedOn) == len(store.schedules) // HOURS == 3
+	checkTotals(store)
+
+def testTotalsAfterFailedWrites():
+	store = makeStore(5)
+	store.setSwitchedOn(2, True)
+	with pytest.raises(OverflowError):
+		store.setConsumptionRate(2, 300)
+	assert store.getTotals()["activeWattage"] == 2
+	checkTotals(store)
+
+def testTotalsAfterRandomChanges():
+	rng = random.Random(4)
+	store = DeviceStore()
+	for _ in range(300):
+		kind = rng.choice((PLUG, DOORBELL))
+		store.append(kind, rng.random() < 0.5, rng.randint(0, 150) if kind == PLUG else 0, kind == DOORBELL and rng.random() < 0.5)
+
+	for _ in range(500):
+		row = rng.randrange(len(store))
+		op = rng.randrange(6)
+		if op == 0:
+			store.toggleSwitch(row)
+		elif op == 1 and store.getKind(row) == PLUG:
+			store.setConsumptionRate(row, rng.randint(0, 150))
+		elif op == 2:
+			store.delete(row)
+		elif op == 3:
+			store.deleteUnordered(row)
+		elif op == 4:
+			store.setSwitchedOnMany(rng.sample(range(len(store)), 3), True)
+		else:
+			store.toggleSwitchMany(range(0, len(store), 3))
+		checkTotals(store)
+
+def testCopyIsSeparate():
+	store = makeStore(4)
+	store.setScheduleCodes(1, codesOf({5: True}))
+	store.delete(0)
+	copy = store.copy()
+
+	copy.setAction(0, 5, False)
+	copy.delete(1)
+	assert store.getAction(0, 5) is True
+	assert len(store) == 3
+	assert [copy.getId(row) for row in range(2)] == [store.getId(0), store.getId(2)] # ids are kept
@@ -0,0 +1,70 @@
+import random
+import pytest
+from backendChallenge import *
+from energyLedger import *
+from randomHomes import *
+
+
+def testLanes():
+	value = int.from_bytes(bytes([1, 2, 255, 4]), "little")
+	wide = widenLanes(value, 4, 1, 2)
+	assert list(lanesToArray(wide, 4, 2)) == [1, 2, 255, 4]
+	assert list(lanesToArray(wide + wide, 4, 2)) == [2, 4, 510, 8] # no carry into the next lane
+	assert list(lanesToArray(widenLanes(wide, 4, 2, 4), 4, 4)) == [1, 2, 255, 4]
+	assert list(lanesToArray(wide & laneMask([1, 3], 4, 2), 4, 2)) == [1, 0, 255, 0]
+
+def testLedgerMatchesTicking():
+	rng = random.Random(7)
+	home = makeHome(100, seed=7)
+	ledger = EnergyLedger(home)
+	ids = [device.getId() for device in home.getDevices()]
+	used = {deviceId: [] for deviceId in ids} # Wh each hour
+
+	for hour in range(HOURS * 9 + 5):
+		ledger.record()
+		for device in home.getDevices():
+			on = device.getSwitchedOn() and isinstance(device, SmartPlug)
+			used[device.getId()].append(device.getConsumptionRate() if on else 0)
+		home.applyScheduleAtHour((hour + 1) % HOURS)
+		if hour % 10 == 0:
+			home.toggleSwitch(rng.randrange(100))
+
+	# 9 whole days and 5 hours into the 10th
+	for deviceId in rng.sample(ids, 20):
+		hours = used[deviceId]
+		assert ledger.getEnergy(deviceId, "hour") == hours[-1]
+		assert ledger.getEnergy(deviceId, "day") == sum(hours[-5:])
+		assert ledger.getEnergy(deviceId, "week") == sum(hours[-(5 + 6 * HOURS):])
+		assert ledger.getEnergy(deviceId, "month") == sum(hours)
+		assert ledger.getHourlyEnergy(deviceId) == hours[-HOURS:]
+
+	assert ledger.getTotalEnergy("month") == sum(map(sum, used.values()))
+	assert ledger.getTotalEnergy("day") == sum(sum(hours[-5:]) for hours in used.values())
+
+	top = ledger.topConsumers(5, "month")
+	assert [energy for _, energy in top] == sorted((sum(hours) for hours in used.values()), reverse=True)[:5]
+
+def testLedgerForgetsRemovedDevices():
+	home = SmartHome()
+	for rate in (10, 20, 30):
+		plug = SmartPlug(rate)
+		plug.toggleSwitch()
+		home.addDevice(plug)
+	ledger = EnergyLedger(home)
+	ledger.record()
+
+	removed = home.getDeviceAt(1).getId()
+	home.removeDeviceAt(1)
+	newId = home.addDevice(SmartPlug(0)) # takes the removed device's slot
+	ledger.record()
+
+	with pytest.raises(ValueError):
+		ledger.getEnergy(removed)
+	assert ledger.getEnergy(newId) == 0
+	assert ledger.getEnergy(home.getDeviceAt(1).getId()) == 60
+	assert ledger.getTotalEnergy() == 60 + 40 # the removed device still counts towards the home
+	assert [deviceId for deviceId, _ in ledger.topConsumers(3)] == [home.getDeviceAt(1).getId(), home.getDeviceAt(0).getId()]
+
+def testLedgerPeriods():
+	with pytest.raises(ValueError):
+		EnergyLedger(SmartHome()).getTotalEnergy("fortnight")
@@ -0,0 +1,128 @@
+import pytest
+from backendChallenge import *
+from scheduler import *
+
+
+def makeHome(numPlugs):
+	home = SmartHome()
+	for _ in range(numPlugs):
+		home.addDevice(SmartPlug(10))
+	return home
+
+def checkCancelled(scheduler):
+	"""cancelled should be how many heap entries are for cancelled actions"""
+	waiting = [entry for entry in scheduler.heap if entry[3] != HOURLYSCHEDULE and entry[3] not in scheduler.actions]
+	assert scheduler.cancelled == len(waiting)
+
+
+def testTimedActionOnTheHourRunsAfterTheSchedule():
+	home = makeHome(1)
+	plug = home.getDeviceAt(0)
+	plug.setActionAtHour(1, True)
+	scheduler = Scheduler(home)
+	scheduler.scheduleAction(plug.getId(), HOUR, False)
+
+	assert scheduler.runUntil(HOUR) == [0]
+	assert not plug.getSwitchedOn() # the schedule switched it on, then the action off
+
+def testActionsRunInOrder():
+	home = makeHome(2)
+	scheduler = Scheduler(home)
+	first, second = (home.getDeviceAt(index).getId() for index in range(2))
+	scheduler.scheduleAction(first, 30, True)
+	scheduler.scheduleAction(first, 30, False) # same time, added later so it's carried out later
+	scheduler.scheduleAction(second, 10 * MINUTE, True)
+
+	assert scheduler.runUntil(29) == []
+	assert scheduler.runUntil(30) == [0] # switched on and back off
+	assert not home.getDeviceAt(0).getSwitchedOn()
+	assert scheduler.advance(10 * MINUTE) == [1]
+	assert scheduler.now == 30 + 10 * MINUTE
+	assert len(scheduler) == 0
+
+def testRepeatingActions():
+	home = makeHome(1)
+	plug = home.getDeviceAt(0)
+	scheduler = Scheduler(home)
+	on = scheduler.scheduleAction(plug.getId(), 0, True, every=20)
+	scheduler.scheduleAction(plug.getId(), 10, False, every=20)
+
+	for time in range(0, 200, 5):
+		scheduler.runUntil(time)
+		assert plug.getSwitchedOn() == (time % 20 < 10)
+	assert len(scheduler) == 2
+
+	scheduler.cancelAction(on)
+	scheduler.runUntil(1000)
+	assert not plug.getSwitchedOn()
+	assert scheduler.nextDue() == 1010
+
+def testCancelAction():
+	home = makeHome(1)
+	deviceId = home.getDeviceAt(0).getId()
+	scheduler = Scheduler(home)
+	actionIds = [scheduler.scheduleAction(deviceId, 100 + i, True) for i in range(10)]
+
+	scheduler.cancelAction(actionIds[0])
+	checkCancelled(scheduler)
+	assert scheduler.nextDue() == 101 # the cancelled entry is skipped
+	checkCancelled(scheduler)
+
+	with pytest.raises(ValueError):
+		scheduler.cancelAction(actionIds[0])
+
+	# once most of the heap is cancelled it's rebuilt without them
+	for actionId in actionIds[1:8]:
+		scheduler.cancelAction(actionId)
+		checkCancelled(scheduler)
+	assert len(scheduler.heap) < 10
+	assert len(scheduler) == 2
+	assert scheduler.nextDue() == 108
+	assert scheduler.runUntil(200) == [0]
+	checkCancelled(scheduler)
+
+def testActionsForRemovedDevicesAreDropped():
+	home = makeHome(3)
+	scheduler = Scheduler(home)
+	removedId = home.getDeviceAt(1).getId()
+	scheduler.scheduleAction(removedId, 10, True)
+	scheduler.scheduleAction(removedId, 5, True, every=10)
+	scheduler.scheduleAction(home.getDeviceAt(2).getId(), 10, True)
+	home.removeDeviceAt(1)
+
+	assert scheduler.runUntil(100) == [1] # the last device, now at index 1
+	assert len(scheduler) == 0
+
+def testChecksItsArguments():
+	home = makeHome(1)
+	deviceId = home.getDeviceAt(0).getId()
+	scheduler = Scheduler(home, now=50)
+
+	with pytest.raises(ValueError):
+		scheduler.runUntil(49)
+	with pytest.raises(ValueError):
+		scheduler.advance(-1)
+	with pytest.raises(ValueError):
+		scheduler.scheduleAction(deviceId, 49, True)
+	with pytest.raises(ValueError):
+		scheduler.scheduleAction(deviceId, 60, True, every=0)
+	with pytest.raises(ValueError):
+		scheduler.scheduleAction(deviceId, 60, None)
+	with pytest.raises(ValueError):
+		scheduler.scheduleAction(deviceId + 1, 60, True)
+	with pytest.raises(ValueError):
+		Scheduler(home, now=-1)
+
+def testHourlySchedulesEveryHour():
+	home = makeHome(1)
+	plug = home.getDeviceAt(0)
+	plug.setActionAtHour(2, True)
+	plug.setActionAtHour(5, False)
+	scheduler = Scheduler(home, now=HOUR + 30)
+
+	assert scheduler.runUntil(2 * HOUR - 1) == []
+	assert scheduler.runUntil(2 * HOUR) == [0]
+	assert scheduler.getHour() == 2
+	assert scheduler.advance(DAY) == [0] # off at 5:00, then on again at 2:00 the next day
+	assert plug.getSwitchedOn()
+	assert scheduler.getHour() == 2
@@ -0,0 +1,83 @@
+import pytest
+from backendChallenge import *
+from simulation import *
+from randomHomes import *
+
+
+def tick(home, days, startHour):
+	"""Runs the clock a tick at a time like the GUI does, returning what simulate should"""
+	devices = list(home.getDevices())
+	result = {
+		"switchedOnCounts": [], "switchCounts": [], "hourlyEnergy": [],
+		"hoursOn": [0] * len(devices), "deviceSwitches": [0] * len(devices), "deviceEnergy": [0] * len(devices)
+	}
+
+	hour = startHour
+	for _ in range(days * HOURS):
+		totals = home.getTotals()
+		result["switchedOnCounts"].append(totals["switchedOn"])
+		result["hourlyEnergy"].append(totals["activeWattage"])
+		for index, device in enumerate(devices):
+			if device.getSwitchedOn():
+				result["hoursOn"][index] += 1
+				if isinstance(device, SmartPlug):
+					result["deviceEnergy"][index] += device.getConsumptionRate()
+
+		hour = (hour + 1) % HOURS
+		changed = home.applyScheduleAtHour(hour)
+		result["switchCounts"].append(len(changed))
+		for index in changed:
+			result["deviceSwitches"][index] += 1
+	return result
+
+def checkResult(result, expected):
+	for name, values in expected.items():
+		assert list(getattr(result, name)) == values, name
+
+
+@pytest.mark.parametrize("startHour", [0, 13, 23])
+def testSimulateMatchesTicking(startHour):
+	home = makeHome(150, seed=startHour)
+	home.removeDeviceAt(3) # so the schedules are kept by slot rather than row
+	before = homeState(home)
+
+	result = home.simulate(3, startHour)
+	assert homeState(home) == before # simulating doesn't change the devices
+
+	checkResult(result, tick(home, 3, startHour))
+	assert result.finalSwitchedOn == bytes(device.getSwitchedOn() for device in home.getDevices())
+	assert result.getTotalEnergy() == sum(result.hourlyEnergy)
+
+def testSimulateNothing():
+	result = SmartHome().simulate(2)
+	assert list(result.hourlyEnergy) == [0] * 48
+	assert result.finalSwitchedOn == b""
+	assert len(makeHome(5).simulate(0).hourlyEnergy) == 0
+
+def testSimulateChecksItsArguments():
+	with pytest.raises(ValueError):
+		SmartHome().simulate(-1)
+	with pytest.raises(ValueError):
+		SmartHome().simulate(1, 24)
+
+def testHoursOnPastTheFirstCounterBits():
+	# a device on for longer than COUNTERBITS can count makes the counter grow
+	home = SmartHome()
+	plug = SmartPlug(150)
+	plug.toggleSwitch()
+	home.addDevice(plug)
+	days = (1 << COUNTERBITS) // HOURS + 1
+	hours = days * HOURS
+	result = home.simulate(days)
+	assert list(result.hoursOn) == [hours]
+	assert list(result.deviceEnergy) == [hours * 150]
+
+def testSimulateManyHomes():
+	homes = [makeHome(numDevices, seed=numDevices) for numDevices in (0, 30, 70)]
+	results = simulateHomes(homes, 2, startHour=5, workers=1)
+	for home, result in zip(homes, results):
+		checkResult(result, {"hourlyEnergy": list(home.simulate(2, 5).hourlyEnergy)})
+
+	merged = mergeResults(results)
+	assert list(merged.hourlyEnergy) == [sum(hour) for hour in zip(*(result.hourlyEnergy for result in results))]
+	assert len(merged.hoursOn) == 100
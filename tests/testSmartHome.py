@@ -0,0 +1,336 @@
+import io
+import pickle
+import random
+import pytest
+from backendChallenge import *
+from randomHomes import *
+
+
+def checkTotals(home):
+	"""The running totals should be what looking at every device gives"""
+	devices = list(home.getDevices())
+	plugs = [device for device in devices if isinstance(device, SmartPlug)]
+	doorbells = [device for device in devices if isinstance(device, SmartDoorbell)]
+	switchedOn = sum(device.getSwitchedOn() for device in devices)
+
+	assert home.getTotals() == {
+		"activeWattage": sum(plug.getConsumptionRate() for plug in plugs if plug.getSwitchedOn()),
+		"switchedOn": switchedOn,
+		"switchedOff": len(devices) - switchedOn,
+		"sleepingDoorbells": sum(doorbell.getSleep() for doorbell in doorbells),
+		"plugs": len(plugs),
+		"doorbells": len(doorbells)
+	}
+
+
+############################################
+# CSV
+############################################
+def testCSVRoundTrip():
+	home = makeHome(200)
+	csv = home.getCSV()
+	assert csv.startswith(CSVHEADER)
+
+	other = SmartHome()
+	other.importCSV(csv)
+	assert homeState(other) == homeState(home)
+	assert other.getCSV() == csv
+	checkTotals(other)
+
+def testCSVFileRoundTrip():
+	home = makeHome(250, seed=1)
+	file = io.StringIO()
+	home.writeCSV(file)
+
+	file.seek(0)
+	read = []
+	other = SmartHome()
+	other.importFile(file, lambda devices, charsRead: read.append(devices), chunkRows=100)
+	assert read == [100, 200, 250]
+	assert homeState(other) == homeState(home)
+
+def testCSVImportTellsListenersOnABadRow():
+	home = makeHome(5)
+	events = []
+	home.addListener(lambda event, index: events.append(event))
+
+	csv = makeHome(3).getCSV() + "SmartKettle, True, 10, \n"
+	with pytest.raises(ValueError):
+		home.importCSV(csv)
+	assert events == [BULKCHANGED]
+	assert len(home.getDevices()) == 0 # every row is checked before any is added
+	checkTotals(home)
+
+def testFileImportKeepsTheChunksBeforeABadRow():
+	home = SmartHome()
+	file = io.StringIO(makeHome(5).getCSV() + "SmartKettle, True, 10, \n")
+	with pytest.raises(ValueError):
+		home.importFile(file, chunkRows=2)
+	assert len(home.getDevices()) == 4 # the bad row's chunk has the 5th device in it
+
+def testCSVImportChecksRates():
+	home = SmartHome()
+	with pytest.raises(ValueError):
+		home.importCSV(CSVHEADER + "SmartPlug, True, 151, \n")
+
+
+############################################
+# Devices as views
+############################################
+def testDeviceOnItsOwn():
+	plug = SmartPlug(45)
+	plug.toggleSwitch()
+	plug.setConsumptionRate(42)
+	assert plug.getSwitchedOn()
+	assert plug.getConsumptionRate() == 42
+	assert plug.getId() is None
+
+	with pytest.raises(ValueError):
+		SmartPlug(151)
+	with pytest.raises(ValueError):
+		plug.setConsumptionRate(1.5)
+	assert plug.getConsumptionRate() == 42
+
+def testAddedDeviceChangesTheHome():
+	home = SmartHome()
+	plug = SmartPlug(10)
+	home.addDevice(plug)
+	plug.toggleSwitch()
+	plug.setActionAtHour(6, True)
+
+	assert home.getDeviceAt(0).getSwitchedOn()
+	assert home.getDeviceAt(0).getSchedule()[6] is True
+	assert home.getTotals()["activeWattage"] == 10
+
+def testOldAttributesStillWork():
+	home = SmartHome()
+	plug = SmartPlug(10)
+	doorbell = SmartDoorbell()
+	home.addDevice(plug)
+	home.addDevice(doorbell)
+
+	plug.switchedOn = True
+	plug.consumptionRate = 20
+	doorbell.sleepMode = True
+	doorbell.schedule[3] = False
+	assert home.getTotals()["activeWattage"] == 20
+	assert home.getDeviceAt(1).getSleep()
+	assert home.getDeviceAt(1).getSchedule()[3] is False
+
+	plug.schedule = [True] * HOURS
+	assert home.getDeviceAt(0).getSchedule() == [True] * HOURS
+	checkTotals(home)
+
+def testStr():
+	home = SmartHome()
+	home.addDevice(SmartPlug(45))
+	home.addDevice(SmartDoorbell())
+	assert str(home) == (
+		"SmartHome"
+		"\n0: SmartPlug: switched on: False, comp. rate: 45"
+		"\n1: SmartDoorbell: switched on: False, sleep mode: False"
+	)
+
+def testViewsFollowTheirDevice():
+	home = makeHome(10)
+	device = home.getDeviceAt(7)
+	state = deviceState(device)
+
+	home.removeDeviceAt(2)
+	home.removeDeviceById(home.getDeviceAt(0).getId())
+	assert deviceState(device) == state
+	assert home.getIndexOf(device.getId()) == 6
+
+	home.removeDeviceById(device.getId())
+	with pytest.raises(ValueError):
+		device.getSwitchedOn()
+
+def testRemovedDevicesCanStillBeUsed():
+	home = makeHome(3)
+	plug = SmartPlug(30)
+	home.addDevice(plug)
+	plug.toggleSwitch()
+	home.removeDeviceAt(3)
+
+	# it's a device on its own again, with what it had in the home
+	assert plug.getId() is None
+	assert str(plug) == "SmartPlug: switched on: True, comp. rate: 30"
+	plug.setConsumptionRate(40)
+	checkTotals(home)
+
+	home.addDevice(plug)
+	assert home.getDeviceAt(3).getConsumptionRate() == 40
+	home.removeDeviceById(plug.getId())
+	home.importCSV(makeHome(2).getCSV())
+	plug.toggleSwitch()
+	assert not plug.getSwitchedOn()
+
+def testDevicesReplacedByAnImportAreDetached():
+	home = SmartHome()
+	doorbell = SmartDoorbell()
+	doorbell.setSleep(True)
+	home.addDevice(doorbell)
+	home.importCSV(makeHome(2).getCSV())
+	assert doorbell.getSleep()
+	assert doorbell.getId() is None
+
+def testDeviceAddedTwiceFollowsTheLastCopy():
+	home = SmartHome()
+	plug = SmartPlug(10)
+	home.addDevice(plug)
+	home.addDevice(plug)
+	plug.toggleSwitch()
+	assert [device.getSwitchedOn() for device in home.getDevices()] == [False, True]
+
+	home.removeDeviceAt(0) # the earlier copy, which plug isn't following
+	assert plug.getId() == home.getDeviceAt(0).getId()
+	plug.toggleSwitch()
+	assert not home.getDeviceAt(0).getSwitchedOn()
+
+def testPickledHomeIsACopy():
+	home = makeHome(5)
+	plug = SmartPlug(10)
+	home.addDevice(plug)
+
+	other = pickle.loads(pickle.dumps(home))
+	assert homeState(other) == homeState(home)
+	plug.toggleSwitch()
+	assert not other.getDeviceAt(5).getSwitchedOn() # plug follows the home it was added to
+	other.removeDeviceAt(5)
+	assert plug.getId() == home.getDeviceAt(5).getId()
+
+def testViewsStopWorkingAfterImport():
+	home = makeHome(3)
+	device = home.getDeviceAt(0)
+	home.importCSV(makeHome(3, seed=1).getCSV())
+	with pytest.raises(ValueError):
+		device.toggleSwitch()
+
+
+############################################
+# Removal and totals
+############################################
+def testRemoveAtKeepsOrder():
+	home = makeHome(20)
+	expected = homeState(home)
+	ids = [device.getId() for device in home.getDevices()]
+
+	for index in (19, 0, 7, 7):
+		home.removeDeviceAt(index)
+		del expected[index]
+		del ids[index]
+	assert homeState(home) == expected
+	assert [home.getIndexOf(deviceId) for deviceId in ids] == list(range(16))
+	checkTotals(home)
+
+	with pytest.raises(ValueError):
+		home.removeDeviceAt(16)
+
+def testRemoveByIdMovesTheLastDevice():
+	home = makeHome(5)
+	expected = homeState(home)
+	home.removeDeviceById(home.getDeviceAt(1).getId())
+	assert homeState(home) == [expected[0], expected[4], expected[2], expected[3]]
+	checkTotals(home)
+
+def testTotalsAfterRandomChanges():
+	rng = random.Random(5)
+	home = makeHome(300, seed=2)
+	for _ in range(300):
+		index = rng.randrange(len(home.getDevices()))
+		device = home.getDeviceAt(index)
+		op = rng.randrange(7)
+		if op == 0:
+			home.toggleSwitch(index)
+		elif op == 1 and isinstance(device, SmartPlug):
+			device.setConsumptionRate(rng.randint(0, 150))
+		elif op == 2 and isinstance(device, SmartDoorbell):
+			device.setSleep(not device.getSleep())
+		elif op == 3:
+			home.removeDeviceAt(index)
+		elif op == 4:
+			home.removeDeviceById(device.getId())
+		elif op == 5:
+			home.addDevice(randomDevice(rng))
+		else:
+			home.applyScheduleAtHour(rng.randrange(HOURS))
+		checkTotals(home)
+
+	home.turnOnAll()
+	checkTotals(home)
+
+
+############################################
+# Bulk changes
+############################################
+def testBulkSwitching():
+	home = makeHome(200)
+	before = [device.getSwitchedOn() for device in home.getDevices()]
+	indices = random.Random(6).sample(range(200), 50)
+
+	home.toggleSwitches(indices)
+	after = [device.getSwitchedOn() for device in home.getDevices()]
+	assert after == [on != (index in indices) for index, on in enumerate(before)]
+
+	home.setSwitchedOnAt(range(0, 200, 2), False)
+	assert not any(home.getDeviceAt(index).getSwitchedOn() for index in range(0, 200, 2))
+	checkTotals(home)
+
+@pytest.mark.parametrize("indices", [[0, 1, 200], [-1, 2], range(0, 201, 2)])
+def testBulkSwitchingChecksEveryIndexFirst(indices):
+	home = makeHome(200)
+	expected = homeState(home)
+	with pytest.raises(ValueError):
+		home.toggleSwitches(indices)
+	with pytest.raises(ValueError):
+		home.setSwitchedOnAt(indices, True)
+	assert homeState(home) == expected
+
+def testBulkRates():
+	home = SmartHome()
+	for _ in range(200):
+		home.addDevice(SmartPlug(1))
+	home.turnOnAll()
+
+	home.setConsumptionRates(range(0, 200, 2), 50)
+	home.setConsumptionRates([1, 3], [7, 9])
+	assert [home.getDeviceAt(index).getConsumptionRate() for index in range(5)] == [50, 7, 50, 9, 50]
+	checkTotals(home)
+
+@pytest.mark.parametrize("rates", [[10, 1.5], [10, 151], [10, -1], [10]])
+def testBulkRatesAreCheckedBeforeAnyIsWritten(rates):
+	home = SmartHome()
+	for _ in range(200):
+		home.addDevice(SmartPlug(1))
+	with pytest.raises(ValueError):
+		home.setConsumptionRates([0, 1], rates)
+	assert home.getDeviceAt(0).getConsumptionRate() == 1
+
+def testBulkRatesOnlyForPlugs():
+	home = SmartHome()
+	home.addDevice(SmartPlug(1))
+	home.addDevice(SmartDoorbell())
+	with pytest.raises(ValueError):
+		home.setConsumptionRates([0, 1], 5)
+	assert home.getDeviceAt(0).getConsumptionRate() == 1
+
+def testScheduleTemplates():
+	home = makeHome(50)
+	template = [None] * HOURS
+	template[8] = True
+	plugs = home.getIndicesOfType(SmartPlug)
+
+	home.applyScheduleTemplate(plugs, template)
+	assert all(home.getDeviceAt(index).getSchedule() == template for index in plugs)
+
+	home.shiftSchedules(plugs, 2)
+	assert home.getDeviceAt(plugs[0]).getSchedule()[10] is True
+
+	overlay = [None] * HOURS
+	overlay[20] = False
+	home.mergeScheduleTemplate(plugs, overlay)
+	schedule = home.getDeviceAt(plugs[0]).getSchedule()
+	assert schedule[10] is True and schedule[20] is False
+
+	home.copySchedule(plugs[0], range(50))
+	assert all(device.getSchedule() == schedule for device in home.getDevices())
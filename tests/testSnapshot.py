@@ -0,0 +1,150 @@
+import io
+import pytest
+from backendChallenge import *
+from snapshot import *
+from randomHomes import *
+
+
+def snapshotOf(home):
+	buffer = io.BytesIO()
+	home.writeSnapshot(buffer)
+	return buffer.getvalue()
+
+
+def testPackedSchedulesRoundTrip():
+	schedules = bytes(i * 7 % 3 for i in range(HOURS * 40))
+	packed = packSchedules(schedules)
+	assert len(packed) == len(schedules) // 4
+	assert bytes(unpackSchedules(packed)) == schedules
+
+def testSnapshotRoundTrip():
+	home = makeHome(300)
+	home.removeDeviceAt(4) # so there's a slot table
+
+	other = SmartHome()
+	other.importSnapshot(snapshotOf(home))
+	assert homeState(other) == homeState(home)
+	assert other.getTotals() == home.getTotals()
+
+def testSnapshotProgress():
+	home = makeHome(250)
+	written = []
+	writeSnapshot(home.store, io.BytesIO(), lambda done, size: written.append((done, size)), chunkRows=100)
+	size = snapshotLayout(250)[-1]
+	assert written[-1] == (size, size)
+	assert [done for done, _ in written] == sorted(done for done, _ in written)
+
+	read = []
+	readSnapshot(snapshotOf(home), lambda devices, numDevices: read.append(devices), chunkRows=100)
+	assert read == [100, 200, 250]
+
+def testEmptySnapshot():
+	other = SmartHome()
+	other.importSnapshot(snapshotOf(SmartHome()))
+	assert len(other.getDevices()) == 0
+
+@pytest.mark.parametrize("damage", ["magic", "size", "kind", "rate"])
+def testBadSnapshotsRaise(damage):
+	snapshot = bytearray(snapshotOf(makeHome(10)))
+	kinds, switchedOn, sleepMode, consumptionRates, schedules, end = snapshotLayout(10)
+	if damage == "magic":
+		snapshot[0:4] = b"NOPE"
+	elif damage == "size":
+		snapshot += b"\x00"
+	elif damage == "kind":
+		snapshot[kinds] = 9
+	else:
+		snapshot[consumptionRates] = 151
+
+	with pytest.raises(ValueError):
+		SmartHome().importSnapshot(snapshot)
+
+def testBadScheduleCodeRaises():
+	snapshot = bytearray(snapshotOf(makeHome(10)))
+	snapshot[snapshotLayout(10)[4]] = 3 # a code that isn't an action
+	with pytest.raises(ValueError):
+		SmartHome().importSnapshot(snapshot)
+
+
+############################################
+# Snapshots used where they are
+############################################
+def testMappedMatchesLoaded():
+	home = makeHome(300, seed=1)
+	mapped = SmartHome()
+	mapped.openSnapshot(bytearray(snapshotOf(home)))
+
+	assert isinstance(mapped.store, MappedDeviceStore)
+	assert homeState(mapped) == homeState(home)
+	assert mapped.getTotals() == home.getTotals()
+	assert mapped.getCSV() == home.getCSV()
+
+def testMappedChangesAreWrittenToTheBuffer():
+	home = makeHome(50)
+	buffer = bytearray(snapshotOf(home))
+	mapped = SmartHome()
+	mapped.openSnapshot(buffer)
+
+	mapped.toggleSwitch(3)
+	mapped.getDeviceAt(5).setActionAtHour(9, False)
+	home.toggleSwitch(3)
+	home.getDeviceAt(5).setActionAtHour(9, False)
+
+	other = SmartHome()
+	other.importSnapshot(buffer)
+	assert homeState(other) == homeState(home)
+
+def testMappedTicksLikeLoaded():
+	home = makeHome(300, seed=2)
+	mapped = SmartHome()
+	mapped.openSnapshot(bytearray(snapshotOf(home)))
+
+	for hour in range(HOURS):
+		assert sorted(mapped.applyScheduleAtHour(hour)) == sorted(home.applyScheduleAtHour(hour))
+		assert mapped.getTotals() == home.getTotals()
+
+def testMappedUnmapsToAddOrRemove():
+	home = makeHome(20)
+	mapped = SmartHome()
+	mapped.openSnapshot(bytearray(snapshotOf(home)))
+	device = mapped.getDeviceAt(10)
+	state = deviceState(device)
+
+	mapped.removeDeviceAt(0)
+	mapped.addDevice(SmartPlug(5))
+	assert not isinstance(mapped.store, MappedDeviceStore)
+	assert deviceState(device) == state # views still work once it's loaded
+	assert len(mapped.getDevices()) == 20
+
+def testMappedCopyIsSeparate():
+	buffer = bytearray(snapshotOf(makeHome(20)))
+	mapped = SmartHome()
+	mapped.openSnapshot(buffer)
+	before = bytes(buffer)
+
+	copy = mapped.copy()
+	copy.turnOnAll()
+	copy.getDeviceAt(0).setActionAtHour(1, True)
+	assert bytes(buffer) == before
+	assert snapshotOf(mapped) == before
+
+@pytest.mark.parametrize("damage", ["kind", "rate", "schedule"])
+def testMappedChecksRowsAsTheyAreRead(damage):
+	snapshot = bytearray(snapshotOf(makeHome(10, seed=3)))
+	kinds, switchedOn, sleepMode, consumptionRates, schedules, end = snapshotLayout(10)
+	mapped = SmartHome()
+	mapped.openSnapshot(snapshot)
+
+	if damage == "kind":
+		snapshot[kinds] = 9
+		with pytest.raises(ValueError):
+			mapped.getDeviceAt(0)
+	elif damage == "rate":
+		snapshot[kinds] = PLUG
+		snapshot[consumptionRates] = 151
+		with pytest.raises(ValueError):
+			mapped.getDeviceAt(0).getConsumptionRate()
+	else:
+		snapshot[schedules] = 3
+		with pytest.raises(ValueError):
+			mapped.getDeviceAt(0).getSchedule()
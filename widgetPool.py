@@ -0,0 +1,85 @@
+class WidgetPool:
+	"""
+	Keeps widgets that aren't needed any more so they can be reused,
+	rather than destroying them and making new ones on every refresh.
+	Widgets are pooled by a key, so only the same kind of widget is reused
+	"""
+
+	def __init__(self):
+		self.pooled = {} # key -> list of hidden widgets ready to reuse
+		self.liveCount = 0
+		self.pooledCount = 0
+		self.createdCount = 0
+
+	def get(self, key, make):
+		"""Returns a pooled widget for key if there is one, otherwise make()s a new one"""
+		if self.pooled.get(key):
+			widget = self.pooled[key].pop()
+			self.pooledCount -= 1
+		else:
+			widget = make()
+			self.createdCount += 1
+
+		self.liveCount += 1
+		return widget
+
+	def release(self, key, widget):
+		"""Hides a widget and keeps it to be reused by get"""
+		self.hide(widget)
+
+		self.pooled.setdefault(key, []).append(widget)
+		self.liveCount -= 1
+		self.pooledCount += 1
+
+	def hide(self, widget):
+		widget.grid_remove()
+
+	def releaseAll(self, widgets):
+		"""Releases a list of (key, widget) pairs, and empties the list"""
+		for key, widget in widgets:
+			self.release(key, widget)
+		widgets.clear()
+
+	def getCounts(self):
+		return {
+			"live": self.liveCount,
+			"pooled": self.pooledCount,
+			"created": self.createdCount
+		}
+
+class DialogPool(WidgetPool):
+	"""
+	A WidgetPool for dialog windows (Toplevels). A closed dialog is hidden
+	and kept, so opening it again just fills it in and shows it rather than
+	building it again. Dialogs are ordinary windows run by the main window's
+	mainloop, so opening one doesn't wait for it to be closed
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.showing = {} # key -> list of dialogs that are open
+
+	def get(self, key, make):
+		"""Shows a pooled dialog for key if there is one, otherwise make()s a new one"""
+		def makeDialog():
+			dialog = make()
+			# the window's close button puts it back in the pool rather than destroying it
+			dialog.protocol("WM_DELETE_WINDOW", lambda: self.release(key, dialog))
+			return dialog
+
+		dialog = super().get(key, makeDialog)
+		self.showing.setdefault(key, []).append(dialog)
+		dialog.deiconify()
+		dialog.lift()
+		return dialog
+
+	def release(self, key, dialog):
+		self.showing[key].remove(dialog)
+		super().release(key, dialog)
+
+	def hide(self, dialog):
+		dialog.withdraw()
+
+	def getShowing(self, key):
+		"""Returns the dialogs for key that are open, e.g. to bring one forward rather than open another"""
+		return self.showing.get(key, [])